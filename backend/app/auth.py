@@ -1,11 +1,18 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+from jose import JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from . import models
 from .config import settings
+from .db_router import query_cache, reads_from_replica, use_primary
+from .hashing import password_hasher
+from .jwt_keys import keyring
+from .metrics import timed
+from .token_cache import Principal, token_cache
+from .traffic import note_user
+from utils.auto_logout import revocation_epoch
 
 # Configuration
 SECRET_KEY = settings.SECRET_KEY
@@ -21,41 +28,96 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool without blocking the event loop"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool without blocking the event loop"""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    issued_at = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+        expire = issued_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": issued_at})
+    return keyring.sign(to_encode)
+
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT against the cached keys and return its claims, raising JWTError if it is invalid"""
+    return keyring.verify(token)
+
+async def decode_access_token_async(token: str) -> dict:
+    """Like decode_access_token, but may refresh the JWKS key cache first"""
+    return await keyring.verify_async(token)
+
+def is_token_revoked(claims: dict) -> bool:
+    """True if the token was issued before the last auto-logout cutoff"""
+    issued_at = claims.get("iat")
+    if issued_at is None:
+        # Tokens minted before `iat` was added: derive it from the expiry
+        issued_at = claims.get("exp", 0) - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    return issued_at < revocation_epoch()
 
 async def get_user(username: str):
-    return await models.User.filter(username=username).first()
+    with timed("db"):
+        user = await models.User.filter(username=username).first()
+        if user is None and reads_from_replica():
+            # Registered moments ago: the replica may not have the row yet
+            with use_primary():
+                user = await models.User.filter(username=username).first()
+    return user
+
+async def get_principal(username: str) -> Optional[Principal]:
+    """The user behind a token, through the query cache"""
+    async def load():
+        user = await get_user(username)
+        return Principal.from_user(user) if user is not None else None
+    return await query_cache.get_or_load(("principal", username), load, tags=("users",))
 
 async def authenticate_user(username: str, password: str):
-    user = await get_user(username)
+    # Password hash and is_active must be current: never a lagging replica or cache
+    with use_primary():
+        user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached = token_cache.get(token)
+    if cached is not None:
+        if is_token_revoked(cached[0]):
+            raise credentials_exception
+        note_user(cached[1].id)
+        return cached[1]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = await decode_access_token_async(token)
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or is_token_revoked(payload):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = await get_user(username=username)
-    if user is None:
+    principal = await get_principal(username)
+    if principal is None:
         raise credentials_exception
-    return user
+    token_cache.put(token, payload, principal)
+    note_user(principal.id)
+    return principal
+
+async def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required"
+        )
+    return current_user
@@ -0,0 +1,27 @@
+"""
+Broker adapters, looked up by name
+
+Register new integrations with `register_adapter`; the order router creates one
+pooled client per registered broker on first use.
+"""
+from typing import Dict
+from ..config import settings
+from .base import BrokerAdapter, BrokerError, BrokerOrder
+from .mock import MockBroker
+
+adapters: Dict[str, BrokerAdapter] = {}
+
+def register_adapter(adapter: BrokerAdapter) -> None:
+    adapters[adapter.name] = adapter
+
+def get_adapter(name: str) -> BrokerAdapter:
+    try:
+        return adapters[name]
+    except KeyError:
+        raise BrokerError(f"Unknown broker: {name}")
+
+register_adapter(MockBroker(
+    latency_ms=settings.MOCK_BROKER_LATENCY_MS,
+    jitter_ms=settings.MOCK_BROKER_JITTER_MS,
+    failure_rate=settings.MOCK_BROKER_FAILURE_RATE,
+))
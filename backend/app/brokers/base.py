@@ -0,0 +1,71 @@
+from typing import Optional
+import httpx
+
+class BrokerError(Exception):
+    """
+    An order the broker did not accept
+
+    `retryable` means the broker certainly did not act on the request (e.g. it
+    answered 429/503), so sending it again cannot double-place the order.
+    `outcome_unknown` means it may have: the request was sent but the answer
+    never came or could not be read.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, status_code: Optional[int] = None,
+                 outcome_unknown: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.outcome_unknown = outcome_unknown
+
+class BrokerOrder:
+    """The broker's answer: "placed" (working) or "complete" (filled at average_price)"""
+
+    __slots__ = ("broker_order_id", "status", "average_price", "raw")
+
+    def __init__(self, broker_order_id: str, status: str = "placed", average_price: Optional[float] = None,
+                 raw: Optional[dict] = None):
+        self.broker_order_id = broker_order_id
+        self.status = status
+        self.average_price = average_price
+        self.raw = raw
+
+class BrokerAdapter:
+    """
+    Base class for broker integrations
+
+    Subclasses set `name` and `base_url` and implement `place_order` with the
+    client the order router hands them. Implementing `find_order` lets orders
+    whose outcome is unknown be resolved (see app/order_outcome.py). The router owns that client (one
+    pooled, keep-alive client per broker), concurrency caps, retries and timing;
+    adapters only translate orders to and from the broker's API.
+    """
+
+    name: str = ""
+    base_url: str = ""
+
+    def build_client(self, **options) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=self.base_url, **options)
+
+    async def place_order(self, client: httpx.AsyncClient, order, tag: Optional[str] = None) -> BrokerOrder:
+        """Place an order; `tag` (our order id) is sent along so find_order can look it up later"""
+        raise NotImplementedError
+
+    async def find_order(self, client: httpx.AsyncClient, tag: str) -> Optional[BrokerOrder]:
+        """The order placed with this tag, or None if the broker has none"""
+        raise NotImplementedError
+
+    @staticmethod
+    def raise_for_status(response: httpx.Response) -> None:
+        """Map error responses to BrokerError; 429/503 mean nothing was placed"""
+        if response.status_code < 400:
+            return
+        try:
+            detail = response.json().get("message") or response.text
+        except ValueError:
+            detail = response.text
+        raise BrokerError(
+            f"Broker returned {response.status_code}: {detail}",
+            retryable=response.status_code in (429, 503),
+            status_code=response.status_code
+        )
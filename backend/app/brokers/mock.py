@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+import json
+import random
+from collections import OrderedDict
+from typing import Optional
+import httpx
+from ..instruments import master
+from .base import BrokerAdapter, BrokerOrder
+
+class MockBroker(BrokerAdapter):
+    """
+    Offline broker for development and benchmarks
+
+    Requests go through a real httpx client backed by an in-process transport
+    that sleeps for `latency_ms` ± `jitter_ms` and answers 503 for a
+    `failure_rate` share of orders, so pooling, concurrency caps, retries and
+    latency tracking all run exactly as they would against a live broker.
+    The answers to the last MAX_TAGGED tagged orders are kept for find_order.
+    """
+
+    MAX_TAGGED = 100_000
+
+    name = "mock"
+    base_url = "http://mock-broker"
+
+    def __init__(self, latency_ms: float = 20.0, jitter_ms: float = 10.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._order_ids = itertools.count(1)
+        self._tagged: "OrderedDict[str, dict]" = OrderedDict()
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if request.method == "GET":
+            found = self._tagged.get(request.url.params.get("tag", ""))
+            if found is None:
+                return httpx.Response(404, json={"status": "error", "message": "Order not found"})
+            return httpx.Response(200, json=found)
+        if random.random() < self.failure_rate:
+            return httpx.Response(503, json={"status": "error", "message": "Mock broker busy"})
+        order = json.loads(request.content)
+        # Market orders fill at once, at the price sent along or a flat 100.0
+        filled = order["pricetype"] == "MARKET"
+        answer = {
+            "status": "success",
+            "orderid": f"MOCK{next(self._order_ids):010d}",
+            "symbol": order["symbol"],
+            "order_status": "complete" if filled else "open",
+            "average_price": (order["price"] or 100.0) if filled else None,
+        }
+        if order.get("tag"):
+            self._tagged[order["tag"]] = answer
+            if len(self._tagged) > self.MAX_TAGGED:
+                self._tagged.popitem(last=False)
+        return httpx.Response(200, json=answer)
+
+    def build_client(self, **options) -> httpx.AsyncClient:
+        # Pool limits and HTTP/2 do not apply to an in-process transport
+        options.pop("limits", None)
+        options.pop("http2", None)
+        return httpx.AsyncClient(base_url=self.base_url, transport=httpx.MockTransport(self._handle), **options)
+
+    async def place_order(self, client: httpx.AsyncClient, order, tag: Optional[str] = None) -> BrokerOrder:
+        instrument = master.lookup(order.exchange, order.symbol)
+        response = await client.post("/orders", json={
+            "symbol": order.symbol,
+            "symboltoken": instrument.token if instrument else None,
+            "exchange": order.exchange,
+            "action": order.side,
+            "quantity": order.quantity,
+            "pricetype": order.order_type,
+            "price": float(order.price or 0),
+            "tag": tag,
+        })
+        self.raise_for_status(response)
+        return self._order(response.json())
+
+    async def find_order(self, client: httpx.AsyncClient, tag: str) -> Optional[BrokerOrder]:
+        response = await client.get("/orders", params={"tag": tag})
+        if response.status_code == 404:
+            return None
+        self.raise_for_status(response)
+        return self._order(response.json())
+
+    @staticmethod
+    def _order(data: dict) -> BrokerOrder:
+        if data["order_status"] == "complete":
+            return BrokerOrder(data["orderid"], status="complete", average_price=data["average_price"], raw=data)
+        return BrokerOrder(data["orderid"], raw=data)
@@ -6,7 +6,8 @@ from typing import Optional
 load_dotenv()
 
 class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file='.env', case_sensitive=True)
+    # Empty variables keep the defaults below, so `KEY=` in .env means unset
+    model_config = SettingsConfigDict(env_file='.env', case_sensitive=True, env_ignore_empty=True)
 
     # PostgreSQL Configuration
     POSTGRES_USER: str = os.getenv("POSTGRES_USER")
@@ -15,10 +16,57 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB")
 
+    # Connection Pool Configuration (per worker; size max against Postgres max_connections)
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_MAX_QUERIES: int = int(os.getenv("DB_POOL_MAX_QUERIES", "50000"))
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))  # seconds
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    # check: verify the aerich version at startup (run `python migrate.py` on deploy)
+    # generate: create the database and generate schemas on every boot
+    DB_STARTUP_MODE: str = os.getenv("DB_STARTUP_MODE", "check")
+    DB_HEALTHCHECK_INTERVAL: int = int(os.getenv("DB_HEALTHCHECK_INTERVAL", "30"))  # seconds, 0 disables
+
+    # Read Replica Configuration (see app/db_router.py; unset keeps every query on the primary)
+    DB_REPLICA_SERVER: Optional[str] = os.getenv("DB_REPLICA_SERVER") or None
+    DB_REPLICA_PORT: Optional[str] = os.getenv("DB_REPLICA_PORT") or os.getenv("POSTGRES_PORT")
+    DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))  # seconds; a replica further behind is bypassed
+
+    # Query Result Cache Configuration (per worker, invalidated on ORM writes)
+    QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "False").lower() == "true"
+    QUERY_CACHE_TTL_SECONDS: float = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "2"))
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+
     # JWT Configuration
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Asymmetric signing: directory of <kid>.pem EdDSA/ES256 private keys (see app/jwt_keys.py)
+    JWT_KEYS_DIR: Optional[str] = os.getenv("JWT_KEYS_DIR") or None
+    JWT_ACTIVE_KID: Optional[str] = os.getenv("JWT_ACTIVE_KID") or None  # defaults to the newest key file
+    JWT_ACCEPT_HS256: bool = os.getenv("JWT_ACCEPT_HS256", "True").lower() == "true"  # kid-less SECRET_KEY tokens
+    JWT_BACKEND: str = os.getenv("JWT_BACKEND", "auto")  # auto, jose or pyjwt (EdDSA needs pyjwt)
+    # Verify-only nodes: fetch public keys from the issuer instead of holding private keys
+    JWKS_URL: Optional[str] = os.getenv("JWKS_URL") or None
+    JWKS_CACHE_SECONDS: int = int(os.getenv("JWKS_CACHE_SECONDS", "300"))
+    JWKS_MIN_REFRESH_SECONDS: int = int(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+    SESSION_PURGE_INTERVAL: int = int(os.getenv("SESSION_PURGE_INTERVAL", "300"))
+    SESSION_PURGE_BATCH_SIZE: int = int(os.getenv("SESSION_PURGE_BATCH_SIZE", "1000"))
+
+    # Password Hashing Pool Configuration
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread or process
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+
+    # Bulk User Import Configuration
+    BULK_IMPORT_BATCH_SIZE: int = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "1000"))
+    BULK_HASH_WORKERS: int = int(os.getenv("BULK_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+    # Verified Token Cache Configuration
+    TOKEN_CACHE_ENABLED: bool = os.getenv("TOKEN_CACHE_ENABLED", "True").lower() == "true"
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
 
     # Auto-logout Configuration
     AUTO_LOGOUT_TIME: str = os.getenv("AUTO_LOGOUT_TIME", "03:30")
@@ -39,20 +87,137 @@ class Settings(BaseSettings):
     CSRF_COOKIE_HTTP_ONLY: bool = os.getenv("CSRF_COOKIE_HTTP_ONLY", "True").lower() == "true"
     CSRF_COOKIE_SAMESITE: str = os.getenv("CSRF_COOKIE_SAMESITE", "lax")
 
+    # Logging Configuration
+    LOG_DIR: str = os.getenv("LOG_DIR", "logs")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json or text (log files only)
+    LOG_BACKUP_DAYS: int = int(os.getenv("LOG_BACKUP_DAYS", "14"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_QUEUE_POLICY: str = os.getenv("LOG_QUEUE_POLICY", "drop")  # drop or block when the queue is full
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")  # e.g. "uvicorn.access=0.1,openalgo=0.5"
+
+    # Metrics Configuration
+    # Directory shared by all workers of one host; enables cross-worker aggregation on /metrics
+    METRICS_DIR: Optional[str] = os.getenv("METRICS_DIR") or None
+
+    # Real-time WebSocket Configuration
+    REALTIME_QUEUE_SIZE: int = int(os.getenv("REALTIME_QUEUE_SIZE", "256"))  # pending updates per connection
+    REALTIME_SEND_TIMEOUT: float = float(os.getenv("REALTIME_SEND_TIMEOUT", "5"))  # seconds before a stuck client is dropped
+    REALTIME_BRIDGE: bool = os.getenv("REALTIME_BRIDGE", "False").lower() == "true"  # fan out across workers via LISTEN/NOTIFY
+
+    # Webhook Ingestion Configuration
+    WEBHOOK_QUEUE_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))  # alerts buffered before 503
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+    WEBHOOK_FLUSH_INTERVAL: float = float(os.getenv("WEBHOOK_FLUSH_INTERVAL", "0.05"))  # seconds a worker waits to fill a batch
+    WEBHOOK_KEY_CACHE_TTL: int = int(os.getenv("WEBHOOK_KEY_CACHE_TTL", "60"))  # seconds
+    WEBHOOK_KEY_CACHE_MAX_ENTRIES: int = int(os.getenv("WEBHOOK_KEY_CACHE_MAX_ENTRIES", "10000"))  # known and unknown ids
+
+    # Order Routing Configuration
+    BROKER_DEFAULT: str = os.getenv("BROKER_DEFAULT", "mock")
+    BROKER_MAX_CONCURRENCY: int = int(os.getenv("BROKER_MAX_CONCURRENCY", "50"))  # in-flight orders per broker
+    BROKER_MAX_CONNECTIONS: int = int(os.getenv("BROKER_MAX_CONNECTIONS", "20"))  # pooled keep-alive connections per broker
+    BROKER_TIMEOUT: float = float(os.getenv("BROKER_TIMEOUT", "5"))  # seconds per attempt
+    BROKER_RETRIES: int = int(os.getenv("BROKER_RETRIES", "2"))  # only when the broker certainly did not act
+    BROKER_RETRY_BACKOFF: float = float(os.getenv("BROKER_RETRY_BACKOFF", "0.1"))  # seconds, doubled per retry
+    BROKER_ORDER_DEADLINE: float = float(os.getenv("BROKER_ORDER_DEADLINE", "10"))  # seconds, total retry budget
+    ORDER_RECONCILE_INTERVAL: int = int(os.getenv("ORDER_RECONCILE_INTERVAL", "30"))  # seconds between lookups of "unknown" orders, 0 disables
+    MOCK_BROKER_LATENCY_MS: float = float(os.getenv("MOCK_BROKER_LATENCY_MS", "20"))
+    MOCK_BROKER_JITTER_MS: float = float(os.getenv("MOCK_BROKER_JITTER_MS", "10"))
+    MOCK_BROKER_FAILURE_RATE: float = float(os.getenv("MOCK_BROKER_FAILURE_RATE", "0"))
+
+    # Event Log Configuration
+    EVENT_LOG_BATCH_SIZE: int = int(os.getenv("EVENT_LOG_BATCH_SIZE", "1000"))  # rows per COPY
+    EVENT_LOG_FLUSH_INTERVAL: float = float(os.getenv("EVENT_LOG_FLUSH_INTERVAL", "0.5"))  # seconds
+    EVENT_LOG_MAX_BUFFER: int = int(os.getenv("EVENT_LOG_MAX_BUFFER", "100000"))  # rows per table kept while the DB is unavailable
+    EVENT_LOG_TIMEZONE: str = os.getenv("EVENT_LOG_TIMEZONE", "Asia/Kolkata")  # trading day boundaries
+    EVENT_LOG_PRECREATE_DAYS: int = int(os.getenv("EVENT_LOG_PRECREATE_DAYS", "3"))
+    EVENT_LOG_RETENTION_DAYS: int = int(os.getenv("EVENT_LOG_RETENTION_DAYS", "0"))  # 0 keeps every partition
+
+    # Position Engine Configuration
+    POSITION_SNAPSHOT_INTERVAL: int = int(os.getenv("POSITION_SNAPSHOT_INTERVAL", "60"))  # seconds, 0 snapshots only at shutdown
+    POSITION_INITIAL_CAPACITY: int = int(os.getenv("POSITION_INITIAL_CAPACITY", "1024"))  # positions before the arrays grow
+    POSITION_RECONCILE_INTERVAL: int = int(os.getenv("POSITION_RECONCILE_INTERVAL", "30"))  # seconds, 0 disables
+
+    # Instrument Master Configuration
+    INSTRUMENTS_SOURCES: str = os.getenv("INSTRUMENTS_SOURCES", "")  # comma-separated contract-master CSV paths or URLs
+    INSTRUMENTS_DIR: str = os.getenv("INSTRUMENTS_DIR", "data/instruments")  # index file and downloaded CSVs
+    INSTRUMENTS_REFRESH_TIME: str = os.getenv("INSTRUMENTS_REFRESH_TIME", "08:00")  # daily rebuild, HH:MM in EVENT_LOG_TIMEZONE
+    INSTRUMENTS_CHECK_INTERVAL: int = int(os.getenv("INSTRUMENTS_CHECK_INTERVAL", "60"))  # seconds between staleness checks
+    INSTRUMENTS_DOWNLOAD_TIMEOUT: float = float(os.getenv("INSTRUMENTS_DOWNLOAD_TIMEOUT", "120"))  # seconds
+    INSTRUMENTS_MEMO_SIZE: int = int(os.getenv("INSTRUMENTS_MEMO_SIZE", "65536"))  # resolved symbols memoized per worker
+
+    # Traffic Monitor Configuration
+    TRAFFIC_CAPACITY: int = int(os.getenv("TRAFFIC_CAPACITY", "262144"))  # requests kept per worker, 0 disables recording
+    TRAFFIC_DIR: Optional[str] = os.getenv("TRAFFIC_DIR") or None  # shared ring buffers (e.g. /dev/shm/openalgo-traffic) for a cross-worker view
+
+    # Server Configuration
+    # Set per worker by serve.py; worker 0 runs the singleton jobs (session revocation, session purge, snapshots)
+    WORKER_ID: int = int(os.getenv("WORKER_ID", "0"))
+    # Read from the environment by serve.py; declared here so .env may set them
+    WEB_CONCURRENCY: Optional[int] = int(os.getenv("WEB_CONCURRENCY") or 0) or None  # worker processes, None uses one per CPU
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT") or 30)  # seconds a draining worker gets before it is killed
+
+    # Diagnostics Configuration
+    DIAGNOSTICS_ENABLED: bool = os.getenv("DIAGNOSTICS_ENABLED", "False").lower() == "true"
+    DIAGNOSTICS_LAG_INTERVAL: float = float(os.getenv("DIAGNOSTICS_LAG_INTERVAL", "0.05"))  # seconds between lag samples
+    DIAGNOSTICS_STALL_THRESHOLD: float = float(os.getenv("DIAGNOSTICS_STALL_THRESHOLD", "0.25"))  # seconds blocked before the stack is captured
+    DIAGNOSTICS_PROFILE_HZ: int = int(os.getenv("DIAGNOSTICS_PROFILE_HZ", "100"))
+    DIAGNOSTICS_MAX_PROFILE_SECONDS: int = int(os.getenv("DIAGNOSTICS_MAX_PROFILE_SECONDS", "60"))
+
     # Rate Limiting Configuration
     RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
     RATE_LIMIT_PERIOD: int = int(os.getenv("RATE_LIMIT_PERIOD", "3600"))  # in seconds
+    # memory:// (per process), openalgo+shm://<name> (per host) or openalgo+postgres:// (cluster-wide)
+    RATE_LIMIT_STORAGE_URI: str = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+    RATE_LIMIT_STRATEGY: str = os.getenv("RATE_LIMIT_STRATEGY", "fixed-window")  # or moving-window (token bucket)
+    RATE_LIMIT_KEY: str = os.getenv("RATE_LIMIT_KEY", "ip")  # ip or user
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    AUTH_RATE_LIMIT: str = os.getenv("AUTH_RATE_LIMIT", "20/minute")  # login, registration and token refresh, per key
+
+    # Request Size Limits
+    REQUEST_MAX_BYTES: int = int(os.getenv("REQUEST_MAX_BYTES", str(10 * 1024 * 1024)))
+    REQUEST_ROUTE_LIMITS: str = os.getenv("REQUEST_ROUTE_LIMITS", "")  # e.g. "/auth/register=65536,/uploads=104857600"
+
+    @property
+    def request_route_limits(self) -> dict:
+        limits = {}
+        for item in filter(None, (part.strip() for part in self.REQUEST_ROUTE_LIMITS.split(","))):
+            prefix, _, size = (part.strip() for part in item.partition("="))
+            if not prefix.startswith("/") or not size.isdecimal() or int(size) < 1:
+                raise ValueError(f"Invalid REQUEST_ROUTE_LIMITS entry {item!r}: expected /path/prefix=bytes")
+            limits[prefix] = int(size)
+        return limits
 
     # Database URL
     @property
     def DATABASE_URL(self) -> str:
         return f"postgres://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    def _connection(self, host: str, port: str) -> dict:
+        return {
+            "engine": "tortoise.backends.asyncpg",
+            "credentials": {
+                "host": host,
+                "port": port,
+                "user": self.POSTGRES_USER,
+                "password": self.POSTGRES_PASSWORD,
+                "database": self.POSTGRES_DB,
+                "minsize": self.DB_POOL_MIN_SIZE,
+                "maxsize": self.DB_POOL_MAX_SIZE,
+                "max_queries": self.DB_POOL_MAX_QUERIES,
+                "max_inactive_connection_lifetime": self.DB_POOL_MAX_INACTIVE_LIFETIME,
+                "statement_cache_size": self.DB_STATEMENT_CACHE_SIZE,
+            },
+        }
+
     # Tortoise ORM Config
     @property
     def TORTOISE_ORM(self) -> dict:
-        return {
-            "connections": {"default": self.DATABASE_URL},
+        config = {
+            "connections": {
+                "default": self._connection(self.POSTGRES_SERVER, self.POSTGRES_PORT),
+            },
             "apps": {
                 "models": {
                     "models": ["app.models"],
@@ -60,6 +225,11 @@ class Settings(BaseSettings):
                 }
             }
         }
+        if self.DB_REPLICA_SERVER:
+            # A streaming replica: same database and credentials, reads only
+            config["connections"]["replica"] = self._connection(self.DB_REPLICA_SERVER, self.DB_REPLICA_PORT)
+            config["routers"] = ["app.db_router.ReplicaRouter"]
+        return config
 
 # Create a global settings instance
 settings = Settings()
@@ -1,12 +1,27 @@
 from tortoise import Tortoise
+import asyncio
 import logging
+import time
+from pathlib import Path
+from typing import Optional
 import asyncpg
+from tortoise.exceptions import OperationalError
 from .config import settings
+from .db_router import check_replica, replica_configured
+from .metrics import Histogram, MetricFamilies, register_collector, startup_phase
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Config used by aerich and the migrate CLI; includes aerich's version table.
+# Migrations read and write the primary only.
+TORTOISE_ORM = settings.TORTOISE_ORM
+TORTOISE_ORM["apps"]["models"]["models"].append("aerich.models")
+TORTOISE_ORM.pop("routers", None)
+TORTOISE_ORM["connections"].pop("replica", None)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations" / "models"
+
 async def create_database_if_not_exists():
     """Create the database if it doesn't exist, otherwise use existing database"""
     conn = None
@@ -18,7 +33,7 @@ async def create_database_if_not_exists():
             password=settings.POSTGRES_PASSWORD,
             host=settings.POSTGRES_SERVER,
             port=settings.POSTGRES_PORT,
-            database=settings.POSTGRES_DB  # Connect to default postgres database
+            database="postgres"  # Connect to default postgres database
         )
 
         # Check if database exists
@@ -56,21 +71,172 @@ async def create_database_if_not_exists():
             except Exception as e:
                 logger.warning(f"Error closing connection: {str(e)}")
 
+class PoolMetrics:
+    """Acquire-wait and liveness figures for the default connection pool"""
+
+    def __init__(self):
+        self.acquire_wait = Histogram()
+        self.healthy = True
+        self.last_check: Optional[float] = None
+        self.failed_checks = 0
+
+pool_metrics = PoolMetrics()
+_health_task: Optional[asyncio.Task] = None
+
+class _TimedAcquire:
+    """Wraps Tortoise's connection context to time how long acquiring takes"""
+
+    def __init__(self, wrapper):
+        self._wrapper = wrapper
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        connection = await self._wrapper.__aenter__()
+        pool_metrics.acquire_wait.observe(time.perf_counter() - started)
+        return connection
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._wrapper.__aexit__(exc_type, exc, tb)
+
+def _instrument_pool(client) -> None:
+    original = client.acquire_connection
+    client.acquire_connection = lambda: _TimedAcquire(original())
+
+async def warm_pool():
+    """Open the pool (asyncpg connects min_size connections eagerly) and prove it works"""
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        await connection.fetchval("SELECT 1")
+    _instrument_pool(client)
+    logger.info(f"Connection pool warmed up ({pool_stats()['total']} connections)")
+    if replica_configured():
+        # A missing replica does not stop startup; reads use the primary until it answers
+        if await check_replica(timeout=10):
+            logger.info(f"Read replica {settings.DB_REPLICA_SERVER}:{settings.DB_REPLICA_PORT} is serving reads")
+
+def pool_stats() -> dict:
+    """Current pool size, connections in use and acquire-wait distribution"""
+    client = Tortoise.get_connection("default")
+    pool = getattr(client, "_pool", None)
+    total = pool.get_size() if pool is not None else 0
+    idle = pool.get_idle_size() if pool is not None else 0
+    return {
+        "min_size": settings.DB_POOL_MIN_SIZE,
+        "max_size": settings.DB_POOL_MAX_SIZE,
+        "total": total,
+        "in_use": total - idle,
+        "idle": idle,
+        "healthy": pool_metrics.healthy,
+        "failed_checks": pool_metrics.failed_checks,
+        "acquire_wait": pool_metrics.acquire_wait.snapshot(),
+    }
+
+def _collect(metrics: MetricFamilies) -> None:
+    if not Tortoise._inited:
+        return
+    stats = pool_stats()
+    metrics.gauge("openalgo_db_pool_connections", "Open connections in the pool", {}, stats["total"])
+    metrics.gauge("openalgo_db_pool_in_use", "Connections currently checked out", {}, stats["in_use"])
+    metrics.gauge("openalgo_db_pool_healthy", "1 if the last liveness check passed", {}, int(stats["healthy"]))
+    metrics.counter("openalgo_db_pool_failed_checks_total", "Failed liveness checks", {}, stats["failed_checks"])
+    metrics.histogram("openalgo_db_pool_acquire_wait_seconds", "Time waiting to acquire a connection", {}, pool_metrics.acquire_wait)
+
+register_collector(_collect)
+
+async def _check_pool_health(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            client = Tortoise.get_connection("default")
+            async with client.acquire_connection() as connection:
+                await asyncio.wait_for(connection.fetchval("SELECT 1"), timeout=interval)
+            if not pool_metrics.healthy:
+                logger.info("Database connection pool is healthy again")
+            pool_metrics.healthy = True
+        except Exception as e:
+            pool_metrics.failed_checks += 1
+            pool_metrics.healthy = False
+            logger.error(f"Database liveness check failed: {str(e)}")
+        pool_metrics.last_check = time.time()
+        if replica_configured():
+            await check_replica(timeout=interval)
+
+def start_pool_health_check():
+    """Start the periodic pool liveness check (and replica lag check)"""
+    global _health_task
+    if settings.DB_HEALTHCHECK_INTERVAL > 0 and _health_task is None:
+        _health_task = asyncio.create_task(_check_pool_health(settings.DB_HEALTHCHECK_INTERVAL))
+
+def latest_migration_version() -> Optional[str]:
+    """Newest aerich migration file shipped with this build"""
+    versions = [path.name for path in MIGRATIONS_DIR.glob("*.py") if path.name.split("_", 1)[0].isdigit()]
+    if not versions:
+        return None
+    return max(versions, key=lambda name: int(name.split("_", 1)[0]))
+
+async def applied_migration_version() -> Optional[str]:
+    """Newest migration recorded in the aerich table, or None if aerich never ran"""
+    client = Tortoise.get_connection("default")
+    try:
+        rows = await client.execute_query_dict(
+            "SELECT version FROM aerich WHERE app = 'models' ORDER BY id DESC LIMIT 1"
+        )
+    except OperationalError:
+        return None
+    return rows[0]["version"] if rows else None
+
+async def check_schema_version() -> bool:
+    """
+    Compare the applied aerich version with the newest migration file
+
+    One query on the happy path. If the database is behind (or was never migrated),
+    fall back to generate_schemas so the app still starts, and ask for `python migrate.py`.
+    """
+    latest = latest_migration_version()
+    applied = await applied_migration_version()
+    if applied == latest:
+        logger.info(f"Database schema is current ({applied})")
+        return True
+    logger.warning(
+        f"Database schema is at {applied or 'no recorded version'}, expected {latest}. "
+        "Run `python migrate.py`; generating missing tables for now"
+    )
+    await Tortoise.generate_schemas(safe=True)
+    return False
+
 async def init_db():
-    """Initialize database connection and create schemas"""
+    """
+    Initialize database connection and verify the schema
+
+    In the default "check" startup mode the database and schema are owned by
+    `python migrate.py`; startup only checks the applied migration version.
+    DB_STARTUP_MODE=generate restores the old create-and-generate-on-boot path.
+    """
     try:
-        # First ensure database exists
-        await create_database_if_not_exists()
+        if settings.DB_STARTUP_MODE == "generate":
+            # First ensure database exists
+            with startup_phase("db_create"):
+                await create_database_if_not_exists()
 
         logger.info("Initializing Tortoise ORM connection...")
-        await Tortoise.init(
-            config=settings.TORTOISE_ORM,
-            use_tz=True
-        )
-        
-        logger.info("Generating database schemas...")
-        # Generate schemas for all models
-        await Tortoise.generate_schemas(safe=True)
+        with startup_phase("orm_init"):
+            await Tortoise.init(
+                config=settings.TORTOISE_ORM,
+                use_tz=True
+            )
+
+        if settings.DB_STARTUP_MODE == "generate":
+            logger.info("Generating database schemas...")
+            # Generate schemas for all models
+            with startup_phase("schema_generate"):
+                await Tortoise.generate_schemas(safe=True)
+        else:
+            with startup_phase("schema_check"):
+                await check_schema_version()
+
+        with startup_phase("pool_warmup"):
+            await warm_pool()
+        start_pool_health_check()
         logger.info("Database initialization complete!")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
@@ -78,6 +244,10 @@ async def init_db():
 
 async def close_db():
     """Close database connection"""
+    global _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
     try:
         logger.info("Closing database connections...")
         await Tortoise.close_connections()
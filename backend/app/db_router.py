@@ -0,0 +1,265 @@
+"""
+Read-replica routing and a query-result cache.
+
+With DB_REPLICA_SERVER set, Settings.TORTOISE_ORM adds a "replica" connection
+and installs ReplicaRouter. ORM reads then go to the replica, and writes stay on
+the primary. Reads stay on the primary when:
+
+- the current request (asyncio task) has already written: read-your-writes
+- a transaction is open on the primary
+- the code is inside `use_primary()`
+- the replica failed its last health check, or is more than
+  DB_REPLICA_MAX_LAG seconds behind
+
+Raw SQL reads get the same choice through `read_connection()`.
+
+`query_cache` (opt-in with QUERY_CACHE_ENABLED) keeps query results for
+QUERY_CACHE_TTL_SECONDS. Each entry carries tags, and every ORM save or delete
+of a model invalidates the tags "<table>" and "<table>:user:<user_id>". Tags are
+versioned, so a load that raced with a write is never served afterwards. The
+cache is per worker. Writes made through another worker, raw SQL or
+QuerySet.update() are not seen, so results can be up to one TTL (plus replica
+lag) old. Only cache what a polling dashboard can show slightly late.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from tortoise import Tortoise
+from tortoise.backends.base.client import TransactionalDBClient
+from tortoise.connection import connections
+from tortoise.models import Model
+from tortoise.signals import Signals
+from . import models
+from .config import settings
+from .metrics import MetricFamilies, register_collector
+
+logger = logging.getLogger("openalgo")
+
+# True once the current request has written, or inside use_primary()
+_primary: ContextVar[bool] = ContextVar("db_primary", default=False)
+
+# 0 when the replica has replayed everything it received; NULL-safe on a primary
+REPLICA_LAG_QUERY = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END AS lag"
+)
+
+class ReplicaState:
+    def __init__(self):
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.last_check: Optional[float] = None
+        self.failed_checks = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+replica = ReplicaState()
+
+def replica_configured() -> bool:
+    return settings.DB_REPLICA_SERVER is not None
+
+def _in_transaction() -> bool:
+    return isinstance(connections.get("default"), TransactionalDBClient)
+
+def reads_from_replica() -> bool:
+    """Whether a read issued here and now would go to the replica"""
+    if not replica_configured() or _primary.get() or not replica.healthy:
+        return False
+    if replica.lag is not None and replica.lag > settings.DB_REPLICA_MAX_LAG:
+        return False
+    return not _in_transaction()
+
+def mark_written() -> None:
+    """Pin the rest of the current request to the primary"""
+    if not _primary.get():
+        _primary.set(True)
+
+@contextmanager
+def use_primary():
+    """Send reads in this block to the primary"""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+def read_connection():
+    """Connection for a raw SQL read, chosen like ORM reads"""
+    if reads_from_replica():
+        replica.replica_reads += 1
+        return Tortoise.get_connection("replica")
+    replica.primary_reads += 1
+    return Tortoise.get_connection("default")
+
+class ReplicaRouter:
+    """Tortoise router; None falls back to the model's default (primary) connection"""
+
+    def db_for_read(self, model) -> Optional[str]:
+        if reads_from_replica():
+            replica.replica_reads += 1
+            return "replica"
+        replica.primary_reads += 1
+        return None
+
+    def db_for_write(self, model) -> Optional[str]:
+        mark_written()
+        return None
+
+async def check_replica(timeout: float) -> bool:
+    """Probe the replica and record its lag; reads avoid it while this fails"""
+    try:
+        client = Tortoise.get_connection("replica")
+        rows = await asyncio.wait_for(client.execute_query_dict(REPLICA_LAG_QUERY), timeout=timeout)
+        lag = rows[0]["lag"]
+        replica.lag = float(lag) if lag is not None else None
+        if not replica.healthy:
+            logger.info("Read replica is healthy again")
+        replica.healthy = True
+    except Exception as e:
+        replica.failed_checks += 1
+        if replica.healthy:
+            logger.error(f"Read replica check failed, reading from the primary: {str(e)}")
+        replica.healthy = False
+    replica.last_check = time.time()
+    if replica.healthy and replica.lag is not None and replica.lag > settings.DB_REPLICA_MAX_LAG:
+        logger.warning(f"Read replica is {replica.lag:.1f}s behind, reading from the primary")
+    return replica.healthy
+
+class _Entry:
+    __slots__ = ("expires_at", "tags", "versions", "value")
+
+    def __init__(self, expires_at: float, tags: Tuple[str, ...], versions: Tuple[int, ...], value: Any):
+        self.expires_at = expires_at
+        self.tags = tags
+        self.versions = versions
+        self.value = value
+
+class QueryCache:
+    """
+    TTL/LRU cache of query results with tag-based invalidation
+
+    Concurrent misses on one key share a single load. Values are shared between
+    requests and must be treated as read-only. None results are not cached.
+    """
+
+    def __init__(self, ttl: float = 2.0, max_entries: int = 10000, enabled: bool = False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    def _current(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic() or entry.versions != self._current(entry.tags):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: Hashable, value: Any, tags: Tuple[str, ...], versions: Tuple[int, ...]) -> None:
+        if versions != self._current(tags):
+            # Invalidated while loading: the value may predate the write
+            return
+        self._entries[key] = _Entry(time.monotonic() + self.ttl, tags, versions, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], tags: Iterable[str] = ()) -> Any:
+        if not self.enabled:
+            return await loader()
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        tags = tuple(tags)
+        versions = self._current(tags)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; retrieve it so an unwaited future does not warn
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+        future.set_result(value)
+        if value is not None:
+            self.put(key, value, tags, versions)
+        return value
+
+    def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+        self.invalidations += len(tags)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+query_cache = QueryCache(
+    ttl=settings.QUERY_CACHE_TTL_SECONDS,
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    enabled=settings.QUERY_CACHE_ENABLED,
+)
+
+def model_tags(instance: Model) -> Tuple[str, ...]:
+    """Tags a saved or deleted row invalidates"""
+    table = instance._meta.db_table
+    user_id = getattr(instance, "user_id", None)
+    return (table,) if user_id is None else (table, f"{table}:user:{user_id}")
+
+async def _invalidate_instance(sender, instance, *args) -> None:
+    query_cache.invalidate(*model_tags(instance))
+
+def _register_invalidation() -> None:
+    for value in vars(models).values():
+        if isinstance(value, type) and issubclass(value, Model) and value is not Model and value.__module__ == models.__name__:
+            value.register_listener(Signals.post_save, _invalidate_instance)
+            value.register_listener(Signals.post_delete, _invalidate_instance)
+
+_register_invalidation()
+
+def _collect(metrics: MetricFamilies) -> None:
+    if replica_configured():
+        metrics.gauge("openalgo_db_replica_healthy", "1 if the read replica passed its last check", {}, int(replica.healthy))
+        metrics.gauge("openalgo_db_replica_lag_seconds", "Replica replay lag at the last check", {}, replica.lag or 0.0)
+        metrics.counter("openalgo_db_reads_total", "Routed reads by connection", {"target": "replica"}, replica.replica_reads)
+        metrics.counter("openalgo_db_reads_total", "Routed reads by connection", {"target": "primary"}, replica.primary_reads)
+    if query_cache.enabled:
+        stats = query_cache.stats()
+        metrics.gauge("openalgo_query_cache_entries", "Cached query results", {}, stats["entries"])
+        metrics.counter("openalgo_query_cache_hits_total", "Query cache hits, including shared loads", {}, stats["hits"])
+        metrics.counter("openalgo_query_cache_misses_total", "Query cache misses", {}, stats["misses"])
+        metrics.counter("openalgo_query_cache_invalidations_total", "Tags invalidated by writes", {}, stats["invalidations"])
+
+register_collector(_collect)
@@ -0,0 +1,200 @@
+"""
+Event-loop stall diagnostics (opt-in with DIAGNOSTICS_ENABLED).
+
+Three pieces, cheap enough to leave on in production:
+
+- Lag sampler: a timer callback re-armed every DIAGNOSTICS_LAG_INTERVAL seconds
+  records how late it fired (the loop lag) in a histogram exported on /metrics.
+  There is no task, only one call_later per interval.
+- Watchdog: a daemon thread checks that the callback keeps firing. Once the
+  loop has been blocked for longer than DIAGNOSTICS_STALL_THRESHOLD, it copies
+  the loop thread's stack via sys._current_frames() while the stall is still
+  happening. This is what asyncio debug mode's slow-callback warning reports,
+  but with the culprit's stack and without debug mode's per-callback overhead.
+  Further samples are taken while the stall lasts, and the most recent stalls
+  are kept for GET /admin/diagnostics.
+- Sampling profiler: `profile(seconds)` samples the stacks of the loop thread
+  (or every thread) at DIAGNOSTICS_PROFILE_HZ and returns folded stacks
+  ("frame;frame;frame count" lines), which flamegraph.pl, speedscope and
+  inferno render directly.
+"""
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+from .config import settings
+from .metrics import Histogram, MetricFamilies, register_collector
+
+logger = logging.getLogger("openalgo")
+
+# Lag buckets: a healthy loop lags well under a millisecond
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_STALL_SAMPLES = 20
+_CWD = os.getcwd() + os.sep
+# Path prefixes trimmed from frame labels: site-packages and the standard library
+_LIB_MARKERS = ("site-packages" + os.sep, f"python{sys.version_info[0]}.{sys.version_info[1]}" + os.sep)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_CWD):
+        filename = filename[len(_CWD):]
+    else:
+        for marker in _LIB_MARKERS:
+            if marker in filename:
+                filename = filename.split(marker, 1)[1]
+                break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+def folded_stack(frame) -> str:
+    """A frame's stack root-first, joined with semicolons"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class LoopMonitor:
+    def __init__(self, interval: float, threshold: float, history: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.recent_stalls = collections.deque(maxlen=history)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _beat(self) -> None:
+        now = time.monotonic()
+        lag = max(0.0, now - self._expected)
+        self.lag.observe(lag)
+        self.max_lag = max(self.max_lag, lag)
+        self._expected = now + self.interval
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self) -> None:
+        stall: Optional[dict] = None
+        while not self._stopping.wait(min(self.interval, self.threshold / 2)):
+            blocked = time.monotonic() - self._expected
+            if blocked < self.threshold:
+                if stall is not None:
+                    stall["blocked_ms"] = round((time.monotonic() - stall["_started"]) * 1000, 1)
+                    logger.warning(f"Event loop was blocked for {stall['blocked_ms']}ms:\n{stall['stack']}")
+                    stall = None
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            if stall is None:
+                self.stalls += 1
+                stall = {
+                    "_started": self._expected,
+                    "detected_at": time.time(),
+                    "blocked_ms": round(blocked * 1000, 1),
+                    "stack": "".join(traceback.format_stack(frame)),
+                    "samples": {},
+                }
+                self.recent_stalls.append(stall)
+            stall["blocked_ms"] = round(blocked * 1000, 1)
+            # Folded samples show where a long stall spent its time, not just where it started
+            sample = folded_stack(frame)
+            if sample in stall["samples"] or len(stall["samples"]) < MAX_STALL_SAMPLES:
+                stall["samples"][sample] = stall["samples"].get(sample, 0) + 1
+            del frame
+
+    def start(self) -> None:
+        if self._handle is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self._handle = self._loop.call_later(self.interval, self._beat)
+        self._stopping.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._stopping.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def stats(self) -> dict:
+        return {
+            "lag": self.lag.snapshot(),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls,
+            "stall_threshold_ms": self.threshold * 1000,
+            # The watchdog may still be adding samples to the newest stall; copy them
+            "recent_stalls": [
+                {**{key: value for key, value in stall.items() if not key.startswith("_")},
+                 "samples": dict(stall["samples"])}
+                for stall in list(self.recent_stalls)
+            ],
+        }
+
+def profile(seconds: float, hz: int, thread_ids: Optional[List[int]] = None) -> str:
+    """
+    Sample stacks for `seconds` at `hz` and return them in folded format
+
+    Blocks the calling thread, so run it in an executor. Samples every thread
+    but this one unless `thread_ids` narrows it down.
+    """
+    counts: Dict[str, int] = collections.Counter()
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    interval = 1.0 / hz
+    deadline = time.monotonic() + seconds
+    next_sample = time.monotonic()
+    while next_sample < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me or (thread_ids is not None and thread_id not in thread_ids):
+                continue
+            counts[f"{names.get(thread_id, thread_id)};{folded_stack(frame)}"] += 1
+        next_sample += interval
+        time.sleep(max(0.0, next_sample - time.monotonic()))
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+monitor = LoopMonitor(settings.DIAGNOSTICS_LAG_INTERVAL, settings.DIAGNOSTICS_STALL_THRESHOLD)
+_profile_lock = threading.Lock()
+
+async def capture_profile(seconds: float, all_threads: bool = False) -> Optional[str]:
+    """Run the sampling profiler off the loop; None if a capture is already running"""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        thread_ids = None if all_threads else [monitor._loop_thread_id or threading.get_ident()]
+        return await asyncio.get_running_loop().run_in_executor(
+            None, profile, seconds, settings.DIAGNOSTICS_PROFILE_HZ, thread_ids
+        )
+    finally:
+        _profile_lock.release()
+
+def start_diagnostics() -> None:
+    if settings.DIAGNOSTICS_ENABLED:
+        monitor.start()
+        logger.info(f"Loop diagnostics on: stalls over {settings.DIAGNOSTICS_STALL_THRESHOLD * 1000:.0f}ms are captured")
+
+def stop_diagnostics() -> None:
+    monitor.stop()
+
+def _collect(metrics: MetricFamilies) -> None:
+    if not settings.DIAGNOSTICS_ENABLED:
+        return
+    metrics.histogram("openalgo_event_loop_lag_seconds", "How late the loop ran a timer due now", {}, monitor.lag)
+    metrics.counter("openalgo_event_loop_stalls_total", "Loop stalls longer than the stall threshold", {}, monitor.stalls)
+
+register_collector(_collect)
@@ -0,0 +1,295 @@
+"""
+Append-only order and trade event log.
+
+Writers call `append_order_event` / `append_trade_event`, which only append to
+an in-memory buffer. The buffer is written with one binary COPY per table
+whenever it reaches EVENT_LOG_BATCH_SIZE rows or EVENT_LOG_FLUSH_INTERVAL
+seconds pass, and once more at shutdown. If a flush fails, its rows go back to
+the front of the buffer. The buffer is capped at EVENT_LOG_MAX_BUFFER rows, and
+the oldest rows are dropped (and counted) beyond that.
+
+order_events and trade_events are range-partitioned by trading day (in
+EVENT_LOG_TIMEZONE) and have no ORM models. Their primary key is
+(user_id, ts, id), so one user's day is a single index range scan in a single
+partition. A BRIN index on ts serves time-range scans across users. Reads are
+keyset-paginated on (ts, id), so deep pages cost the same as the first.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import pytz
+from tortoise import Tortoise
+from .config import settings
+from .db_router import query_cache, read_connection
+from .metrics import Histogram, MetricFamilies, register_collector
+
+logger = logging.getLogger("openalgo")
+
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "order_events": ("ts", "user_id", "order_id", "event", "data"),
+    "trade_events": ("ts", "user_id", "order_id", "trade_id", "symbol", "exchange", "side", "quantity", "price", "data"),
+}
+
+# Held while a daily partition is created, so two workers never race on one
+EVENT_LOG_PARTITION_LOCK_ID = 715_310_003
+
+def _timezone():
+    return pytz.timezone(settings.EVENT_LOG_TIMEZONE)
+
+def trading_day(ts: datetime) -> date:
+    return ts.astimezone(_timezone()).date()
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """[start, end) of a trading day as aware datetimes"""
+    tz = _timezone()
+    start = tz.localize(datetime.combine(day, datetime.min.time()))
+    end = tz.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+def encode_cursor(ts: datetime, event_id: int) -> str:
+    return f"{int(ts.timestamp() * 1_000_000)}:{event_id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    micros, _, event_id = cursor.partition(":")
+    return datetime.fromtimestamp(int(micros) / 1_000_000, tz=timezone.utc), int(event_id)
+
+class EventLog:
+    def __init__(self, batch_size: int, flush_interval: float, max_buffer: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffers: Dict[str, List[tuple]] = {table: [] for table in TABLES}
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.flush_latency = Histogram()
+        self._partitioned_through: Optional[date] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._pending_flush: Optional[asyncio.Task] = None
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(rows) for rows in self.buffers.values())
+
+    def _append(self, table: str, row: tuple) -> None:
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) > self.max_buffer:
+            del buffer[0]
+            self.dropped += 1
+        if len(buffer) >= self.batch_size and (self._pending_flush is None or self._pending_flush.done()):
+            self._pending_flush = asyncio.ensure_future(self.flush())
+
+    def append_order_event(self, user_id: int, order_id: int, event: str, data: Optional[dict] = None,
+                           ts: Optional[datetime] = None) -> None:
+        self._append("order_events", (
+            ts or datetime.now(timezone.utc), user_id, order_id, event, json.dumps(data or {}, default=str)
+        ))
+
+    def append_trade_event(self, user_id: int, order_id: int, trade_id: str, symbol: str, exchange: str,
+                           side: str, quantity: int, price: Decimal, data: Optional[dict] = None,
+                           ts: Optional[datetime] = None) -> None:
+        self._append("trade_events", (
+            ts or datetime.now(timezone.utc), user_id, order_id, trade_id, symbol, exchange, side,
+            quantity, Decimal(str(price)), json.dumps(data or {}, default=str)
+        ))
+
+    async def ensure_partitions(self, first_day: Optional[date] = None, days: Optional[int] = None) -> None:
+        """Create daily partitions from first_day (today by default) for the next `days` days"""
+        first_day = first_day or trading_day(datetime.now(timezone.utc))
+        days = days or settings.EVENT_LOG_PRECREATE_DAYS
+        client = Tortoise.get_connection("default")
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            for table in TABLES:
+                await self._create_partition(client, table, day)
+        self._partitioned_through = first_day + timedelta(days=days - 1)
+
+    async def _create_partition(self, client, table: str, day: date) -> None:
+        """
+        Create one daily partition, moving that day's rows out of the default partition
+
+        Rows written while the partition was missing sit in "<table>_default", and
+        CREATE TABLE ... PARTITION OF would fail on them forever. So the partition
+        is built detached, the rows are moved into it and it is attached, all in
+        one transaction.
+        """
+        partition = f"{table}_{day:%Y%m%d}"
+        start, end = day_bounds(day)
+        async with client.acquire_connection() as conn:
+            if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", f'"{partition}"'):
+                return
+            async with conn.transaction():
+                # Workers run this concurrently; the loser finds the partition already there
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", EVENT_LOG_PARTITION_LOCK_ID)
+                if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", f'"{partition}"'):
+                    return
+                await conn.execute(f'CREATE TABLE "{partition}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                moved = await conn.execute(
+                    f'WITH moved AS (DELETE FROM "{table}_default" WHERE ts >= $1 AND ts < $2 RETURNING *) '
+                    f'INSERT INTO "{partition}" SELECT * FROM moved',
+                    start, end
+                )
+                await conn.execute(
+                    f'ALTER TABLE "{table}" ATTACH PARTITION "{partition}" '
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+        rows = int(moved.rsplit(" ", 1)[-1])
+        if rows:
+            logger.warning(f"Moved {rows} rows from {table}_default into the new partition {partition}")
+
+    async def drop_expired_partitions(self) -> int:
+        """Drop daily partitions older than EVENT_LOG_RETENTION_DAYS (0 keeps everything)"""
+        if settings.EVENT_LOG_RETENTION_DAYS <= 0:
+            return 0
+        cutoff = trading_day(datetime.now(timezone.utc)) - timedelta(days=settings.EVENT_LOG_RETENTION_DAYS)
+        client = Tortoise.get_connection("default")
+        rows = await client.execute_query_dict(
+            "SELECT child.relname AS name FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = ANY($1::text[])",
+            [list(TABLES)]
+        )
+        dropped = 0
+        for row in rows:
+            suffix = row["name"].rsplit("_", 1)[-1]
+            if not suffix.isdigit() or datetime.strptime(suffix, "%Y%m%d").date() >= cutoff:
+                continue
+            await client.execute_script(f'DROP TABLE IF EXISTS "{row["name"]}"')
+            dropped += 1
+        if dropped:
+            logger.info(f"Dropped {dropped} event log partitions older than {cutoff}")
+        return dropped
+
+    async def _copy(self, table: str, rows: List[tuple]) -> None:
+        client = Tortoise.get_connection("default")
+        async with client.acquire_connection() as conn:
+            await conn.copy_records_to_table(table, records=rows, columns=list(TABLES[table]))
+
+    async def flush(self) -> int:
+        """Write everything buffered; returns the number of rows written"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            today = trading_day(datetime.now(timezone.utc))
+            if self._partitioned_through is None or self._partitioned_through <= today:
+                try:
+                    await self.ensure_partitions(today)
+                    await self.drop_expired_partitions()
+                except Exception as e:
+                    # Rows land in the default partitions until the next attempt moves them out
+                    logger.error(f"Could not maintain event log partitions: {str(e)}")
+            written = 0
+            for table in TABLES:
+                rows, self.buffers[table] = self.buffers[table], []
+                if not rows:
+                    continue
+                started = time.perf_counter()
+                try:
+                    await self._copy(table, rows)
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Event log flush of {len(rows)} {table} rows failed: {str(e)}")
+                    # Put them back in order, ahead of anything appended meanwhile
+                    combined = rows + self.buffers[table]
+                    self.dropped += max(0, len(combined) - self.max_buffer)
+                    self.buffers[table] = combined[-self.max_buffer:]
+                    continue
+                self.flush_latency.observe(time.perf_counter() - started)
+                written += len(rows)
+                # Rows come in through COPY, not the ORM, so cached pages are invalidated here
+                query_cache.invalidate(*{f"{table}:user:{row[1]}" for row in rows})
+            self.written += written
+            return written
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.buffered:
+                await self.flush()
+
+    async def start(self) -> None:
+        if self._timer is None:
+            try:
+                await self.ensure_partitions()
+            except Exception as e:
+                # Tables come from migration 5; generate_schemas cannot create them
+                logger.error(f"Event log tables unavailable, run `python migrate.py`: {str(e)}")
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Stop the timer and flush what is left; called from the shutdown hook"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending_flush is not None and not self._pending_flush.done():
+            await self._pending_flush
+        if self.buffered:
+            written = await self.flush()
+            logger.info(f"Event log flushed {written} rows at shutdown")
+        if self.buffered:
+            logger.error(f"Event log lost {self.buffered} unflushed rows at shutdown")
+
+    async def _page(self, table: str, columns: Sequence[str], user_id: int, day: date,
+                    after: Optional[str], limit: int) -> List[dict]:
+        start, end = day_bounds(day)
+        after_ts, after_id = decode_cursor(after) if after else (start, 0)
+        client = read_connection()
+        # Row comparison on (ts, id) walks the primary key (user_id, ts, id) in
+        # order; the ts range prunes every partition but the day's own
+        return await client.execute_query_dict(
+            f'SELECT id, {", ".join(columns)} FROM "{table}" '
+            "WHERE user_id = $1 AND ts >= $2 AND ts < $3 AND (ts, id) > ($4, $5) "
+            "ORDER BY ts, id LIMIT $6",
+            [user_id, start, end, after_ts, after_id, limit]
+        )
+
+    async def page(self, table: str, user_id: int, day: date, after: Optional[str] = None,
+                   limit: int = 500) -> Tuple[List[dict], Optional[str]]:
+        """One page of a user's events for a trading day, plus the cursor for the next page"""
+        rows = await self._page(table, TABLES[table], user_id, day, after, limit)
+        for row in rows:
+            row["data"] = json.loads(row["data"]) if isinstance(row["data"], str) else row["data"]
+        next_cursor = encode_cursor(rows[-1]["ts"], rows[-1]["id"]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    async def stream(self, table: str, user_id: int, day: date, page_size: int = 1000) -> AsyncIterator[dict]:
+        """Every event of a user's trading day, read page by page"""
+        cursor = None
+        while True:
+            rows, cursor = await self.page(table, user_id, day, cursor, page_size)
+            for row in rows:
+                yield row
+            if cursor is None:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self.buffered,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "flush_latency": self.flush_latency.snapshot(),
+        }
+
+event_log = EventLog(
+    batch_size=settings.EVENT_LOG_BATCH_SIZE,
+    flush_interval=settings.EVENT_LOG_FLUSH_INTERVAL,
+    max_buffer=settings.EVENT_LOG_MAX_BUFFER,
+)
+
+def _collect(metrics: MetricFamilies) -> None:
+    stats = event_log.stats()
+    metrics.gauge("openalgo_event_log_buffered", "Events waiting to be written", {}, stats["buffered"])
+    metrics.counter("openalgo_event_log_written_total", "Events written with COPY", {}, stats["written"])
+    metrics.counter("openalgo_event_log_dropped_total", "Events dropped because the buffer was full", {}, stats["dropped"])
+    metrics.counter("openalgo_event_log_flush_failures_total", "Failed COPY flushes", {}, stats["failures"])
+    metrics.histogram("openalgo_event_log_flush_seconds", "Time per COPY flush", {}, event_log.flush_latency)
+
+register_collector(_collect)
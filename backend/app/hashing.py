@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from .config import settings
+from .metrics import Histogram, MetricFamilies, record_phase, register_collector
+
+logger = logging.getLogger("openalgo")
+
+def _timed_call(fn: Callable, *args):
+    """Run fn in the worker and report how long the call itself took"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+class HashingExecutor:
+    """
+    Bounded worker pool for CPU-heavy password hashing.
+
+    bcrypt takes ~250ms per call, so running it on the event loop stalls every
+    other request. Calls are dispatched to a thread pool (bcrypt releases the GIL)
+    or, for multi-core hosts, a process pool. When more than `max_pending` calls
+    are already queued or running, new calls fail fast with 503 instead of
+    piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, kind: str = "thread", max_pending: int = 256, name: str = "password-hash"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported hashing executor kind: {kind}")
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.name = name
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.queue_wait = Histogram()
+        self.hash_time = Histogram()
+        self._executor: Optional[Executor] = None
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        if self.kind == "process":
+            # spawn, not fork: the server process already runs threads (logging, pools)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix=self.name
+            )
+        logger.info(f"Hashing pool {self.name} started ({self.kind}, {self.workers} workers)")
+
+    def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        logger.info(f"Hashing pool {self.name} stopped")
+
+    async def run(self, fn: Callable, *args, wait: bool = False):
+        """
+        Run fn(*args) on the hashing pool
+
+        Args:
+            fn: Module-level callable (must be picklable for the process pool)
+            wait: Skip the fail-fast queue limit, for batch callers that apply
+                  their own backpressure
+        """
+        if not wait and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.start()
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _timed_call, fn, *args
+            )
+        finally:
+            self.pending -= 1
+        waited = max(0.0, time.perf_counter() - submitted - elapsed)
+        self.hash_time.observe(elapsed)
+        self.queue_wait.observe(waited)
+        record_phase("hash", elapsed)
+        record_phase("hash_wait", waited)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.snapshot(),
+            "hash_time": self.hash_time.snapshot(),
+        }
+
+password_hasher = HashingExecutor(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+# Separate pool for bulk imports so they never starve interactive logins.
+# Started lazily on first use.
+bulk_hasher = HashingExecutor(
+    workers=settings.BULK_HASH_WORKERS,
+    kind="process",
+    max_pending=settings.BULK_IMPORT_BATCH_SIZE,
+    name="bulk-hash",
+)
+
+def _collect(metrics: MetricFamilies) -> None:
+    metrics.gauge("openalgo_password_hash_pending", "Hash calls queued or running", {}, password_hasher.pending)
+    metrics.counter("openalgo_password_hash_rejected_total", "Hash calls rejected with 503", {}, password_hasher.rejected)
+    metrics.histogram("openalgo_password_hash_queue_wait_seconds", "Time waiting for a hashing worker", {}, password_hasher.queue_wait)
+    metrics.histogram("openalgo_password_hash_seconds", "Time spent hashing or verifying", {}, password_hasher.hash_time)
+
+register_collector(_collect)
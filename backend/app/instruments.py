@@ -0,0 +1,398 @@
+"""
+Instrument master: symbol to broker token, lot size and tick size.
+
+Broker contract-master CSVs (local paths or URLs in INSTRUMENTS_SOURCES) are
+read in one streaming pass into fixed-width records. The records are sorted and
+written to a single index file, which replaces the old index atomically with
+os.replace. Every worker maps that file read-only, so the kernel page cache
+holds one copy no matter how many workers there are. A worker notices a
+replaced file by its inode and maps the new one. Until then it keeps reading
+the old mapping, which stays valid after the unlink.
+
+Records are sorted on "NORMALIZED\\x1fSYMBOL\\x1fEXCHANGE". NORMALIZED is the
+symbol upper-cased and stripped of punctuation, so one binary search finds an
+exact (exchange, symbol) key, and the same search finds the start of a
+case- and punctuation-insensitive prefix range for search-as-you-type.
+Resolved symbols are memoized per worker, so hot symbols cost one dict hit.
+
+The index header records when it was built and a fingerprint of the source
+files. Startup maps it directly while it is current. It is rebuilt after
+INSTRUMENTS_REFRESH_TIME each trading day (URL sources are downloaded again) or
+when a local CSV changes. Rebuilds take a file lock, so one worker does the work.
+"""
+import asyncio
+import bisect
+import csv
+import fcntl
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import httpx
+import pytz
+from .config import settings
+from .metrics import MetricFamilies, register_collector
+
+logger = logging.getLogger("openalgo")
+
+MAGIC = b"OAINSTR1"
+HEADER = struct.Struct("<8sQd32s")  # magic, record count, built_at (epoch seconds), source fingerprint
+HEADER_SIZE = 64
+KEY_SIZE = 64
+RECORD = struct.Struct(f"<{KEY_SIZE}s24s40sId")  # key, token, name, lot size, tick size
+SEPARATOR = b"\x1f"
+
+# Contract-master column names differ per broker
+COLUMNS = {
+    "token": ("token", "instrument_token", "exchange_token", "symboltoken", "security_id"),
+    "symbol": ("symbol", "tradingsymbol", "trading_symbol"),
+    "exchange": ("exchange", "exch_seg", "exch", "brexchange"),
+    "name": ("name", "company_name", "instrument_name"),
+    "lot_size": ("lot_size", "lotsize", "lot"),
+    "tick_size": ("tick_size", "ticksize", "tick"),
+}
+
+_PUNCTUATION = re.compile(r"[^A-Z0-9]")
+
+class Instrument(NamedTuple):
+    exchange: str
+    symbol: str
+    token: str
+    name: str
+    lot_size: int
+    tick_size: float
+
+def normalize(text: str) -> str:
+    return _PUNCTUATION.sub("", text.upper())
+
+def index_key(exchange: str, symbol: str) -> bytes:
+    symbol = symbol.upper()
+    return SEPARATOR.join((normalize(symbol).encode(), symbol.encode(), exchange.upper().encode()))
+
+class _Keys:
+    """The sorted key column of a mapped index, as a sequence bisect can search"""
+
+    __slots__ = ("buffer", "count")
+
+    def __init__(self, buffer: mmap.mmap, count: int):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = HEADER_SIZE + i * RECORD.size
+        return self.buffer[offset:offset + KEY_SIZE]
+
+def read_header(path: str) -> Optional[Tuple[int, float, bytes]]:
+    """(count, built_at, fingerprint) of an index file, or None if it is missing or not an index"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(raw) < HEADER.size:
+        return None
+    magic, count, built_at, fingerprint = HEADER.unpack(raw)
+    return (count, built_at, fingerprint) if magic == MAGIC else None
+
+class InstrumentMaster:
+    def __init__(self, path: str, memo_size: int = 65536):
+        self.path = path
+        self.memo_size = memo_size
+        self.count = 0
+        self.built_at = 0.0
+        self._map: Optional[mmap.mmap] = None
+        self._keys: Optional[_Keys] = None
+        self._identity: Optional[Tuple[int, int]] = None
+        self._lookup = functools.lru_cache(maxsize=memo_size)(self._resolve)
+        self.lookups = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._map is not None
+
+    def open(self) -> bool:
+        """Map the index file, replacing the current mapping; False if there is no valid index"""
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size < HEADER_SIZE:
+                    return False
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return False
+        magic, count, built_at, _ = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or len(buffer) != HEADER_SIZE + count * RECORD.size:
+            buffer.close()
+            logger.error(f"Ignoring corrupt instrument index {self.path}")
+            return False
+        old = self._map
+        self._map, self._keys = buffer, _Keys(buffer, count)
+        self.count, self.built_at = count, built_at
+        self._identity = (stat.st_ino, stat.st_mtime_ns)
+        self._lookup.cache_clear()
+        self.reloads += 1
+        if old is not None:
+            old.close()
+        return True
+
+    def changed_on_disk(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != self._identity
+
+    def _record(self, i: int) -> Instrument:
+        key, token, name, lot_size, tick_size = RECORD.unpack_from(self._map, HEADER_SIZE + i * RECORD.size)
+        _, symbol, exchange = key.rstrip(b"\0").split(SEPARATOR)
+        return Instrument(
+            exchange.decode(), symbol.decode(), token.rstrip(b"\0").decode(),
+            name.rstrip(b"\0").decode(errors="ignore"), lot_size, tick_size
+        )
+
+    def _resolve(self, exchange: str, symbol: str) -> Optional[Instrument]:
+        if self._keys is None:
+            return None
+        key = index_key(exchange, symbol).ljust(KEY_SIZE, b"\0")
+        i = bisect.bisect_left(self._keys, key)
+        if i < self.count and self._keys[i] == key:
+            return self._record(i)
+        return None
+
+    def lookup(self, exchange: str, symbol: str) -> Optional[Instrument]:
+        """The instrument for an exchange and trading symbol, or None"""
+        self.lookups += 1
+        instrument = self._lookup(exchange, symbol)
+        if instrument is None:
+            self.misses += 1
+        return instrument
+
+    def search(self, query: str, exchange: Optional[str] = None, limit: int = 20) -> List[Instrument]:
+        """Instruments whose symbol starts with `query`, ignoring case and punctuation"""
+        prefix = normalize(query).encode()
+        if self._keys is None or not prefix:
+            return []
+        exchange = exchange.upper() if exchange else None
+        results = []
+        i = bisect.bisect_left(self._keys, prefix)
+        while i < self.count and len(results) < limit:
+            if not self._keys[i].startswith(prefix):
+                break
+            instrument = self._record(i)
+            if exchange is None or instrument.exchange == exchange:
+                results.append(instrument)
+            i += 1
+        return results
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = self._keys = None
+            self._lookup.cache_clear()
+
+    def stats(self) -> dict:
+        return {
+            "instruments": self.count,
+            "built_at": datetime.fromtimestamp(self.built_at, tz=timezone.utc).isoformat() if self.built_at else None,
+            "lookups": self.lookups,
+            "misses": self.misses,
+            "memoized": self._lookup.cache_info().currsize,
+            "reloads": self.reloads,
+        }
+
+def _column(header: List[str], field: str) -> Optional[int]:
+    names = [name.strip().lower() for name in header]
+    for alias in COLUMNS[field]:
+        if alias in names:
+            return names.index(alias)
+    return None
+
+def parse_contract_master(lines: Iterable[str], records: Dict[bytes, bytes]) -> Tuple[int, int]:
+    """Pack each CSV row into `records` (later rows win); returns (rows read, rows skipped)"""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return 0, 0
+    columns = {field: _column(header, field) for field in COLUMNS}
+    if columns["token"] is None or columns["symbol"] is None or columns["exchange"] is None:
+        raise ValueError(f"Contract master needs token, symbol and exchange columns, got {header}")
+
+    def value(row: List[str], field: str, default: str = "") -> str:
+        index = columns[field]
+        return row[index].strip() if index is not None and index < len(row) and row[index].strip() else default
+
+    read = skipped = 0
+    for row in reader:
+        read += 1
+        try:
+            exchange, symbol, token = value(row, "exchange"), value(row, "symbol"), value(row, "token").encode()
+            key = index_key(exchange, symbol)
+            if not (exchange and normalize(symbol) and token) or len(key) > KEY_SIZE or len(token) > 24:
+                raise ValueError("missing or oversized field")
+            lot_size = int(float(value(row, "lot_size", "1")))
+            if lot_size < 1:
+                # Order validation divides by the lot size
+                raise ValueError("lot size below 1")
+            records[key] = RECORD.pack(
+                key, token, value(row, "name").encode()[:40], lot_size, float(value(row, "tick_size", "0.05"))
+            )
+        except (ValueError, IndexError, struct.error):
+            skipped += 1
+    return read, skipped
+
+def build_index(csv_paths: List[str], index_path: str, fingerprint: bytes) -> int:
+    """Parse the CSVs and atomically replace the index file; returns the number of instruments"""
+    records: Dict[bytes, bytes] = {}
+    started = time.perf_counter()
+    for path in csv_paths:
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            read, skipped = parse_contract_master(f, records)
+        if skipped:
+            logger.warning(f"Skipped {skipped} of {read} rows in {path}")
+
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), time.time(), fingerprint).ljust(HEADER_SIZE, b"\0"))
+        # Keys are the leading fixed-width field, so sorting the keys sorts the records
+        for key in sorted(records):
+            f.write(records[key])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+    logger.info(f"Instrument index built: {len(records)} instruments in {time.perf_counter() - started:.2f}s")
+    return len(records)
+
+def _sources() -> List[Tuple[str, str]]:
+    """(source, local CSV path) for every configured source; URLs download into INSTRUMENTS_DIR"""
+    sources = []
+    for source in filter(None, (s.strip() for s in settings.INSTRUMENTS_SOURCES.split(","))):
+        if source.startswith(("http://", "https://")):
+            name = os.path.basename(source.split("?", 1)[0]) or "contract_master.csv"
+            sources.append((source, os.path.join(settings.INSTRUMENTS_DIR, name)))
+        else:
+            sources.append((source, source))
+    return sources
+
+def source_fingerprint(paths: List[str]) -> bytes:
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        except FileNotFoundError:
+            digest.update(f"{path}:missing\n".encode())
+    return digest.digest()
+
+def last_refresh_boundary(now: Optional[datetime] = None) -> datetime:
+    """The most recent INSTRUMENTS_REFRESH_TIME in the trading timezone"""
+    tz = pytz.timezone(settings.EVENT_LOG_TIMEZONE)
+    now = (now or datetime.now(timezone.utc)).astimezone(tz)
+    hour, minute = (int(part) for part in settings.INSTRUMENTS_REFRESH_TIME.split(":"))
+    boundary = tz.localize(datetime.combine(now.date(), datetime.min.time()).replace(hour=hour, minute=minute))
+    return boundary if boundary <= now else boundary - timedelta(days=1)
+
+def index_is_current(index_path: str) -> bool:
+    header = read_header(index_path)
+    if header is None:
+        return False
+    _, built_at, fingerprint = header
+    sources = _sources()
+    if any(source != path for source, path in sources) and built_at < last_refresh_boundary().timestamp():
+        return False
+    return fingerprint == source_fingerprint([path for _, path in sources])
+
+def _download(url: str, path: str) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with httpx.Client(timeout=settings.INSTRUMENTS_DOWNLOAD_TIMEOUT, follow_redirects=True) as client:
+        with client.stream("GET", url) as response:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_bytes(1 << 16):
+                    f.write(chunk)
+    os.replace(tmp_path, path)
+
+def refresh_index(index_path: str, force: bool = False) -> bool:
+    """Download and rebuild under the index lock unless another worker already did; True if rebuilt"""
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    with open(f"{index_path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not force and index_is_current(index_path):
+            return False
+        sources = _sources()
+        for source, path in sources:
+            if source != path:
+                _download(source, path)
+        paths = [path for _, path in sources]
+        build_index(paths, index_path, source_fingerprint(paths))
+        return True
+
+master = InstrumentMaster(
+    os.path.join(settings.INSTRUMENTS_DIR, "instruments.idx"), memo_size=settings.INSTRUMENTS_MEMO_SIZE
+)
+_refresh_task: Optional[asyncio.Task] = None
+_refresh_lock: Optional[asyncio.Lock] = None
+refreshes = 0
+refresh_failures = 0
+
+async def refresh(force: bool = False) -> bool:
+    """Rebuild the index off the event loop if it is stale, then map whatever is newest on disk"""
+    global _refresh_lock, refreshes, refresh_failures
+    if _refresh_lock is None:
+        _refresh_lock = asyncio.Lock()
+    async with _refresh_lock:
+        rebuilt = False
+        if force or not index_is_current(master.path):
+            try:
+                rebuilt = await asyncio.get_running_loop().run_in_executor(None, refresh_index, master.path, force)
+                refreshes += rebuilt
+            except Exception as e:
+                refresh_failures += 1
+                logger.error(f"Instrument master refresh failed: {str(e)}")
+        if not master.loaded or master.changed_on_disk():
+            if master.open():
+                logger.info(f"Instrument index mapped: {master.count} instruments")
+        return rebuilt
+
+async def _refresh_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await refresh()
+
+async def start_instruments() -> None:
+    global _refresh_task
+    if not settings.INSTRUMENTS_SOURCES:
+        # No sources configured; still serve an index that was built elsewhere
+        master.open()
+        return
+    await refresh()
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_periodically(settings.INSTRUMENTS_CHECK_INTERVAL))
+
+def stop_instruments() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+    master.close()
+
+def _collect(metrics: MetricFamilies) -> None:
+    metrics.gauge("openalgo_instruments", "Instruments in the mapped index", {}, master.count)
+    metrics.gauge("openalgo_instruments_index_age_seconds", "Age of the mapped instrument index", {},
+                  time.time() - master.built_at if master.built_at else 0)
+    metrics.counter("openalgo_instrument_lookups_total", "Symbol lookups", {}, master.lookups)
+    metrics.counter("openalgo_instrument_lookup_misses_total", "Symbol lookups with no instrument", {}, master.misses)
+    metrics.counter("openalgo_instrument_refreshes_total", "Index rebuilds done by this worker", {}, refreshes)
+    metrics.counter("openalgo_instrument_refresh_failures_total", "Failed index rebuilds", {}, refresh_failures)
+
+register_collector(_collect)
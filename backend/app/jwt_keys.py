@@ -0,0 +1,320 @@
+"""
+JWT signing and verification keys.
+
+Access tokens are signed with the active key from JWT_KEYS_DIR (one PEM private
+key per file, the file name is the `kid`) using EdDSA (Ed25519) or ES256
+(P-256). Retired keys stay in the directory so tokens they signed keep
+verifying until they expire; rotating is "add a new file, point
+JWT_ACTIVE_KID at it, delete the old file after ACCESS_TOKEN_EXPIRE_MINUTES".
+
+Nodes that only verify tokens set JWKS_URL instead of holding private keys.
+Their key cache is refreshed lazily: when it is older than JWKS_CACHE_SECONDS,
+or when a token names an unknown `kid` (at most once per
+JWKS_MIN_REFRESH_SECONDS, so garbage tokens cannot hammer the issuer).
+
+Keys are parsed once into backend key objects; nothing re-reads PEM per call.
+Without JWT_KEYS_DIR/JWKS_URL tokens keep using HS256 with SECRET_KEY.
+
+    python -m app.jwt_keys generate --dir keys --alg EdDSA
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jose import JWTError, jwk
+from jose import jwt as jose_jwt
+from .config import settings
+
+try:
+    import jwt as pyjwt
+except ImportError:  # PyJWT is optional; required for EdDSA
+    pyjwt = None
+
+logger = logging.getLogger("openalgo")
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def unverified_header(token: str) -> dict:
+    """Decode a token's JOSE header without verifying anything"""
+    try:
+        header = json.loads(_b64decode(token.split(".", 1)[0]))
+    except (ValueError, IndexError):
+        raise JWTError("Malformed token header")
+    if not isinstance(header, dict):
+        raise JWTError("Malformed token header")
+    return header
+
+class JoseBackend:
+    name = "jose"
+    algorithms = ("HS256", "ES256")
+
+    def prepare(self, key, algorithm: str):
+        return jwk.construct(key, algorithm)
+
+    def encode(self, claims: dict, key, algorithm: str, headers: Optional[dict]) -> str:
+        return jose_jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key, algorithm: str) -> dict:
+        return jose_jwt.decode(token, key, algorithms=[algorithm])
+
+class PyJWTBackend:
+    name = "pyjwt"
+    algorithms = ("HS256", "ES256", "EdDSA")
+
+    def prepare(self, key, algorithm: str):
+        # PyJWT uses cryptography key objects as they are
+        return key
+
+    def encode(self, claims: dict, key, algorithm: str, headers: Optional[dict]) -> str:
+        return pyjwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key, algorithm: str) -> dict:
+        try:
+            # iat is not checked, matching python-jose
+            return pyjwt.decode(token, key, algorithms=[algorithm], options={"verify_iat": False})
+        except pyjwt.PyJWTError as e:
+            raise JWTError(str(e))
+
+def get_backend(name: str):
+    if name == "pyjwt" or (name == "auto" and pyjwt is not None):
+        if pyjwt is None:
+            raise RuntimeError("JWT_BACKEND=pyjwt requires the PyJWT package")
+        return PyJWTBackend()
+    if name in ("jose", "auto"):
+        return JoseBackend()
+    raise ValueError(f"Unsupported JWT backend: {name}")
+
+def _algorithm_for(key) -> str:
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and key.curve.name == "secp256r1":
+        return "ES256"
+    raise ValueError(f"Unsupported JWT key type: {type(key).__name__}")
+
+def public_jwk(kid: str, public_key) -> dict:
+    algorithm = _algorithm_for(public_key)
+    if algorithm == "EdDSA":
+        raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return {"kty": "OKP", "crv": "Ed25519", "x": _b64encode(raw), "kid": kid, "alg": algorithm, "use": "sig"}
+    numbers = public_key.public_numbers()
+    return {
+        "kty": "EC",
+        "crv": "P-256",
+        "x": _b64encode(numbers.x.to_bytes(32, "big")),
+        "y": _b64encode(numbers.y.to_bytes(32, "big")),
+        "kid": kid,
+        "alg": algorithm,
+        "use": "sig",
+    }
+
+def public_key_from_jwk(data: dict):
+    if data.get("kty") == "OKP" and data.get("crv") == "Ed25519":
+        return ed25519.Ed25519PublicKey.from_public_bytes(_b64decode(data["x"]))
+    if data.get("kty") == "EC" and data.get("crv") == "P-256":
+        return ec.EllipticCurvePublicNumbers(
+            int.from_bytes(_b64decode(data["x"]), "big"),
+            int.from_bytes(_b64decode(data["y"]), "big"),
+            ec.SECP256R1(),
+        ).public_key()
+    raise ValueError(f"Unsupported JWK: kty={data.get('kty')} crv={data.get('crv')}")
+
+class JWTKey:
+    """A key prepared for the active backend; `signer` is None for verify-only keys"""
+
+    __slots__ = ("kid", "algorithm", "public_key", "signer", "verifier")
+
+    def __init__(self, kid: Optional[str], algorithm: str, public_key, signer, verifier):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.public_key = public_key
+        self.signer = signer
+        self.verifier = verifier
+
+class KeyRing:
+    def __init__(self, backend, legacy_secret: Optional[str] = None, legacy_algorithm: str = "HS256"):
+        self.backend = backend
+        self.active: Optional[JWTKey] = None
+        self.keys: Dict[str, JWTKey] = {}
+        self.legacy: Optional[JWTKey] = None
+        self.jwks_url: Optional[str] = None
+        self.jwks_fetched_at = 0.0
+        self.jwks_attempted_at = 0.0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        if legacy_secret:
+            prepared = backend.prepare(legacy_secret, legacy_algorithm)
+            self.legacy = JWTKey(None, legacy_algorithm, None, prepared, prepared)
+
+    def _add(self, kid: str, public_key, private_key=None) -> JWTKey:
+        algorithm = _algorithm_for(public_key)
+        if algorithm not in self.backend.algorithms:
+            raise RuntimeError(f"{algorithm} keys require the PyJWT backend (JWT_BACKEND=pyjwt)")
+        key = JWTKey(
+            kid,
+            algorithm,
+            public_key,
+            self.backend.prepare(private_key, algorithm) if private_key is not None else None,
+            self.backend.prepare(public_key, algorithm),
+        )
+        self.keys[kid] = key
+        return key
+
+    def load_directory(self, keys_dir: str, active_kid: Optional[str] = None) -> None:
+        """Load every <kid>.pem private key; the active one defaults to the newest file"""
+        newest = None
+        for name in sorted(os.listdir(keys_dir)):
+            if not name.endswith(".pem"):
+                continue
+            path = os.path.join(keys_dir, name)
+            with open(path, "rb") as f:
+                private_key = serialization.load_pem_private_key(f.read(), password=None)
+            kid = name[:-len(".pem")]
+            self._add(kid, private_key.public_key(), private_key)
+            mtime = os.path.getmtime(path)
+            if newest is None or mtime > newest[0]:
+                newest = (mtime, kid)
+        if active_kid:
+            if active_kid not in self.keys:
+                raise RuntimeError(f"JWT_ACTIVE_KID {active_kid} not found in {keys_dir}")
+            self.active = self.keys[active_kid]
+        elif newest is not None:
+            self.active = self.keys[newest[1]]
+        logger.info(
+            f"Loaded {len(self.keys)} JWT keys from {keys_dir} "
+            f"(active kid: {self.active.kid if self.active else None}, backend: {self.backend.name})"
+        )
+
+    def jwks(self) -> dict:
+        return {"keys": [public_jwk(kid, key.public_key) for kid, key in self.keys.items()]}
+
+    def sign(self, claims: dict) -> str:
+        if self.active is not None:
+            return self.backend.encode(claims, self.active.signer, self.active.algorithm, {"kid": self.active.kid})
+        if self.legacy is None:
+            raise RuntimeError("No JWT signing key configured (set JWT_KEYS_DIR or SECRET_KEY)")
+        return self.backend.encode(claims, self.legacy.signer, self.legacy.algorithm, None)
+
+    def _key_for(self, header: dict) -> JWTKey:
+        kid = header.get("kid")
+        if kid is None:
+            if self.legacy is None:
+                raise JWTError("Token has no key id")
+            return self.legacy
+        key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown key id: {kid}")
+        return key
+
+    def verify(self, token: str) -> dict:
+        """Verify a token against cached keys only; never does I/O"""
+        key = self._key_for(unverified_header(token))
+        # The algorithm comes from our key, never from the token header
+        return self.backend.decode(token, key.verifier, key.algorithm)
+
+    def needs_refresh(self, token: str) -> bool:
+        if not self.jwks_url:
+            return False
+        now = time.monotonic()
+        if now - self.jwks_fetched_at > settings.JWKS_CACHE_SECONDS:
+            return now - self.jwks_attempted_at > settings.JWKS_MIN_REFRESH_SECONDS
+        try:
+            kid = unverified_header(token).get("kid")
+        except JWTError:
+            return False
+        return (
+            kid is not None
+            and kid not in self.keys
+            and now - self.jwks_attempted_at > settings.JWKS_MIN_REFRESH_SECONDS
+        )
+
+    async def refresh(self) -> None:
+        """Fetch JWKS_URL and replace the verify-only key set (single flight)"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            self.jwks_attempted_at = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                    entries = response.json()["keys"]
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                logger.warning(f"Could not refresh JWKS from {self.jwks_url}: {str(e)}")
+                return
+            keys = {}
+            for entry in entries:
+                try:
+                    public_key = public_key_from_jwk(entry)
+                    algorithm = _algorithm_for(public_key)
+                    if algorithm not in self.backend.algorithms:
+                        continue
+                    keys[entry["kid"]] = JWTKey(
+                        entry["kid"], algorithm, public_key, None, self.backend.prepare(public_key, algorithm)
+                    )
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping JWKS entry: {str(e)}")
+            # Keep locally held signing keys; replace everything fetched before
+            self.keys = {kid: key for kid, key in self.keys.items() if key.signer is not None}
+            for kid, key in keys.items():
+                self.keys.setdefault(kid, key)
+            self.jwks_fetched_at = time.monotonic()
+            logger.info(f"Refreshed JWKS from {self.jwks_url}: {len(keys)} keys")
+
+    async def verify_async(self, token: str) -> dict:
+        if self.needs_refresh(token):
+            await self.refresh()
+        return self.verify(token)
+
+def build_keyring() -> KeyRing:
+    backend = get_backend(settings.JWT_BACKEND)
+    legacy_secret = settings.SECRET_KEY if settings.JWT_ACCEPT_HS256 else None
+    keyring = KeyRing(backend, legacy_secret, settings.ALGORITHM)
+    if settings.JWT_KEYS_DIR:
+        keyring.load_directory(settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID)
+    keyring.jwks_url = settings.JWKS_URL
+    return keyring
+
+keyring = build_keyring()
+
+def generate_key(keys_dir: str, algorithm: str, kid: Optional[str] = None) -> str:
+    """Write a new private key to keys_dir and return its kid"""
+    if algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    elif algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    kid = kid or datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    os.makedirs(keys_dir, exist_ok=True)
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return kid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage JWT signing keys")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate = subparsers.add_parser("generate", help="Create a new signing key")
+    generate.add_argument("--dir", default=settings.JWT_KEYS_DIR or "keys")
+    generate.add_argument("--alg", choices=ASYMMETRIC_ALGORITHMS, default="EdDSA")
+    generate.add_argument("--kid")
+    args = parser.parse_args()
+    print(generate_key(args.dir, args.alg, args.kid))
@@ -1,38 +1,277 @@
+import atexit
+import json
 import logging
 import logging.handlers
 import os
-from datetime import datetime
+import queue
+import random
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from .config import settings
+from .metrics import MetricFamilies, register_collector
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of sub-WARNING records for the configured loggers
+
+    Rates apply to a logger and its children, e.g. {"uvicorn.access": 0.1}
+    keeps one access log line in ten. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            probe = name
+            while probe:
+                if probe in self.rates:
+                    rate = self.rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+# The path segment after /webhooks/ is an API key (see routers/webhooks.py), and
+# a token= query parameter carries a JWT (old WebSocket clients)
+_URL_SECRETS = (
+    (re.compile(r"(/webhooks/)[^/?#\s]+"), r"\1[redacted]"),
+    (re.compile(r"([?&](?:access_)?token=)[^&#\s\"]+"), r"\1[redacted]"),
+)
+
+def _redact(value: str) -> str:
+    if "/webhooks/" not in value and "token=" not in value:
+        return value
+    for pattern, replacement in _URL_SECRETS:
+        value = pattern.sub(replacement, value)
+    return value
+
+class RedactUrlSecrets(logging.Filter):
+    """
+    Mask API keys and tokens in the URLs uvicorn logs
+
+    ChartInk and TradingView can only authenticate with a key in the URL, and
+    uvicorn logs the full path of every request (uvicorn.access) and WebSocket
+    handshake (uvicorn.error). String arguments are rewritten before any
+    handler formats the record.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple) and any(isinstance(arg, str) for arg in record.args):
+            record.args = tuple(_redact(arg) if isinstance(arg, str) else arg for arg in record.args)
+        return True
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler over a bounded queue
+
+    With the "drop" policy a full queue discards the record (and counts it), so
+    the event loop never waits on log I/O. With "block" the caller waits for space.
+    """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop"):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _parse_sampling(value: str) -> Dict[str, float]:
+    """Parse LOG_SAMPLING ("logger=rate,...", rates between 0 and 1)"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = (part.strip() for part in item.partition("="))
+        try:
+            parsed = float(rate)
+        except ValueError:
+            parsed = -1.0
+        if not name or not 0.0 <= parsed <= 1.0:
+            raise ValueError(f"Invalid LOG_SAMPLING entry {item!r}: expected logger=rate with a rate between 0 and 1")
+        rates[name] = parsed
+    return rates
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[BoundedQueueHandler] = None
+_file_handlers: List[logging.Handler] = []
+
+def _log_path(name: str) -> str:
+    """LOG_DIR/<name>.log, or <name>.<WORKER_ID>.log in a serve.py worker"""
+    worker_id = os.environ.get("WORKER_ID")
+    return os.path.join(settings.LOG_DIR, f"{name}.log" if worker_id is None else f"{name}.{worker_id}.log")
+
+def _open_log_files(formatter: logging.Formatter) -> List[logging.Handler]:
+    """
+    Daily-rotated app and auto-logout files: app.log, app.log.2025-02-14, ...
+
+    Each process must rotate only its own files. Two processes rolling over one
+    file at midnight would each rename it, and the second rename would delete
+    the day the first one had just rotated.
+    """
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        _log_path("app"),
+        when="midnight",
+        backupCount=settings.LOG_BACKUP_DAYS,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(formatter)
+
+    # Auto-logout runs keep their own file
+    auto_logout_handler = logging.handlers.TimedRotatingFileHandler(
+        _log_path("auto_logout"),
+        when="midnight",
+        backupCount=settings.LOG_BACKUP_DAYS,
+        encoding="utf-8",
+    )
+    auto_logout_handler.addFilter(logging.Filter("openalgo.auto_logout"))
+    auto_logout_handler.setFormatter(formatter)
+    return [file_handler, auto_logout_handler]
 
 def setup_logging():
+    """
+    Route all logging through a queue drained by a background thread
+
+    Emitting a record is a cheap enqueue; formatting and file/console I/O happen
+    in the QueueListener thread. Files rotate at midnight and are written as JSON lines.
+    """
+    global _listener, _queue_handler, _file_handlers
+
     # Create logs directory if it doesn't exist
-    log_dir = "logs"
+    log_dir = settings.LOG_DIR
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    # Generate log filename with timestamp
-    current_time = datetime.now().strftime("%Y-%m-%d")
-    log_filename = os.path.join(log_dir, f"app_{current_time}.log")
-
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            # File handler with rotation
-            logging.handlers.RotatingFileHandler(
-                log_filename,
-                maxBytes=10485760,  # 10MB
-                backupCount=5
-            ),
-            # Console handler
-            logging.StreamHandler()
-        ]
+    if _listener is not None:
+        return logging.getLogger("openalgo")
+
+    text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else text_formatter
+
+    _file_handlers = _open_log_files(file_formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(text_formatter)
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = BoundedQueueHandler(log_queue, policy=settings.LOG_QUEUE_POLICY)
+    sampling = _parse_sampling(settings.LOG_SAMPLING)
+    if sampling:
+        _queue_handler.addFilter(SamplingFilter(sampling))
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, *_file_handlers, console_handler,
+        respect_handler_level=True
     )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    # Replace whatever handlers were installed before us (e.g. by basicConfig)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+
+    # Per-request access logs are the hottest path; send them through the queue too
+    access_logger = logging.getLogger("uvicorn.access")
+    for handler in list(access_logger.handlers):
+        access_logger.removeHandler(handler)
+    access_logger.addHandler(_queue_handler)
+    access_logger.propagate = False
+    # On the loggers, so they also cover handlers uvicorn installs later
+    access_logger.addFilter(RedactUrlSecrets())
+    logging.getLogger("uvicorn.error").addFilter(RedactUrlSecrets())
 
     # Create logger
     logger = logging.getLogger("openalgo")
-    
+
     # Log startup message
     logger.info("Logging system initialized")
-    
+
     return logger
+
+def _restart_listener_after_fork() -> None:
+    """The listener thread does not survive fork(); give the child its own queue and thread"""
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+def use_worker_log_files() -> None:
+    """
+    Reopen the log files under this process's WORKER_ID
+
+    serve.py calls this in each worker once WORKER_ID is set. A preloaded app
+    opened app.log in the master, and the workers inherited those handlers.
+    """
+    global _listener, _file_handlers
+    if _listener is None or _file_handlers[0].baseFilename == os.path.abspath(_log_path("app")):
+        return
+    _listener.stop()
+    others = [handler for handler in _listener.handlers if handler not in _file_handlers]
+    formatter = _file_handlers[0].formatter
+    for handler in _file_handlers:
+        handler.close()
+    _file_handlers = _open_log_files(formatter)
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_file_handlers, *others, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def logging_stats() -> dict:
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+    }
+
+def _collect(metrics: MetricFamilies) -> None:
+    stats = logging_stats()
+    metrics.gauge("openalgo_log_queue_size", "Log records waiting to be written", {}, stats["queued"])
+    metrics.counter("openalgo_log_dropped_total", "Log records dropped because the queue was full", {}, stats["dropped"])
+
+register_collector(_collect)
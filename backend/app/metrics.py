@@ -0,0 +1,303 @@
+import asyncio
+import bisect
+import glob
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("openalgo")
+
+# Latency buckets in seconds, tuned for API calls that range from sub-millisecond
+# cache hits up to multi-second bcrypt bursts.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+class Histogram:
+    """Fixed-bucket histogram of observed durations (in seconds)"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One slot per bucket plus the +Inf overflow bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket holding it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.50),
+            "p99": self.quantile(0.99),
+        }
+
+    def state(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+# Wall-clock seconds spent in each startup phase, in execution order
+startup_phases: Dict[str, float] = {}
+
+@contextmanager
+def startup_phase(name: str):
+    """Record how long a startup phase takes so cold-start regressions show up"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = round(time.perf_counter() - started, 4)
+
+# Per-request breakdown (e.g. "db", "hash") filled in while a request is handled
+_request_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_phases", default=None)
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Add time spent in a phase to the current request's breakdown, if any"""
+    phases = _request_phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+# Per-worker registries. Everything runs on the event loop thread, so plain
+# dict/list updates need no locks.
+request_latency: Dict[Tuple[str, str, int], Histogram] = {}
+phase_latency: Dict[Tuple[str, str], Histogram] = {}
+
+class LatencyMiddleware:
+    """
+    Pure ASGI middleware recording latency per route template, method and status
+
+    Unlike BaseHTTPMiddleware it adds no extra task or stream copy per request:
+    it only wraps `send` to catch the response status.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        phases: Dict[str, float] = {}
+        token = _request_phases.set(phases)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_phases.reset(token)
+            # FastAPI stores the matched route in the scope; use its template,
+            # never the raw path, to keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            key = (scope["method"], route, status_code)
+            histogram = request_latency.get(key)
+            if histogram is None:
+                histogram = request_latency[key] = Histogram()
+            histogram.observe(elapsed)
+            for phase, seconds in phases.items():
+                phase_key = (route, phase)
+                histogram = phase_latency.get(phase_key)
+                if histogram is None:
+                    histogram = phase_latency[phase_key] = Histogram()
+                histogram.observe(seconds)
+
+class MetricFamilies:
+    """Collects samples for one exposition: {name: {type, help, samples}}"""
+
+    def __init__(self):
+        self.families: Dict[str, dict] = {}
+
+    def _add(self, kind: str, name: str, help_text: str, labels: dict, value) -> None:
+        family = self.families.setdefault(name, {"type": kind, "help": help_text, "samples": []})
+        family["samples"].append([sorted(labels.items()), value])
+
+    def histogram(self, name: str, help_text: str, labels: dict, histogram: Histogram) -> None:
+        self._add("histogram", name, help_text, labels, histogram.state())
+
+    def counter(self, name: str, help_text: str, labels: dict, value: float) -> None:
+        self._add("counter", name, help_text, labels, value)
+
+    def gauge(self, name: str, help_text: str, labels: dict, value: float) -> None:
+        self._add("gauge", name, help_text, labels, value)
+
+_collectors: List[Callable[[MetricFamilies], None]] = []
+
+def register_collector(collector: Callable[[MetricFamilies], None]) -> None:
+    """Register a callable that adds a subsystem's samples at scrape time"""
+    _collectors.append(collector)
+
+def _collect_requests(metrics: MetricFamilies) -> None:
+    for (method, route, status), histogram in request_latency.items():
+        metrics.histogram(
+            "openalgo_http_request_duration_seconds",
+            "HTTP request latency by route template, method and status",
+            {"method": method, "route": route, "status": str(status)},
+            histogram
+        )
+    for (route, phase), histogram in phase_latency.items():
+        metrics.histogram(
+            "openalgo_http_request_phase_seconds",
+            "Time spent per request in a phase such as db or hash",
+            {"route": route, "phase": phase},
+            histogram
+        )
+    for phase, seconds in startup_phases.items():
+        metrics.gauge(
+            "openalgo_startup_phase_seconds",
+            "Seconds spent in each startup phase",
+            {"phase": phase},
+            seconds
+        )
+
+register_collector(_collect_requests)
+
+def collect() -> Dict[str, dict]:
+    metrics = MetricFamilies()
+    for collector in _collectors:
+        try:
+            collector(metrics)
+        except Exception as e:
+            logger.warning(f"Metrics collector {collector.__name__} failed: {str(e)}")
+    return metrics.families
+
+# Multi-worker aggregation: every worker periodically writes its samples to
+# METRICS_DIR and /metrics merges all files. Histograms and counters are summed;
+# gauges are kept per worker.
+METRICS_STALE_SECONDS = 60
+
+def _worker_file(metrics_dir: str) -> str:
+    return os.path.join(metrics_dir, f"worker_{os.getpid()}.json")
+
+def dump(metrics_dir: str) -> None:
+    path = _worker_file(metrics_dir)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(collect(), f)
+    os.replace(tmp, path)
+
+def aggregate(metrics_dir: Optional[str]) -> Dict[str, dict]:
+    if not metrics_dir:
+        return collect()
+    dump(metrics_dir)
+    merged: Dict[str, dict] = {}
+    now = time.time()
+    for path in glob.glob(os.path.join(metrics_dir, "worker_*.json")):
+        try:
+            if now - os.path.getmtime(path) > METRICS_STALE_SECONDS:
+                continue
+            with open(path) as f:
+                families = json.load(f)
+        except (OSError, ValueError):
+            continue
+        worker = os.path.basename(path)[len("worker_"):-len(".json")]
+        for name, family in families.items():
+            target = merged.setdefault(name, {"type": family["type"], "help": family["help"], "samples": {}})
+            for labels, value in family["samples"]:
+                if family["type"] == "gauge":
+                    labels = labels + [["worker", worker]]
+                key = tuple(tuple(label) for label in labels)
+                existing = target["samples"].get(key)
+                if existing is None:
+                    target["samples"][key] = value
+                elif family["type"] == "histogram":
+                    existing["counts"] = [a + b for a, b in zip(existing["counts"], value["counts"])]
+                    existing["sum"] += value["sum"]
+                    existing["count"] += value["count"]
+                else:
+                    target["samples"][key] = existing + value
+    for family in merged.values():
+        family["samples"] = [[list(key), value] for key, value in family["samples"].items()]
+    return merged
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(pairs) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+def render_prometheus(families: Dict[str, dict]) -> str:
+    """Render families in the Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for name, family in sorted(families.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family["samples"]:
+            labels = [tuple(label) for label in labels]
+            if family["type"] != "histogram":
+                lines.append(f"{name}{{{_labels(labels)}}} {value}" if labels else f"{name} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(value["buckets"] + ["+Inf"], value["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{_labels(labels + [('le', bound)])}}} {cumulative}")
+            suffix = f"{{{_labels(labels)}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {value['sum']}")
+            lines.append(f"{name}_count{suffix} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+_dump_task: Optional[asyncio.Task] = None
+
+async def _dump_periodically(metrics_dir: str, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            dump(metrics_dir)
+        except OSError as e:
+            logger.warning(f"Could not write worker metrics: {str(e)}")
+
+def start_metrics_exporter(metrics_dir: Optional[str], interval: float = 5.0) -> None:
+    """Periodically publish this worker's samples for cross-worker aggregation"""
+    global _dump_task
+    if not metrics_dir or _dump_task is not None:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    _dump_task = asyncio.create_task(_dump_periodically(metrics_dir, interval))
+
+def stop_metrics_exporter(metrics_dir: Optional[str]) -> None:
+    global _dump_task
+    if _dump_task is not None:
+        _dump_task.cancel()
+        _dump_task = None
+    if metrics_dir:
+        try:
+            os.remove(_worker_file(metrics_dir))
+        except OSError:
+            pass
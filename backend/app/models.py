@@ -10,6 +10,7 @@ class User(Model):
     username = fields.CharField(max_length=255, unique=True, index=True)
     hashed_password = fields.CharField(max_length=255)
     is_active = fields.BooleanField(default=True)
+    is_superuser = fields.BooleanField(default=False)
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
@@ -18,3 +19,78 @@ class User(Model):
 
     def __str__(self):
         return self.username
+
+class RefreshSession(Model):
+    """
+    A refresh token, stored only as its SHA-256 digest
+
+    Partial indexes on expires_at (active rows) and revoked_at (revoked rows)
+    are created by migration 2 for the background purge.
+    """
+    id = fields.BigIntField(pk=True)
+    user = fields.ForeignKeyField("models.User", related_name="sessions", on_delete=fields.CASCADE)
+    token_hash = fields.CharField(max_length=64, unique=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField()
+    revoked_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "sessions"
+
+class Strategy(Model):
+    """
+    A signal source (ChartInk scan, TradingView alert, Amibroker AFL) owned by a user
+
+    Webhooks authenticate with an API key of the form oa_<id>_<secret>; only the
+    SHA-256 digest of the full key is stored.
+    """
+    id = fields.IntField(pk=True)
+    user = fields.ForeignKeyField("models.User", related_name="strategies", on_delete=fields.CASCADE)
+    name = fields.CharField(max_length=255)
+    platform = fields.CharField(max_length=32, default="generic")
+    api_key_hash = fields.CharField(max_length=64, unique=True)
+    is_active = fields.BooleanField(default=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "strategies"
+
+    def __str__(self):
+        return self.name
+
+class WebhookAlert(Model):
+    """An accepted webhook signal; (strategy, idempotency_key) is unique so retries are no-ops"""
+    id = fields.BigIntField(pk=True)
+    strategy = fields.ForeignKeyField("models.Strategy", related_name="alerts", on_delete=fields.CASCADE)
+    idempotency_key = fields.CharField(max_length=128)
+    payload = fields.JSONField()
+    received_at = fields.DatetimeField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "webhook_alerts"
+        unique_together = (("strategy", "idempotency_key"),)
+
+class Order(Model):
+    """An order routed to a broker, with its outcome and placement latency"""
+    id = fields.BigIntField(pk=True)
+    user = fields.ForeignKeyField("models.User", related_name="orders", on_delete=fields.CASCADE)
+    strategy = fields.ForeignKeyField("models.Strategy", related_name="orders", null=True, on_delete=fields.SET_NULL)
+    broker = fields.CharField(max_length=32)
+    symbol = fields.CharField(max_length=64)
+    exchange = fields.CharField(max_length=16)
+    side = fields.CharField(max_length=4)
+    quantity = fields.IntField()
+    order_type = fields.CharField(max_length=16)
+    price = fields.DecimalField(max_digits=14, decimal_places=4, null=True)
+    status = fields.CharField(max_length=16, default="pending")
+    broker_order_id = fields.CharField(max_length=64, null=True)
+    error = fields.TextField(null=True)
+    latency_ms = fields.FloatField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "orders"
+        indexes = (("user_id", "created_at"),)
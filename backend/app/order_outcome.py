@@ -0,0 +1,136 @@
+"""
+Records what became of an order, and resolves orders whose outcome is unknown.
+
+`record_outcome` appends an order's status (and fill) events and publishes them
+once the orders row holds the broker's answer.
+
+A request that timed out after it was sent, or whose answer could not be read,
+may or may not have placed the order. Such orders are stored as "unknown", not
+"failed", because clients retry failed orders and would place them twice. Every
+ORDER_RECONCILE_INTERVAL seconds worker 0 looks each unknown order up with its
+broker by tag (our order id). A found order takes the broker's status. One the
+broker still has no record of RECONCILE_NOT_FOUND_GRACE seconds after it was
+created becomes "failed". Orders on brokers whose adapter cannot look orders up
+stay "unknown" for an operator to resolve.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+from . import models, schemas
+from .brokers import BrokerError, BrokerOrder
+from .config import settings
+from .db_router import use_primary
+from .event_log import event_log
+from .metrics import MetricFamilies, register_collector
+from .order_router import order_router
+from .realtime import hub
+
+logger = logging.getLogger("openalgo")
+
+RECONCILE_BATCH_SIZE = 100
+RECONCILE_NOT_FOUND_GRACE = 300  # seconds
+
+async def record_outcome(db_order: models.Order, placed: Optional[BrokerOrder]) -> schemas.Order:
+    """Append the order's events and publish it; returns the API view of the order"""
+    event_log.append_order_event(db_order.user_id, db_order.id, db_order.status, {
+        "broker_order_id": db_order.broker_order_id,
+        "error": db_order.error,
+        "latency_ms": db_order.latency_ms,
+    })
+    trade = None
+    if db_order.status == "complete" and placed is not None:
+        trade = {
+            "order_id": db_order.id,
+            "trade_id": placed.broker_order_id,
+            "symbol": db_order.symbol,
+            "exchange": db_order.exchange,
+            "side": db_order.side,
+            "quantity": db_order.quantity,
+            "price": placed.average_price,
+            "ts": datetime.now(timezone.utc),
+        }
+        event_log.append_trade_event(db_order.user_id, **trade)
+    response = schemas.Order.model_validate(db_order)
+    # The outcome is recorded; a realtime failure must not turn that into an error
+    try:
+        await hub.publish(db_order.user_id, "orders", response.model_dump(mode="json"), key=str(db_order.id))
+        if trade is not None:
+            await hub.publish(db_order.user_id, "trades", trade)
+    except Exception as e:
+        logger.error(f"Could not publish updates for order {db_order.id}: {str(e)}")
+    return response
+
+class UnknownOrderReconciler:
+    def __init__(self):
+        self.found = 0
+        self.not_found = 0
+        # Brokers whose adapter cannot look orders up
+        self.unsupported: Set[str] = set()
+
+    async def run_once(self) -> int:
+        """Resolve up to RECONCILE_BATCH_SIZE unknown orders; returns how many were resolved"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=RECONCILE_NOT_FOUND_GRACE)
+        # A lagging replica could hand back orders that are already resolved
+        with use_primary():
+            query = models.Order.filter(status="unknown")
+            if self.unsupported:
+                query = query.exclude(broker__in=sorted(self.unsupported))
+            orders = await query.order_by("id").limit(RECONCILE_BATCH_SIZE)
+            resolved = 0
+            for db_order in orders:
+                try:
+                    found = await order_router.find(db_order.broker, str(db_order.id))
+                except NotImplementedError:
+                    self.unsupported.add(db_order.broker)
+                    logger.warning(f"Broker {db_order.broker} cannot look up orders; its unknown orders need manual reconciliation")
+                    continue
+                except BrokerError as e:
+                    logger.warning(f"Could not reconcile order {db_order.id}: {str(e)}")
+                    continue
+                if found is not None:
+                    db_order.status = found.status
+                    db_order.broker_order_id = found.broker_order_id
+                    db_order.error = None
+                    self.found += 1
+                elif db_order.created_at <= cutoff:
+                    db_order.status = "failed"
+                    db_order.error = f"{db_order.broker} has no record of this order"
+                    self.not_found += 1
+                else:
+                    continue
+                await db_order.save(update_fields=["status", "broker_order_id", "error", "updated_at"])
+                await record_outcome(db_order, found)
+                logger.info(f"Order {db_order.id} reconciled as {db_order.status}")
+                resolved += 1
+        return resolved
+
+reconciler = UnknownOrderReconciler()
+
+async def _reconcile_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconciler.run_once()
+        except Exception as e:
+            logger.error(f"Order reconciliation failed: {str(e)}")
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+def start_order_reconcile() -> None:
+    global _reconcile_task
+    if _reconcile_task is None and settings.ORDER_RECONCILE_INTERVAL > 0:
+        _reconcile_task = asyncio.create_task(_reconcile_periodically(settings.ORDER_RECONCILE_INTERVAL))
+
+def stop_order_reconcile() -> None:
+    global _reconcile_task
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        _reconcile_task = None
+
+def _collect(metrics: MetricFamilies) -> None:
+    help_text = "Orders with an unknown outcome resolved by reconciliation"
+    metrics.counter("openalgo_orders_reconciled_total", help_text, {"outcome": "found"}, reconciler.found)
+    metrics.counter("openalgo_orders_reconciled_total", help_text, {"outcome": "not_found"}, reconciler.not_found)
+
+register_collector(_collect)
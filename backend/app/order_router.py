@@ -0,0 +1,167 @@
+"""
+Routes orders to broker adapters.
+
+Every broker gets its own channel:
+
+- one pooled, keep-alive httpx client (HTTP/2 when the h2 package is installed)
+- a semaphore capping in-flight orders, so one slow broker cannot soak up
+  every connection and task
+- per-attempt timeouts plus a retry budget. Only failures where the broker
+  certainly did not act are retried: connection errors, connect timeouts and
+  429/503 answers. A timeout after the request was sent, or an answer the
+  adapter cannot read, leaves the order state unknown. It is reported as such
+  (BrokerError.outcome_unknown), never retried, and resolved later by
+  app/order_outcome.py.
+- latency histograms for placement (end to end), slot wait and each attempt,
+  exported per broker on /metrics
+"""
+import asyncio
+import importlib.util
+import logging
+import time
+from typing import Dict, Optional
+import httpx
+from .brokers import BrokerAdapter, BrokerError, BrokerOrder, get_adapter
+from .config import settings
+from .metrics import Histogram, MetricFamilies, record_phase, register_collector
+
+logger = logging.getLogger("openalgo")
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class BrokerChannel:
+    def __init__(self, adapter: BrokerAdapter, max_concurrency: int, max_connections: int,
+                 timeout: float, retries: int, backoff: float, deadline: float):
+        self.adapter = adapter
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.client = adapter.build_client(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.placed = 0
+        self.failed = 0
+        self.retried = 0
+        self.placement_latency = Histogram()
+        self.slot_wait = Histogram()
+        self.attempt_latency = Histogram()
+
+    async def _attempt(self, order, tag: Optional[str]) -> BrokerOrder:
+        started = time.perf_counter()
+        try:
+            return await self.adapter.place_order(self.client, order, tag)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            # The request never reached the broker
+            raise BrokerError(f"Could not reach {self.adapter.name}: {str(e)}", retryable=True)
+        except httpx.TimeoutException:
+            raise BrokerError(f"{self.adapter.name} did not answer in time; order state unknown", outcome_unknown=True)
+        except httpx.HTTPError as e:
+            raise BrokerError(f"{self.adapter.name} request failed; order state unknown: {str(e)}", outcome_unknown=True)
+        except BrokerError:
+            raise
+        except Exception as e:
+            # e.g. a malformed body: the broker answered, but what it did is not known
+            raise BrokerError(f"Could not read the answer from {self.adapter.name}; order state unknown: {e!r}",
+                              outcome_unknown=True)
+        finally:
+            self.attempt_latency.observe(time.perf_counter() - started)
+
+    async def find(self, tag: str) -> Optional[BrokerOrder]:
+        """Look up an order by tag; NotImplementedError if the adapter cannot"""
+        try:
+            return await self.adapter.find_order(self.client, tag)
+        except httpx.HTTPError as e:
+            raise BrokerError(f"Could not look up order {tag} with {self.adapter.name}: {str(e)}")
+
+    async def place(self, order, tag: Optional[str] = None) -> BrokerOrder:
+        started = time.perf_counter()
+        async with self.semaphore:
+            waited = time.perf_counter() - started
+            self.slot_wait.observe(waited)
+            self.in_flight += 1
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        result = await self._attempt(order, tag)
+                        break
+                    except BrokerError as e:
+                        delay = self.backoff * (2 ** attempt)
+                        out_of_budget = time.perf_counter() - started + delay > self.deadline
+                        if not e.retryable or attempt >= self.retries or out_of_budget:
+                            self.failed += 1
+                            raise
+                    attempt += 1
+                    self.retried += 1
+                    await asyncio.sleep(delay)
+            finally:
+                self.in_flight -= 1
+        elapsed = time.perf_counter() - started
+        self.placed += 1
+        self.placement_latency.observe(elapsed)
+        record_phase("broker", elapsed)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "placed": self.placed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "placement_latency": self.placement_latency.snapshot(),
+            "slot_wait": self.slot_wait.snapshot(),
+        }
+
+class OrderRouter:
+    def __init__(self):
+        self.channels: Dict[str, BrokerChannel] = {}
+
+    def channel(self, broker: str) -> BrokerChannel:
+        channel = self.channels.get(broker)
+        if channel is None:
+            # Created on first use so the semaphore and client bind to the running loop
+            channel = self.channels[broker] = BrokerChannel(
+                get_adapter(broker),
+                max_concurrency=settings.BROKER_MAX_CONCURRENCY,
+                max_connections=settings.BROKER_MAX_CONNECTIONS,
+                timeout=settings.BROKER_TIMEOUT,
+                retries=settings.BROKER_RETRIES,
+                backoff=settings.BROKER_RETRY_BACKOFF,
+                deadline=settings.BROKER_ORDER_DEADLINE,
+            )
+            logger.info(f"Broker channel {broker} opened (http2={HTTP2_AVAILABLE})")
+        return channel
+
+    async def place(self, broker: str, order, tag: Optional[str] = None) -> BrokerOrder:
+        """Place an order with a broker, raising BrokerError if it was not accepted"""
+        return await self.channel(broker).place(order, tag)
+
+    async def find(self, broker: str, tag: str) -> Optional[BrokerOrder]:
+        return await self.channel(broker).find(tag)
+
+    async def aclose(self) -> None:
+        for channel in self.channels.values():
+            await channel.client.aclose()
+        self.channels.clear()
+
+    def stats(self) -> dict:
+        return {broker: channel.stats() for broker, channel in self.channels.items()}
+
+order_router = OrderRouter()
+
+def _collect(metrics: MetricFamilies) -> None:
+    for broker, channel in order_router.channels.items():
+        labels = {"broker": broker}
+        metrics.histogram("openalgo_broker_order_seconds", "Order placement latency including retries", labels, channel.placement_latency)
+        metrics.histogram("openalgo_broker_attempt_seconds", "Latency of each request to the broker", labels, channel.attempt_latency)
+        metrics.histogram("openalgo_broker_slot_wait_seconds", "Time waiting under the broker concurrency cap", labels, channel.slot_wait)
+        metrics.gauge("openalgo_broker_orders_in_flight", "Orders currently being placed", labels, channel.in_flight)
+        metrics.counter("openalgo_broker_orders_placed_total", "Orders accepted by the broker", labels, channel.placed)
+        metrics.counter("openalgo_broker_orders_failed_total", "Orders the broker did not accept", labels, channel.failed)
+        metrics.counter("openalgo_broker_retries_total", "Order attempts retried", labels, channel.retried)
+
+register_collector(_collect)
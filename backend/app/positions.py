@@ -0,0 +1,399 @@
+"""
+In-memory position and P&L engine.
+
+Every (user, symbol) position is one slot in a set of parallel NumPy arrays:
+net quantity, average price, realized P&L and unrealized P&L, plus the user and
+symbol index of the slot. Fills update a slot incrementally in O(1). A price
+tick re-marks every slot holding that symbol with one vectorized expression
+over a cached index array, and `mark` re-marks every position of every user at
+once.
+
+The engine follows the "trades" realtime channel. The worker that placed an
+order applies its fill inside Hub.publish, and with REALTIME_BRIDGE on, other
+workers apply it when the NOTIFY arrives. NOTIFY is best effort (updates sent
+while the bridge reconnects are lost), so every POSITION_RECONCILE_INTERVAL
+seconds each worker also replays the last few minutes of trade_events. Fills
+are keyed by (order_id, trade_id), so a fill seen both ways is applied once.
+
+Dirty slots are upserted into position_snapshots every
+POSITION_SNAPSHOT_INTERVAL seconds, together with a watermark (the newest fill
+applied). On startup the engine loads the snapshot and replays trade_events
+newer than the watermark.
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from tortoise import Tortoise
+from .config import settings
+from .metrics import Histogram, MetricFamilies, register_collector
+from .realtime import hub
+
+logger = logging.getLogger("openalgo")
+
+# Snapshot writers take this transaction-level advisory lock, so two workers never interleave
+POSITION_SNAPSHOT_LOCK_ID = 715_310_002
+REPLAY_PAGE_SIZE = 5000
+# How far back reconciliation looks; comfortably longer than an event log flush
+RECONCILE_LOOKBACK_SECONDS = 300
+
+def symbol_key(exchange: str, symbol: str) -> str:
+    return f"{exchange}:{symbol}"
+
+class PositionEngine:
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._allocate(max(1, capacity))
+        self._slots: Dict[Tuple[int, str], int] = {}
+        self._users: Dict[int, int] = {}
+        self._user_ids: List[int] = []
+        self._user_slots: Dict[int, List[int]] = {}
+        self._symbols: Dict[str, int] = {}
+        self._symbol_names: List[str] = []
+        self._symbol_slots: List[List[int]] = []
+        self._symbol_slot_arrays: Dict[int, np.ndarray] = {}
+        self.last_price = np.full(64, np.nan)
+        self.dirty = np.zeros(self.capacity, dtype=bool)
+        self.watermark: Optional[datetime] = None
+        # Fills before this are in the loaded snapshot; reconciliation never looks further back
+        self.restored_through: Optional[datetime] = None
+        self._applied: "OrderedDict[Tuple[int, str], datetime]" = OrderedDict()
+        self.fills = 0
+        self.duplicates = 0
+        self.reconciled = 0
+        self.ticks = 0
+        self.snapshot_latency = Histogram()
+
+    def _allocate(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.quantity = np.zeros(capacity, dtype=np.int64)
+        self.avg_price = np.zeros(capacity, dtype=np.float64)
+        self.realized = np.zeros(capacity, dtype=np.float64)
+        self.unrealized = np.zeros(capacity, dtype=np.float64)
+        self.user_index = np.zeros(capacity, dtype=np.int32)
+        self.symbol_index = np.zeros(capacity, dtype=np.int32)
+
+    def _grow(self) -> None:
+        capacity = self.capacity * 2
+        for name in ("quantity", "avg_price", "realized", "unrealized", "user_index", "symbol_index", "dirty"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def _symbol(self, key: str) -> int:
+        index = self._symbols.get(key)
+        if index is None:
+            index = self._symbols[key] = len(self._symbol_names)
+            self._symbol_names.append(key)
+            self._symbol_slots.append([])
+            if index >= len(self.last_price):
+                self.last_price = np.concatenate([self.last_price, np.full(len(self.last_price), np.nan)])
+        return index
+
+    def _slot(self, user_id: int, key: str) -> int:
+        slot = self._slots.get((user_id, key))
+        if slot is not None:
+            return slot
+        if self.size == self.capacity:
+            self._grow()
+        slot = self.size
+        self.size += 1
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = len(self._user_ids)
+            self._user_ids.append(user_id)
+        symbol = self._symbol(key)
+        self.user_index[slot] = user
+        self.symbol_index[slot] = symbol
+        self._slots[(user_id, key)] = slot
+        self._user_slots.setdefault(user_id, []).append(slot)
+        self._symbol_slots[symbol].append(slot)
+        self._symbol_slot_arrays.pop(symbol, None)
+        return slot
+
+    def apply_fill(self, user_id: int, exchange: str, symbol: str, side: str, quantity: int, price: float,
+                   ts: Optional[datetime] = None) -> None:
+        """Apply one fill: average up/down, or realize P&L on the closed quantity"""
+        slot = self._slot(user_id, symbol_key(exchange, symbol))
+        held = int(self.quantity[slot])
+        avg = float(self.avg_price[slot])
+        signed = quantity if side == "BUY" else -quantity
+        new_held = held + signed
+        if held == 0 or (held > 0) == (signed > 0):
+            avg = (avg * abs(held) + price * abs(signed)) / abs(new_held)
+        else:
+            closed = min(abs(signed), abs(held))
+            self.realized[slot] += closed * (price - avg) * (1 if held > 0 else -1)
+            if new_held == 0:
+                avg = 0.0
+            elif (new_held > 0) != (held > 0):
+                # Flipped from long to short or back: the remainder opens at this price
+                avg = price
+        self.quantity[slot] = new_held
+        self.avg_price[slot] = avg
+        mark = self.last_price[self.symbol_index[slot]]
+        self.unrealized[slot] = 0.0 if np.isnan(mark) else (mark - avg) * new_held
+        self.dirty[slot] = True
+        self.fills += 1
+        if ts is not None and (self.watermark is None or ts > self.watermark):
+            self.watermark = ts
+
+    def _slots_for(self, symbol: int) -> np.ndarray:
+        slots = self._symbol_slot_arrays.get(symbol)
+        if slots is None:
+            slots = self._symbol_slot_arrays[symbol] = np.array(self._symbol_slots[symbol], dtype=np.int64)
+        return slots
+
+    def on_tick(self, exchange: str, symbol: str, price: float) -> None:
+        """Mark every position in one symbol, across all users, to a new price"""
+        index = self._symbols.get(symbol_key(exchange, symbol))
+        self.ticks += 1
+        if index is None:
+            return
+        self.last_price[index] = price
+        slots = self._slots_for(index)
+        self.unrealized[slots] = (price - self.avg_price[slots]) * self.quantity[slots]
+
+    def mark(self, keys: Sequence[str], prices: Sequence[float]) -> None:
+        """Apply a batch of "EXCHANGE:SYMBOL" prices, then re-mark every position at once"""
+        for key, price in zip(keys, prices):
+            index = self._symbols.get(key)
+            if index is not None:
+                self.last_price[index] = price
+        self.ticks += len(keys)
+        n = self.size
+        marks = self.last_price[self.symbol_index[:n]]
+        self.unrealized[:n] = np.where(np.isnan(marks), 0.0, (marks - self.avg_price[:n]) * self.quantity[:n])
+
+    def positions(self, user_id: int) -> List[dict]:
+        result = []
+        for slot in self._user_slots.get(user_id, ()):
+            exchange, _, symbol = self._symbol_names[self.symbol_index[slot]].partition(":")
+            mark = self.last_price[self.symbol_index[slot]]
+            result.append({
+                "exchange": exchange,
+                "symbol": symbol,
+                "quantity": int(self.quantity[slot]),
+                "average_price": round(float(self.avg_price[slot]), 4),
+                "last_price": None if np.isnan(mark) else float(mark),
+                "realized_pnl": round(float(self.realized[slot]), 2),
+                "unrealized_pnl": round(float(self.unrealized[slot]), 2),
+            })
+        return result
+
+    def totals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Realized and unrealized P&L per user index, summed with one bincount each"""
+        n = self.size
+        users = len(self._user_ids)
+        return (
+            np.bincount(self.user_index[:n], weights=self.realized[:n], minlength=users),
+            np.bincount(self.user_index[:n], weights=self.unrealized[:n], minlength=users),
+        )
+
+    def apply_trade(self, user_id: int, order_id: int, trade_id: str, exchange: str, symbol: str, side: str,
+                    quantity: int, price: float, ts: datetime) -> bool:
+        """Apply a fill unless this (order_id, trade_id) was already applied; returns whether it was"""
+        key = (int(order_id), str(trade_id))
+        if key in self._applied:
+            self.duplicates += 1
+            return False
+        self._applied[key] = ts
+        # Keys outlive the reconciliation window, so nothing still scanned is forgotten
+        self.forget_applied(ts - timedelta(seconds=2 * RECONCILE_LOOKBACK_SECONDS))
+        self.apply_fill(user_id, exchange, symbol, side, quantity, price, ts)
+        return True
+
+    def forget_applied(self, before: datetime) -> None:
+        """Drop dedup keys of fills older than `before` (they arrive roughly in ts order)"""
+        while self._applied:
+            key, ts = next(iter(self._applied.items()))
+            if ts >= before:
+                break
+            del self._applied[key]
+
+    def on_trade_message(self, user_id: Optional[int], message: str) -> None:
+        if user_id is None:
+            return
+        trade = json.loads(message)["data"]
+        self.apply_trade(
+            user_id, trade["order_id"], trade["trade_id"], trade["exchange"], trade["symbol"], trade["side"],
+            int(trade["quantity"]), float(trade["price"]), datetime.fromisoformat(trade["ts"])
+        )
+
+    def load_row(self, user_id: int, key: str, quantity: int, avg_price: float, realized: float) -> None:
+        slot = self._slot(user_id, key)
+        self.quantity[slot] = quantity
+        self.avg_price[slot] = avg_price
+        self.realized[slot] = realized
+
+    async def snapshot(self) -> int:
+        """Upsert dirty positions and the watermark; returns the number of rows written"""
+        slots = np.flatnonzero(self.dirty[:self.size])
+        if not len(slots):
+            return 0
+        # Capture synchronously so the rows and the watermark describe the same state
+        rows = (
+            [self._user_ids[i] for i in self.user_index[slots]],
+            [self._symbol_names[i] for i in self.symbol_index[slots]],
+            self.quantity[slots].tolist(),
+            self.avg_price[slots].tolist(),
+            self.realized[slots].tolist(),
+        )
+        watermark = self.watermark
+        self.dirty[slots] = False
+        started = asyncio.get_running_loop().time()
+        client = Tortoise.get_connection("default")
+        try:
+            async with client.acquire_connection() as conn:
+                async with conn.transaction():
+                    if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", POSITION_SNAPSHOT_LOCK_ID):
+                        self.dirty[slots] = True
+                        return 0
+                    await conn.execute(
+                        "INSERT INTO position_snapshots (user_id, symbol, quantity, avg_price, realized_pnl, updated_at) "
+                        "SELECT *, now() FROM unnest($1::int[], $2::text[], $3::bigint[], $4::float8[], $5::float8[]) "
+                        "ON CONFLICT (user_id, symbol) DO UPDATE SET quantity = EXCLUDED.quantity, "
+                        "avg_price = EXCLUDED.avg_price, realized_pnl = EXCLUDED.realized_pnl, updated_at = now()",
+                        *rows
+                    )
+                    await conn.execute(
+                        "INSERT INTO position_snapshot_state (id, as_of) VALUES (1, $1) "
+                        "ON CONFLICT (id) DO UPDATE SET as_of = GREATEST(position_snapshot_state.as_of, EXCLUDED.as_of)",
+                        watermark
+                    )
+        except Exception:
+            self.dirty[slots] = True
+            raise
+        self.snapshot_latency.observe(asyncio.get_running_loop().time() - started)
+        return len(slots)
+
+    async def restore(self) -> int:
+        """Load the last snapshot, then replay newer trades from the event log"""
+        client = Tortoise.get_connection("default")
+        for row in await client.execute_query_dict(
+            "SELECT user_id, symbol, quantity, avg_price, realized_pnl FROM position_snapshots"
+        ):
+            self.load_row(row["user_id"], row["symbol"], row["quantity"], row["avg_price"], row["realized_pnl"])
+        state = await client.execute_query_dict("SELECT as_of FROM position_snapshot_state WHERE id = 1")
+        self.watermark = self.restored_through = state[0]["as_of"] if state else None
+
+        replayed = 0
+        after = (self.watermark or datetime(1970, 1, 1, tzinfo=timezone.utc), 0)
+        while True:
+            # ts-ordered scan across users, served by the BRIN index on ts
+            trades = await client.execute_query_dict(
+                "SELECT id, ts, user_id, order_id, trade_id, symbol, exchange, side, quantity, price FROM trade_events "
+                "WHERE ts > $1 OR (ts = $1 AND id > $2) ORDER BY ts, id LIMIT $3",
+                [after[0], after[1], REPLAY_PAGE_SIZE]
+            )
+            for trade in trades:
+                if self.restored_through is not None and trade["ts"] <= self.restored_through:
+                    continue
+                replayed += self.apply_trade(trade["user_id"], trade["order_id"], trade["trade_id"], trade["exchange"],
+                                             trade["symbol"], trade["side"], trade["quantity"], float(trade["price"]),
+                                             trade["ts"])
+            if len(trades) < REPLAY_PAGE_SIZE:
+                break
+            after = (trades[-1]["ts"], trades[-1]["id"])
+        self.dirty[:self.size] = replayed > 0
+        return replayed
+
+    async def reconcile(self) -> int:
+        """Apply recent fills from trade_events that never reached this worker; returns how many"""
+        since = datetime.now(timezone.utc) - timedelta(seconds=RECONCILE_LOOKBACK_SECONDS)
+        if self.restored_through is not None and self.restored_through > since:
+            since = self.restored_through
+        trades = await Tortoise.get_connection("default").execute_query_dict(
+            "SELECT ts, user_id, order_id, trade_id, symbol, exchange, side, quantity, price FROM trade_events "
+            "WHERE ts > $1 ORDER BY ts, id",
+            [since]
+        )
+        applied = 0
+        for trade in trades:
+            applied += self.apply_trade(trade["user_id"], trade["order_id"], trade["trade_id"], trade["exchange"],
+                                        trade["symbol"], trade["side"], trade["quantity"], float(trade["price"]),
+                                        trade["ts"])
+        if applied:
+            logger.warning(f"Position reconciliation applied {applied} fills this worker had missed")
+        self.reconciled += applied
+        return applied
+
+    def stats(self) -> dict:
+        return {
+            "positions": self.size,
+            "users": len(self._user_ids),
+            "symbols": len(self._symbol_names),
+            "fills": self.fills,
+            "duplicates": self.duplicates,
+            "reconciled": self.reconciled,
+            "ticks": self.ticks,
+            "dirty": int(self.dirty[:self.size].sum()),
+            "snapshot_latency": self.snapshot_latency.snapshot(),
+        }
+
+engine = PositionEngine(capacity=settings.POSITION_INITIAL_CAPACITY)
+hub.add_listener("trades", engine.on_trade_message)
+
+async def _snapshot_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await engine.snapshot()
+        except Exception as e:
+            logger.error(f"Position snapshot failed: {str(e)}")
+
+async def _reconcile_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await engine.reconcile()
+        except Exception as e:
+            logger.error(f"Position reconciliation failed: {str(e)}")
+
+_snapshot_task: Optional[asyncio.Task] = None
+_reconcile_task: Optional[asyncio.Task] = None
+
+async def start_positions() -> None:
+    global _snapshot_task, _reconcile_task
+    try:
+        replayed = await engine.restore()
+        logger.info(f"Positions restored: {engine.size} positions, {replayed} trades replayed")
+    except Exception as e:
+        logger.error(f"Could not restore positions, starting empty: {str(e)}")
+    # Every worker holds every position (see REALTIME_BRIDGE), so one worker writes the snapshots
+    if _snapshot_task is None and settings.POSITION_SNAPSHOT_INTERVAL > 0 and settings.WORKER_ID == 0:
+        _snapshot_task = asyncio.create_task(_snapshot_periodically(settings.POSITION_SNAPSHOT_INTERVAL))
+    if _reconcile_task is None and settings.POSITION_RECONCILE_INTERVAL > 0:
+        _reconcile_task = asyncio.create_task(_reconcile_periodically(settings.POSITION_RECONCILE_INTERVAL))
+
+async def stop_positions() -> None:
+    global _snapshot_task, _reconcile_task
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+        _snapshot_task = None
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        _reconcile_task = None
+    if settings.WORKER_ID != 0:
+        return
+    try:
+        await engine.snapshot()
+    except Exception as e:
+        logger.error(f"Final position snapshot failed: {str(e)}")
+
+def _collect(metrics: MetricFamilies) -> None:
+    stats = engine.stats()
+    metrics.gauge("openalgo_positions", "Open or closed positions held in memory", {}, stats["positions"])
+    metrics.gauge("openalgo_positions_dirty", "Positions changed since the last snapshot", {}, stats["dirty"])
+    metrics.counter("openalgo_position_fills_total", "Fills applied to the position engine", {}, stats["fills"])
+    metrics.counter("openalgo_position_duplicate_fills_total", "Fills skipped because they were already applied", {}, stats["duplicates"])
+    metrics.counter("openalgo_position_reconciled_fills_total", "Missed fills applied from trade_events", {}, stats["reconciled"])
+    metrics.counter("openalgo_position_ticks_total", "Price ticks marked", {}, stats["ticks"])
+    metrics.histogram("openalgo_position_snapshot_seconds", "Time per position snapshot", {}, engine.snapshot_latency)
+
+register_collector(_collect)
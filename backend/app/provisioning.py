@@ -0,0 +1,200 @@
+"""
+Bulk user provisioning from CSV or JSON-lines streams.
+
+Rows are processed in batches. For each batch:
+
+1. validate with the same rules as /auth/register (schemas.UserCreate)
+2. drop duplicates within the import and against existing users, using one
+   set-based query per batch, before spending any bcrypt time
+3. hash the remaining passwords in parallel on the bulk hashing process pool
+4. COPY the batch into a temp table and INSERT ... ON CONFLICT DO NOTHING from it,
+   so a concurrent sign-up for the same name is reported rather than failing the batch
+
+Each input row produces one result dict, yielded as soon as its batch is done.
+"""
+import asyncio
+import codecs
+import csv
+import json
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from pydantic import ValidationError
+from tortoise import Tortoise
+from . import auth, schemas
+from .config import settings
+from .hashing import bulk_hasher
+
+logger = logging.getLogger("openalgo")
+
+FORMATS = ("csv", "jsonl")
+
+class _Row:
+    __slots__ = ("line", "email", "username", "password", "result")
+
+    def __init__(self, line: int, email: Optional[str], username: Optional[str], password: Optional[str]):
+        self.line = line
+        self.email = email
+        self.username = username
+        self.password = password
+        self.result: Optional[Dict] = None
+
+    def finish(self, status: str, **extra) -> None:
+        self.result = {"line": self.line, "username": self.username, "status": status, **extra}
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into decoded text lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+async def iter_file_chunks(path: str, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    """Read a local file in chunks for the CLI, yielding to the loop in between"""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+            await asyncio.sleep(0)
+
+async def _parse(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[_Row]:
+    header: Optional[List[str]] = None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [name.strip().lower() for name in values]
+                    continue
+                data = dict(zip(header, values))
+            else:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+        except (ValueError, csv.Error) as e:
+            row = _Row(line_no, None, None, None)
+            row.finish("invalid", error=f"Could not parse row: {str(e)}")
+            yield row
+            continue
+        yield _Row(line_no, data.get("email"), data.get("username"), data.get("password"))
+
+def _validate(rows: Iterable[_Row], seen_emails: set, seen_usernames: set) -> List[_Row]:
+    valid = []
+    for row in rows:
+        if row.result is not None:
+            continue
+        try:
+            user = schemas.UserCreate(email=row.email, username=row.username, password=row.password)
+        except ValidationError as e:
+            row.finish("invalid", error="; ".join(error["msg"] for error in e.errors()))
+            continue
+        row.email = user.email
+        if user.email in seen_emails or user.username in seen_usernames:
+            row.finish("duplicate", error="Email or username repeated in this import")
+            continue
+        seen_emails.add(user.email)
+        seen_usernames.add(user.username)
+        valid.append(row)
+    return valid
+
+async def _process_batch(batch: List[_Row], seen_emails: set, seen_usernames: set) -> None:
+    rows = _validate(batch, seen_emails, seen_usernames)
+    if not rows:
+        return
+
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as conn:
+        existing = await conn.fetch(
+            "SELECT email, username FROM users "
+            "WHERE email = ANY($1::text[]) OR username = ANY($2::text[])",
+            [row.email for row in rows],
+            [row.username for row in rows],
+        )
+    taken_emails = {record["email"] for record in existing}
+    taken_usernames = {record["username"] for record in existing}
+    new_rows = []
+    for row in rows:
+        if row.email in taken_emails or row.username in taken_usernames:
+            row.finish("exists", error="Email or username already registered")
+        else:
+            new_rows.append(row)
+    if not new_rows:
+        return
+
+    hashes = await asyncio.gather(*(
+        bulk_hasher.run(auth.get_password_hash, row.password, wait=True) for row in new_rows
+    ))
+
+    async with client.acquire_connection() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS users_import "
+                "(email TEXT, username TEXT, hashed_password TEXT) ON COMMIT DELETE ROWS"
+            )
+            await conn.copy_records_to_table(
+                "users_import",
+                records=[(row.email, row.username, hashed) for row, hashed in zip(new_rows, hashes)],
+                columns=["email", "username", "hashed_password"],
+            )
+            inserted = await conn.fetch(
+                "INSERT INTO users (email, username, hashed_password, is_active, is_superuser, created_at, updated_at) "
+                "SELECT email, username, hashed_password, TRUE, FALSE, now(), now() FROM users_import "
+                "ON CONFLICT DO NOTHING RETURNING id, username"
+            )
+    ids = {record["username"]: record["id"] for record in inserted}
+    for row in new_rows:
+        if row.username in ids:
+            row.finish("created", id=ids[row.username])
+        else:
+            row.finish("exists", error="Email or username already registered")
+
+async def import_users(
+    chunks: AsyncIterator[bytes],
+    fmt: str = "csv",
+    batch_size: int = settings.BULK_IMPORT_BATCH_SIZE,
+) -> AsyncIterator[Dict]:
+    """
+    Import users from a byte stream, yielding one result per input row
+
+    Args:
+        chunks: Raw CSV (with an email,username,password header) or JSON-lines data
+        fmt: "csv" or "jsonl"
+        batch_size: Rows validated, hashed and inserted together
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    seen_emails: set = set()
+    seen_usernames: set = set()
+    batch: List[_Row] = []
+    created = 0
+    total = 0
+
+    async def flush():
+        nonlocal created, total
+        await _process_batch(batch, seen_emails, seen_usernames)
+        for row in batch:
+            total += 1
+            created += row.result["status"] == "created"
+            yield row.result
+        batch.clear()
+
+    async for row in _parse(iter_lines(chunks), fmt):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            async for result in flush():
+                yield result
+    if batch:
+        async for result in flush():
+            yield result
+    logger.info(f"Bulk import finished: {created} of {total} rows created")
@@ -0,0 +1,347 @@
+"""
+Shared storage backends for the slowapi rate limiter.
+
+slowapi's default ``memory://`` storage keeps counters inside each process, so
+with N uvicorn workers the effective limit is N times the configured one. The
+backends here are registered with the ``limits`` library by URI scheme and can
+be selected through ``RATE_LIMIT_STORAGE_URI``:
+
+- ``openalgo+postgres://`` - counters in Postgres, one atomic upsert per hit.
+  A bare URI uses the POSTGRES_* settings. The calls are synchronous, so
+  ``rate_limiter.rate_limit()`` runs the check in a thread pool, off the event loop.
+- ``openalgo+shm://<name>`` - counters in a memory-mapped file under /dev/shm,
+  shared by every worker on the host.
+
+Both support the fixed-window strategies (via ``incr``) and the moving-window
+strategy, which is implemented as a token bucket (GCRA): each key stores only
+the time at which its bucket is full again.
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlparse
+from limits.storage import MovingWindowSupport, Storage
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+class PostgresStorage(Storage, MovingWindowSupport):
+    """Rate limit counters stored in UNLOGGED Postgres tables"""
+
+    STORAGE_SCHEME = ["openalgo+postgres"]
+
+    CLEANUP_EVERY_HITS = 1000
+    CLEANUP_INTERVAL = 60.0
+    CLEANUP_BATCH_SIZE = 1000
+
+    def __init__(self, uri: str, pool_size: int = 4, **options):
+        import psycopg2
+        import psycopg2.pool
+
+        super().__init__(uri, **options)
+        parsed = urlparse(uri)
+        if parsed.hostname:
+            dsn = "postgresql" + uri[len(parsed.scheme):]
+        else:
+            dsn = (
+                f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
+                f"@{settings.POSTGRES_SERVER}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+            )
+        self._psycopg2 = psycopg2
+        self._dsn = dsn
+        self._pool_size = pool_size
+        self._pool = psycopg2.pool.ThreadedConnectionPool(1, pool_size, dsn)
+        self._pid = os.getpid()
+        self._hits = 0
+        self._next_cleanup = time.monotonic() + self.CLEANUP_INTERVAL
+        with self._cursor() as cur:
+            cur.execute("""
+                CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_counters (
+                    key TEXT PRIMARY KEY,
+                    count BIGINT NOT NULL,
+                    expires_at TIMESTAMPTZ NOT NULL
+                );
+                CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    full_at TIMESTAMPTZ NOT NULL
+                );
+            """)
+
+    @property
+    def base_exceptions(self):
+        return self._psycopg2.Error
+
+    @contextmanager
+    def _cursor(self):
+        # Connections must not be shared across fork(); leave the parent's alone and open our own
+        if self._pid != os.getpid():
+            self._pool = self._psycopg2.pool.ThreadedConnectionPool(1, self._pool_size, self._dsn)
+            self._pid = os.getpid()
+        conn = self._pool.getconn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                yield cur
+        finally:
+            self._pool.putconn(conn)
+
+    def _after_hit(self, cur) -> None:
+        """Purge expired rows in bounded batches every N hits or T seconds"""
+        self._hits += 1
+        now = time.monotonic()
+        if self._hits < self.CLEANUP_EVERY_HITS and now < self._next_cleanup:
+            return
+        self._hits = 0
+        self._next_cleanup = now + self.CLEANUP_INTERVAL
+        cur.execute("""
+            DELETE FROM rate_limit_counters WHERE key IN (
+                SELECT key FROM rate_limit_counters WHERE expires_at < now()
+                LIMIT %(batch)s FOR UPDATE SKIP LOCKED
+            );
+            DELETE FROM rate_limit_buckets WHERE key IN (
+                SELECT key FROM rate_limit_buckets WHERE full_at < now()
+                LIMIT %(batch)s FOR UPDATE SKIP LOCKED
+            );
+        """, {"batch": self.CLEANUP_BATCH_SIZE})
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        with self._cursor() as cur:
+            cur.execute("""
+                INSERT INTO rate_limit_counters AS c (key, count, expires_at)
+                VALUES (%(key)s, %(amount)s, now() + make_interval(secs => %(expiry)s::float8))
+                ON CONFLICT (key) DO UPDATE SET
+                    count = CASE WHEN c.expires_at <= now()
+                                 THEN EXCLUDED.count ELSE c.count + EXCLUDED.count END,
+                    expires_at = CASE WHEN c.expires_at <= now() OR %(elastic)s
+                                      THEN EXCLUDED.expires_at ELSE c.expires_at END
+                RETURNING count
+            """, {"key": key, "amount": amount, "expiry": expiry, "elastic": elastic_expiry})
+            count = cur.fetchone()[0]
+            self._after_hit(cur)
+        return count
+
+    def get(self, key: str) -> int:
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT count FROM rate_limit_counters WHERE key = %s AND expires_at > now()",
+                (key,)
+            )
+            row = cur.fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT EXTRACT(EPOCH FROM expires_at) FROM rate_limit_counters WHERE key = %s",
+                (key,)
+            )
+            row = cur.fetchone()
+        return float(row[0]) if row else time.time()
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        with self._cursor() as cur:
+            cur.execute("""
+                INSERT INTO rate_limit_buckets AS b (key, full_at)
+                VALUES (%(key)s, now() + make_interval(secs => %(cost)s::float8))
+                ON CONFLICT (key) DO UPDATE SET
+                    full_at = GREATEST(b.full_at, now()) + make_interval(secs => %(cost)s::float8)
+                WHERE GREATEST(b.full_at, now()) + make_interval(secs => %(cost)s::float8)
+                      <= now() + make_interval(secs => %(expiry)s::float8)
+                RETURNING full_at
+            """, {"key": key, "cost": amount * expiry / limit, "expiry": expiry})
+            acquired = cur.fetchone() is not None
+            self._after_hit(cur)
+        return acquired
+
+    def get_moving_window(self, key: str, limit: int, expiry: int):
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT EXTRACT(EPOCH FROM full_at) FROM rate_limit_buckets WHERE key = %s",
+                (key,)
+            )
+            row = cur.fetchone()
+        return _bucket_window(float(row[0]) if row else 0.0, limit, expiry)
+
+    def check(self) -> bool:
+        try:
+            with self._cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except self._psycopg2.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._cursor() as cur:
+            cur.execute("SELECT (SELECT count(*) FROM rate_limit_counters) + (SELECT count(*) FROM rate_limit_buckets)")
+            count = cur.fetchone()[0]
+            cur.execute("TRUNCATE rate_limit_counters, rate_limit_buckets")
+        return count
+
+    def clear(self, key: str) -> None:
+        with self._cursor() as cur:
+            cur.execute("DELETE FROM rate_limit_counters WHERE key = %(key)s; DELETE FROM rate_limit_buckets WHERE key = %(key)s", {"key": key})
+
+# Slot layout: key hash (0 = empty), counter value, expiry/full-at timestamp
+_SLOT = struct.Struct("<Qdd")
+
+class SharedMemoryStorage(Storage, MovingWindowSupport):
+    """
+    Rate limit counters in a memory-mapped file shared by all workers on a host.
+
+    The table is split into stripes, each guarded by its own byte-range file
+    lock (plus a thread lock, since POSIX record locks are per process), so
+    concurrent hits on different keys rarely contend.
+    """
+
+    STORAGE_SCHEME = ["openalgo+shm"]
+
+    def __init__(self, uri: str, slots: int = 65536, stripes: int = 256, **options):
+        if fcntl is None:
+            raise RuntimeError("openalgo+shm rate limit storage requires a POSIX platform")
+        super().__init__(uri, **options)
+        parsed = urlparse(uri)
+        name = parsed.netloc or parsed.path.strip("/") or "openalgo-ratelimit"
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.path = os.path.join(directory, f"{name}.ratelimit")
+        self.stripes = int(stripes)
+        self.stripe_slots = max(1, int(slots) // self.stripes)
+        self._stripe_bytes = self.stripe_slots * _SLOT.size
+        self._size = self.stripes * self._stripe_bytes
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._locks = []
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _map(self) -> mmap.mmap:
+        # File descriptors and record locks must not be shared across fork()
+        if self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < self._size:
+                os.ftruncate(fd, self._size)
+            self._fd = fd
+            self._mm = mmap.mmap(fd, self._size)
+            self._locks = [threading.Lock() for _ in range(self.stripes)]
+            self._pid = os.getpid()
+        return self._mm
+
+    @contextmanager
+    def _slot(self, key: str, now: float):
+        """Lock the key's stripe and yield (mmap, offset, value, stamp) for its slot"""
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        stripe = digest % self.stripes
+        mm = self._map()
+        base = stripe * self._stripe_bytes
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                offset, value, stamp = self._find(mm, base, digest, now)
+                _SLOT.pack_into(mm, offset, digest, value, stamp)
+                yield mm, offset, digest, value, stamp
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _find(self, mm, base: int, digest: int, now: float):
+        """Linear probe within a stripe; reuse expired slots, else evict the oldest"""
+        start = digest // self.stripes % self.stripe_slots
+        free = None
+        oldest = None
+        for i in range(self.stripe_slots):
+            offset = base + ((start + i) % self.stripe_slots) * _SLOT.size
+            slot_digest, value, stamp = _SLOT.unpack_from(mm, offset)
+            if slot_digest == digest:
+                return offset, value, stamp
+            if slot_digest == 0 or stamp <= now:
+                if free is None:
+                    free = offset
+                if slot_digest == 0:
+                    break
+            elif oldest is None or stamp < oldest[1]:
+                oldest = (offset, stamp)
+        return (free if free is not None else oldest[0]), 0.0, 0.0
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self._slot(key, now) as (mm, offset, digest, value, stamp):
+            if stamp <= now:
+                value, stamp = amount, now + expiry
+            else:
+                value += amount
+                if elastic_expiry:
+                    stamp = now + expiry
+            _SLOT.pack_into(mm, offset, digest, value, stamp)
+        return int(value)
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        with self._slot(key, now) as (mm, offset, digest, value, stamp):
+            return int(value) if stamp > now else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._slot(key, now) as (mm, offset, digest, value, stamp):
+            return stamp if stamp > now else now
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._slot(key, now) as (mm, offset, digest, value, full_at):
+            full_at = max(full_at, now) + amount * expiry / limit
+            if full_at > now + expiry:
+                return False
+            _SLOT.pack_into(mm, offset, digest, 0.0, full_at)
+        return True
+
+    def get_moving_window(self, key: str, limit: int, expiry: int):
+        now = time.time()
+        with self._slot(key, now) as (mm, offset, digest, value, full_at):
+            return _bucket_window(full_at, limit, expiry, now)
+
+    def check(self) -> bool:
+        try:
+            self._map()
+            return True
+        except OSError:
+            return False
+
+    def reset(self) -> int:
+        mm = self._map()
+        used = sum(
+            1 for offset in range(0, self._size, _SLOT.size)
+            if _SLOT.unpack_from(mm, offset)[0]
+        )
+        mm[:] = bytes(self._size)
+        return used
+
+    def clear(self, key: str) -> None:
+        # Keep the digest so probe chains through this slot stay intact
+        with self._slot(key, time.time()) as (mm, offset, digest, value, stamp):
+            _SLOT.pack_into(mm, offset, digest, 0.0, 0.0)
+
+def _bucket_window(full_at: float, limit: int, expiry: int, now: Optional[float] = None):
+    """
+    Translate a token bucket's full-at time into the (window_start, used)
+    pair expected by the moving-window strategy
+    """
+    now = time.time() if now is None else now
+    used = math.ceil(max(0.0, full_at - now) * limit / expiry)
+    if used == 0:
+        return now - expiry, 0
+    # The next entry frees up once full_at - now drops to expiry - cost
+    return full_at - 2 * expiry + expiry / limit, min(used, limit)
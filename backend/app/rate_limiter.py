@@ -1,31 +1,143 @@
-from fastapi import FastAPI, Request
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from fastapi import FastAPI, HTTPException, Request
 from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from starlette.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from jose import JWTError
 from app.config import settings
+from app import auth, rate_limit_storage  # noqa: F401 - registers the shared storage schemes
+from app.token_cache import token_cache
 import functools
 
-# Create limiter with in-memory storage
-limiter = Limiter(key_func=get_remote_address)
+def get_user_or_remote_address(request: Request) -> str:
+    """
+    Rate limit key for the authenticated user, falling back to the client IP
+
+    Only verified tokens are trusted, so a forged `sub` claim cannot spend
+    another user's budget. Verified tokens are usually already in the token cache.
+    """
+    authorization = request.headers.get("authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+        cached = token_cache.get(token)
+        if cached is not None:
+            return f"user:{cached[1].username}"
+        try:
+            username = auth.decode_access_token(token).get("sub")
+        except JWTError:
+            username = None
+        if username:
+            return f"user:{username}"
+    return get_remote_address(request)
+
+_key_func = get_user_or_remote_address if settings.RATE_LIMIT_KEY == "user" else get_remote_address
+
+def _request_key(request: Request) -> str:
+    """The key already resolved on the event loop by rate_limit(), else resolve it now"""
+    return getattr(request.state, "rate_limit_key", None) or _key_func(request)
+
+# Create limiter; counters are shared across workers unless storage is memory://
+limiter = Limiter(
+    key_func=_request_key,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    strategy=settings.RATE_LIMIT_STRATEGY,
+    enabled=settings.RATE_LIMIT_ENABLED,
+    in_memory_fallback_enabled=not settings.RATE_LIMIT_STORAGE_URI.startswith("memory://")
+)
+
+class RequestTooLarge(HTTPException):
+    """Raised from `receive` once a request body exceeds its limit"""
+
+    def __init__(self):
+        super().__init__(status_code=413, detail="Request too large")
 
 # Request Size Limit Middleware
-class RequestSizeLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_content_length: int = 1024 * 1024):  # 1MB default
-        super().__init__(app)
+class RequestSizeLimitMiddleware:
+    """
+    Pure ASGI request body guard
+
+    Rejects oversized requests from the Content-Length header when present, and
+    otherwise counts bytes as the application reads them, so chunked uploads are
+    limited too. Nothing is buffered. Once the limit is crossed, `receive` raises
+    RequestTooLarge, which FastAPI renders as a 413 response.
+
+    Args:
+        max_content_length: Default limit in bytes
+        route_limits: Per-path-prefix overrides, e.g. {"/auth/admin/users/bulk": 200 * 1024 * 1024}
+    """
+
+    def __init__(self, app, max_content_length: int = 1024 * 1024, route_limits: Optional[Dict[str, int]] = None):  # 1MB default
+        self.app = app
         self.max_content_length = max_content_length
+        # Longest prefix wins
+        self.route_limits = sorted((route_limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
 
-    async def dispatch(self, request: Request, call_next):
-        content_length = request.headers.get('content-length')
-        if content_length:
-            content_length = int(content_length)
-            if content_length > self.max_content_length:
-                return JSONResponse(
-                    status_code=413,
-                    content={"detail": "Request too large"}
-                )
-        return await call_next(request)
+    def limit_for(self, path: str) -> int:
+        for prefix, limit in self.route_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_content_length
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limit_for(scope["path"])
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            # Normally rendered by FastAPI's exception handling; this covers reads
+            # outside of it. If a response already started, let the server drop the connection.
+            if response_started:
+                raise
+            await self._reject(send)
+
+    @staticmethod
+    async def _reject(send):
+        body = b'{"detail":"Request too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
 
 def setup_rate_limiter(app: FastAPI) -> None:
     """
@@ -44,12 +156,16 @@ def setup_rate_limiter(app: FastAPI) -> None:
             status_code=429,
             content={
                 "error": "Rate limit exceeded",
-                "limit": f"{settings.RATE_LIMIT_REQUESTS} requests per {settings.RATE_LIMIT_PERIOD} seconds"
+                "limit": str(exc.detail)
             }
         )
     
-    # Add Request Size Limit middleware (10MB limit)
-    app.add_middleware(RequestSizeLimitMiddleware, max_content_length=10 * 1024 * 1024)
+    # Add Request Size Limit middleware (10MB limit by default)
+    app.add_middleware(
+        RequestSizeLimitMiddleware,
+        max_content_length=settings.REQUEST_MAX_BYTES,
+        route_limits=settings.request_route_limits
+    )
 
 # Decorator for applying rate limits to endpoints
 def rate_limit(limit: str = None):
@@ -62,5 +178,38 @@ def rate_limit(limit: str = None):
     """
     if limit is None:
         limit = f"{settings.RATE_LIMIT_REQUESTS}/{settings.RATE_LIMIT_PERIOD}second"
-    
-    return limiter.limit(limit)
+    limit_decorator = limiter.limit(limit)
+
+    def decorator(func):
+        limited = limit_decorator(func)
+        if not _BLOCKING_STORAGE or not asyncio.iscoroutinefunction(func):
+            return limited
+
+        @functools.wraps(func)
+        async def checked_off_loop(*args, **kwargs):
+            request = kwargs.get("request") or next(arg for arg in args if isinstance(arg, Request))
+            if limiter.enabled and not getattr(request.state, "_rate_limiting_complete", False):
+                request.state.rate_limit_key = _key_func(request)
+                await asyncio.get_running_loop().run_in_executor(
+                    _storage_executor(), limiter._check_request_limit, request, func, False
+                )
+                # slowapi's own wrapper then skips its (blocking) check and only adds headers
+                request.state._rate_limiting_complete = True
+            return await limited(*args, **kwargs)
+
+        return checked_off_loop
+
+    return decorator
+
+# The Postgres storage makes a synchronous round-trip per hit; slowapi would
+# make it on the event loop, so rate_limit() moves the check to these threads
+_BLOCKING_STORAGE = settings.RATE_LIMIT_STORAGE_URI.startswith("openalgo+postgres")
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _storage_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # One thread per pooled connection, so checks queue here instead of exhausting the pool
+        workers = getattr(limiter._storage, "_pool_size", 4)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rate-limit")
+    return _executor
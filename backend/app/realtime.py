@@ -0,0 +1,301 @@
+"""
+WebSocket fan-out hub for order, trade, position and alert updates.
+
+Publishers call `publish(user_id, channel, data, key)`. The update is serialized
+once, then offered to every connection of that user subscribed to the channel.
+Offering never awaits: each connection owns a bounded pending queue drained by
+its own sender task, so one slow client cannot hold up anyone else.
+
+When a queue is full, updates that carry a `key` (an order id, a symbol)
+replace the pending update with the same key, because only the latest state
+matters. Keyless updates evict the oldest pending one, and the client receives
+an {"type": "overflow"} notice so it knows to resync. A client that does not
+accept a frame within REALTIME_SEND_TIMEOUT is disconnected.
+
+With REALTIME_BRIDGE enabled, publish() goes through Postgres NOTIFY, and every
+worker (this one included) fans the update out to its local connections.
+Listeners (see `add_listener`) run in the publishing worker as soon as publish()
+is called; other workers run theirs when the notification arrives. NOTIFY is
+best effort, so state kept by listeners must have another way to catch up.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+import asyncpg
+from tortoise import Tortoise
+from .config import settings
+from .metrics import MetricFamilies, register_collector
+
+logger = logging.getLogger("openalgo")
+
+CHANNELS = ("orders", "trades", "positions", "alerts")
+
+# Close codes
+WS_GOING_AWAY = 1001
+WS_SERVICE_RESTART = 1012
+WS_POLICY_VIOLATION = 1008
+WS_TRY_AGAIN_LATER = 1013
+
+class Connection:
+    """One authenticated WebSocket and its bounded, coalescing send queue"""
+
+    def __init__(self, websocket, user_id: int, queue_size: int, send_timeout: float):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.channels: Set[str] = set()
+        self.dropped = 0
+        self.closed = False
+        self._unreported_drops = 0
+        self._pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+
+    def subscribe(self, channels: Iterable[str]) -> None:
+        self.channels.update(channel for channel in channels if channel in CHANNELS)
+
+    def unsubscribe(self, channels: Iterable[str]) -> None:
+        self.channels.difference_update(channels)
+
+    def offer(self, message: str, coalesce_key: Optional[Hashable] = None) -> bool:
+        """Queue a serialized message; returns False if it replaced or evicted another"""
+        if self.closed:
+            return False
+        if coalesce_key is not None and coalesce_key in self._pending:
+            # Latest state wins and keeps its place in line
+            self._pending[coalesce_key] = message
+            return False
+        evicted = False
+        if len(self._pending) >= self.queue_size:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+            self._unreported_drops += 1
+            evicted = True
+        self._pending[coalesce_key if coalesce_key is not None else next(self._sequence)] = message
+        self._ready.set()
+        return not evicted
+
+    async def run_sender(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._pending:
+                    if self._unreported_drops:
+                        message = json.dumps({"type": "overflow", "dropped": self._unreported_drops})
+                        self._unreported_drops = 0
+                    else:
+                        _, message = self._pending.popitem(last=False)
+                    await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+        except asyncio.TimeoutError:
+            hub.slow_disconnects += 1
+            logger.warning(f"Disconnecting slow WebSocket client for user {self.user_id}")
+            await self.close(WS_TRY_AGAIN_LATER)
+        except Exception:
+            # The receive loop notices the disconnect and unregisters us
+            self.closed = True
+
+    async def close(self, code: int = WS_GOING_AWAY) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+class Hub:
+    def __init__(self):
+        self._connections: Dict[int, Set[Connection]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.slow_disconnects = 0
+        self.bridge: Optional["PostgresBridge"] = None
+        self._listeners: Dict[str, List[Callable[[Optional[int], str], None]]] = {}
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+    def register(self, connection: Connection) -> None:
+        self._connections.setdefault(connection.user_id, set()).add(connection)
+
+    def unregister(self, connection: Connection) -> None:
+        connections = self._connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._connections[connection.user_id]
+
+    def add_listener(self, channel: str, listener: Callable[[Optional[int], str], None]) -> None:
+        """
+        Call listener(user_id, message) for every update on a channel in this worker
+
+        Updates published here reach the listener synchronously inside publish(),
+        even if NOTIFY fails. With the bridge enabled it also sees updates from
+        other workers, which lets in-memory state (e.g. positions) follow every fill.
+        """
+        self._listeners.setdefault(channel, []).append(listener)
+
+    @staticmethod
+    def encode(channel: str, data: Any) -> str:
+        return json.dumps({"type": "update", "channel": channel, "data": data}, default=str, separators=(",", ":"))
+
+    def _run_listeners(self, user_id: Optional[int], channel: str, message: str) -> None:
+        for listener in self._listeners.get(channel, ()):
+            try:
+                listener(user_id, message)
+            except Exception as e:
+                logger.error(f"Realtime listener {listener.__name__} failed on {channel}: {str(e)}")
+
+    def publish_local(self, user_id: Optional[int], channel: str, message: str, key: Optional[str] = None,
+                      listeners: bool = True) -> int:
+        """Offer an already-serialized message to this worker's subscribers; None means every user"""
+        self.published += 1
+        if listeners:
+            self._run_listeners(user_id, channel, message)
+        if user_id is None:
+            targets = [connection for connections in self._connections.values() for connection in connections]
+        else:
+            targets = self._connections.get(user_id, ())
+        coalesce_key = (channel, key) if key is not None else None
+        offered = 0
+        for connection in targets:
+            if channel in connection.channels:
+                if connection.offer(message, coalesce_key):
+                    offered += 1
+                else:
+                    self.coalesced += 1
+        self.delivered += offered
+        return offered
+
+    async def publish(self, user_id: Optional[int], channel: str, data: Any, key: Optional[str] = None) -> None:
+        """
+        Publish an update to a user's subscribers on every worker
+
+        Args:
+            user_id: Recipient, or None to broadcast to all subscribers of the channel
+            channel: One of CHANNELS
+            data: JSON-serializable payload
+            key: Coalescing key; pending updates with the same key are replaced
+        """
+        message = self.encode(channel, data)
+        self._run_listeners(user_id, channel, message)
+        if self.bridge is not None and self.bridge.running:
+            await self.bridge.notify(user_id, channel, key, message)
+        else:
+            self.publish_local(user_id, channel, message, key, listeners=False)
+
+    async def close_all(self, code: int = WS_GOING_AWAY) -> None:
+        connections = [connection for connections in self._connections.values() for connection in connections]
+        await asyncio.gather(*(connection.close(code) for connection in connections), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connection_count,
+            "users": len(self._connections),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+hub = Hub()
+
+class PostgresBridge:
+    """Relays published updates between workers with LISTEN/NOTIFY"""
+
+    CHANNEL = "openalgo_realtime"
+    # NOTIFY payloads must stay under 8000 bytes
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, target: Hub):
+        self.hub = target
+        self.running = False
+        # Created per worker at startup, after any fork; marks this worker's own notifications
+        self.origin = uuid.uuid4().hex[:12]
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        try:
+            origin, user, topic, key, message = payload.split("\n", 4)
+        except ValueError:
+            logger.warning("Ignoring malformed realtime notification")
+            return
+        # Listeners already ran for our own updates inside Hub.publish
+        self.hub.publish_local(None if user == "*" else int(user), topic, message, key or None,
+                               listeners=origin != self.origin)
+
+    async def notify(self, user_id: Optional[int], channel: str, key: Optional[str], message: str) -> None:
+        payload = f"{self.origin}\n{'*' if user_id is None else user_id}\n{channel}\n{key or ''}\n{message}"
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            logger.warning(f"Realtime update on {channel} too large for NOTIFY; delivering on this worker only")
+            self.hub.publish_local(user_id, channel, message, key, listeners=False)
+            return
+        await Tortoise.get_connection("default").execute_query("SELECT pg_notify($1, $2)", [self.CHANNEL, payload])
+
+    async def _listen(self) -> None:
+        # LISTEN needs a dedicated connection outside the ORM pool. Updates
+        # published while it reconnects are lost; clients resync on reconnect.
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(
+                    user=settings.POSTGRES_USER,
+                    password=settings.POSTGRES_PASSWORD,
+                    host=settings.POSTGRES_SERVER,
+                    port=settings.POSTGRES_PORT,
+                    database=settings.POSTGRES_DB
+                )
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.CHANNEL, self._on_notify)
+                self.running = True
+                logger.info("Realtime LISTEN/NOTIFY bridge connected")
+                await lost.wait()
+                logger.warning("Realtime bridge connection lost, reconnecting")
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.error(f"Realtime bridge error: {str(e)}")
+            finally:
+                self.running = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(1)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.running = False
+
+def start_realtime() -> None:
+    if settings.REALTIME_BRIDGE and hub.bridge is None:
+        hub.bridge = PostgresBridge(hub)
+        hub.bridge.start()
+
+async def stop_realtime() -> None:
+    if hub.bridge is not None:
+        hub.bridge.stop()
+        hub.bridge = None
+    # The server is stopping or being replaced (serve.py drains workers on SIGHUP); clients should reconnect
+    await hub.close_all(WS_SERVICE_RESTART)
+
+def _collect(metrics: MetricFamilies) -> None:
+    stats = hub.stats()
+    metrics.gauge("openalgo_ws_connections", "Open WebSocket connections", {}, stats["connections"])
+    metrics.counter("openalgo_ws_published_total", "Updates published to local subscribers", {}, stats["published"])
+    metrics.counter("openalgo_ws_delivered_total", "Updates queued for a connection", {}, stats["delivered"])
+    metrics.counter("openalgo_ws_coalesced_total", "Updates merged into or evicting a pending update", {}, stats["coalesced"])
+    metrics.counter("openalgo_ws_slow_disconnects_total", "Connections closed for not keeping up", {}, stats["slow_disconnects"])
+
+register_collector(_collect)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from .. import auth, diagnostics, provisioning, traffic
+from ..config import settings
+
+router = APIRouter()
+logger = logging.getLogger("openalgo")
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that does not listen for disconnects
+
+    The stock response consumes `receive` while streaming, which would swallow
+    the request body we are still reading from inside the generator.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@router.post("/users/bulk")
+async def bulk_import_users(
+    request: Request,
+    format: Optional[str] = None,
+    admin: auth.Principal = Depends(auth.get_current_admin)
+):
+    """
+    Import users from a CSV (email,username,password header) or JSON-lines body
+
+    Results are streamed back as one JSON line per input row while the upload is
+    still being read.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    if fmt not in provisioning.FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format, expected one of: {', '.join(provisioning.FORMATS)}"
+        )
+    logger.info(f"Bulk user import ({fmt}) started by {admin.username}")
+
+    async def results():
+        async for result in provisioning.import_users(request.stream(), fmt):
+            yield json.dumps(result) + "\n"
+
+    return _DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.get("/traffic")
+async def traffic_summary(
+    request: Request,
+    top: int = Query(20, ge=1, le=100),
+    admin: auth.Principal = Depends(auth.get_current_admin)
+):
+    """Request rates, error rates and latency percentiles over 1m/5m/1h, merged across workers"""
+    routes = [f"{method} {route.path}" for route in request.app.routes for method in getattr(route, "methods", None) or ()]
+    routes += traffic.route_names.values()
+
+    def summarize():
+        records, workers = traffic.collect_records()
+        return traffic.summarize(records, workers, routes, top=top)
+
+    # Up to a million records per worker; keep the sort and percentiles off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, summarize)
+
+def _require_diagnostics() -> None:
+    if not settings.DIAGNOSTICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Diagnostics are disabled")
+
+@router.get("/diagnostics")
+async def diagnostics_summary(admin: auth.Principal = Depends(auth.get_current_admin)):
+    """Event-loop lag and the most recent stalls with the stack that caused them"""
+    _require_diagnostics()
+    return diagnostics.monitor.stats()
+
+@router.post("/diagnostics/profile", response_class=PlainTextResponse)
+async def diagnostics_profile(
+    seconds: float = Query(10, gt=0),
+    all_threads: bool = False,
+    admin: auth.Principal = Depends(auth.get_current_admin)
+):
+    """Sample stacks for `seconds` and return folded stacks for flamegraph.pl or speedscope"""
+    _require_diagnostics()
+    if seconds > settings.DIAGNOSTICS_MAX_PROFILE_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.DIAGNOSTICS_MAX_PROFILE_SECONDS} seconds per capture"
+        )
+    logger.info(f"Profile capture of {seconds}s started by {admin.username}")
+    folded = await diagnostics.capture_profile(seconds, all_threads)
+    if folded is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile capture is already running")
+    return folded
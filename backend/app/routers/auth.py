@@ -1,48 +1,46 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from .. import models, schemas, auth
+from tortoise.exceptions import IntegrityError
+from .. import models, schemas, auth, sessions
+from ..config import settings
+from ..rate_limiter import rate_limit
 import logging
 
 router = APIRouter()
 logger = logging.getLogger("openalgo")
 
 @router.post("/register", response_model=schemas.User)
-async def register(user: schemas.UserCreate):
+@rate_limit(settings.AUTH_RATE_LIMIT)
+async def register(request: Request, user: schemas.UserCreate):
     logger.info(f"Registration attempt for user: {user.username}")
-    # Check if user exists
-    exists = await models.User.filter(
-        email=user.email
-    ).exists() or await models.User.filter(
-        username=user.username
-    ).exists()
-    
-    if exists:
-        logger.warning(f"Registration failed: User {user.username} or email {user.email} already exists")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email or username already registered"
-        )
-    
-    # Create new user
+    # The unique indexes on email/username are the duplicate check: one INSERT,
+    # no check-then-insert race between concurrent sign-ups
+    hashed_password = await auth.get_password_hash_async(user.password)
     try:
-        hashed_password = auth.get_password_hash(user.password)
         db_user = await models.User.create(
             email=user.email,
             username=user.username,
             hashed_password=hashed_password
         )
-        logger.info(f"User {user.username} registered successfully")
-        return db_user
+    except IntegrityError:
+        logger.warning(f"Registration failed: User {user.username} or email {user.email} already exists")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email or username already registered"
+        )
     except Exception as e:
         logger.error(f"Error during user registration: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error during registration"
         )
+    logger.info(f"User {user.username} registered successfully")
+    return db_user
 
 @router.post("/token", response_model=schemas.Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+@rate_limit(settings.AUTH_RATE_LIMIT)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     logger.info(f"Login attempt for user: {form_data.username}")
     user = await auth.authenticate_user(form_data.username, form_data.password)
     if not user:
@@ -56,10 +54,35 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     access_token = auth.create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
+    refresh_token = await sessions.create_session(user.id)
     logger.info(f"Successful login for user: {form_data.username}")
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/refresh", response_model=schemas.Token)
+@rate_limit(settings.AUTH_RATE_LIMIT)
+async def refresh(request: Request, body: schemas.RefreshRequest):
+    # Rotation is a single statement against the sessions table: no bcrypt,
+    # and the presented refresh token can never be used again
+    rotated = await sessions.rotate_session(body.refresh_token)
+    if rotated is None:
+        logger.warning("Refresh attempt with an invalid, expired or reused token")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    username, refresh_token = rotated
+    access_token = auth.create_access_token(
+        data={"sub": username},
+        expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: schemas.RefreshRequest):
+    await sessions.revoke_session(request.refresh_token)
 
 @router.get("/users/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+async def read_users_me(current_user: auth.Principal = Depends(auth.get_current_user)):
     logger.debug(f"Profile accessed by user: {current_user.username}")
     return current_user
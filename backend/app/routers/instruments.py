@@ -0,0 +1,41 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from .. import auth, instruments, schemas
+from ..config import settings
+
+router = APIRouter()
+
+def _require_index() -> None:
+    if not instruments.master.loaded:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Instrument master not loaded")
+
+@router.get("/search", response_model=List[schemas.Instrument])
+async def search_instruments(
+    q: str = Query(..., min_length=1, max_length=64),
+    exchange: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Instruments whose trading symbol starts with `q`, ignoring case and punctuation"""
+    _require_index()
+    return [instrument._asdict() for instrument in instruments.master.search(q, exchange, limit)]
+
+@router.post("/refresh")
+async def refresh_instruments(admin: auth.Principal = Depends(auth.get_current_admin)):
+    """Rebuild the index from the configured sources now"""
+    if not settings.INSTRUMENTS_SOURCES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="INSTRUMENTS_SOURCES is not configured")
+    await instruments.refresh(force=True)
+    return instruments.master.stats()
+
+@router.get("/{exchange}/{symbol}", response_model=schemas.Instrument)
+async def read_instrument(
+    exchange: str,
+    symbol: str,
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    _require_index()
+    instrument = instruments.master.lookup(exchange, symbol)
+    if instrument is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Instrument not found")
+    return instrument._asdict()
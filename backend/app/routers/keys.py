@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ..config import settings
+from ..jwt_keys import keyring
+
+router = APIRouter()
+
+@router.get("/.well-known/jwks.json")
+async def jwks():
+    """Public keys for verifying access tokens issued by this node"""
+    return JSONResponse(
+        keyring.jwks(),
+        headers={"Cache-Control": f"public, max-age={settings.JWKS_CACHE_SECONDS}"}
+    )
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..config import settings
+from ..metrics import aggregate, render_prometheus
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint, aggregated across the workers sharing METRICS_DIR"""
+    return PlainTextResponse(
+        render_prometheus(aggregate(settings.METRICS_DIR)),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,140 @@
+import json
+import logging
+import time
+from datetime import date, datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from .. import auth, models, schemas
+from ..brokers import BrokerError, adapters
+from ..config import settings
+from ..db_router import query_cache
+from ..event_log import event_log, trading_day
+from ..instruments import master as instrument_master
+from ..metrics import timed
+from ..order_outcome import record_outcome
+from ..order_router import order_router
+
+router = APIRouter()
+logger = logging.getLogger("openalgo")
+
+@router.post("", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
+async def place_order(
+    order: schemas.OrderCreate,
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Place an order with a broker and record the outcome"""
+    broker = order.broker or settings.BROKER_DEFAULT
+    if broker not in adapters:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown broker: {broker}")
+    if order.order_type in ("LIMIT", "SL") and order.price is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{order.order_type} orders need a price")
+    if instrument_master.loaded:
+        instrument = instrument_master.lookup(order.exchange, order.symbol)
+        if instrument is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unknown instrument: {order.exchange}:{order.symbol}")
+        if order.quantity % instrument.lot_size:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Quantity must be a multiple of the lot size {instrument.lot_size}")
+    if order.strategy_id is not None:
+        with timed("db"):
+            owned = await models.Strategy.filter(id=order.strategy_id, user_id=current_user.id).exists()
+        if not owned:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Strategy not found")
+
+    with timed("db"):
+        db_order = await models.Order.create(
+            user_id=current_user.id,
+            strategy_id=order.strategy_id,
+            broker=broker,
+            symbol=order.symbol,
+            exchange=order.exchange,
+            side=order.side,
+            quantity=order.quantity,
+            order_type=order.order_type,
+            price=order.price
+        )
+    event_log.append_order_event(current_user.id, db_order.id, "created", order.model_dump(mode="json"))
+    started = time.perf_counter()
+    placed = None
+    try:
+        # Tagged with our id, so an order whose outcome is unknown can be looked up later
+        placed = await order_router.place(broker, order, tag=str(db_order.id))
+        db_order.status = placed.status
+        db_order.broker_order_id = placed.broker_order_id
+    except BrokerError as e:
+        logger.warning(f"Order {db_order.id} for {current_user.username} not placed with {broker}: {str(e)}")
+        if e.status_code is not None:
+            db_order.status = "rejected"
+        else:
+            # "unknown" orders may have been placed; clients must not retry them (see app/order_outcome.py)
+            db_order.status = "unknown" if e.outcome_unknown else "failed"
+        db_order.error = str(e)
+    db_order.latency_ms = round((time.perf_counter() - started) * 1000, 3)
+    with timed("db"):
+        await db_order.save(update_fields=["status", "broker_order_id", "error", "latency_ms", "updated_at"])
+    return await record_outcome(db_order, placed)
+
+@router.get("", response_model=List[schemas.Order])
+async def list_orders(
+    limit: int = 100,
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    limit = min(limit, 500)
+
+    async def load():
+        with timed("db"):
+            return await models.Order.filter(user_id=current_user.id).order_by("-created_at").limit(limit)
+    return await query_cache.get_or_load(("orders", current_user.id, limit), load, tags=(f"orders:user:{current_user.id}",))
+
+def _day(day: Optional[date]) -> date:
+    return day or trading_day(datetime.now(timezone.utc))
+
+async def _page(table: str, user_id: int, day: Optional[date], after: Optional[str], limit: int) -> dict:
+    day = _day(day)
+
+    async def load():
+        with timed("db"):
+            rows, next_cursor = await event_log.page(table, user_id, day, after, limit)
+        return {"events": rows, "next_cursor": next_cursor}
+    try:
+        return await query_cache.get_or_load((table, user_id, day, after, limit), load, tags=(f"{table}:user:{user_id}",))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _ndjson(table: str, user_id: int, day: Optional[date]) -> StreamingResponse:
+    async def lines():
+        async for row in event_log.stream(table, user_id, _day(day)):
+            yield json.dumps(row, default=str) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/book")
+async def order_book(
+    day: Optional[date] = None,
+    after: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Order events for a trading day (today by default), oldest first; pass next_cursor as `after` for the next page"""
+    return await _page("order_events", current_user.id, day, after, limit)
+
+@router.get("/book/stream")
+async def order_book_stream(day: Optional[date] = None, current_user: auth.Principal = Depends(auth.get_current_user)):
+    """A whole trading day of order events as JSON lines"""
+    return _ndjson("order_events", current_user.id, day)
+
+@router.get("/trades")
+async def trade_book(
+    day: Optional[date] = None,
+    after: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Trades for a trading day, paginated like /orders/book"""
+    return await _page("trade_events", current_user.id, day, after, limit)
+
+@router.get("/trades/stream")
+async def trade_book_stream(day: Optional[date] = None, current_user: auth.Principal = Depends(auth.get_current_user)):
+    """A whole trading day of trades as JSON lines"""
+    return _ndjson("trade_events", current_user.id, day)
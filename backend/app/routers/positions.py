@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from .. import auth
+from ..positions import engine
+
+router = APIRouter()
+
+@router.get("")
+async def read_positions(current_user: auth.Principal = Depends(auth.get_current_user)):
+    """Current positions with realized and mark-to-market P&L, served from memory"""
+    positions = engine.positions(current_user.id)
+    return {
+        "positions": positions,
+        "realized_pnl": round(sum(position["realized_pnl"] for position in positions), 2),
+        "unrealized_pnl": round(sum(position["unrealized_pnl"] for position in positions), 2),
+    }
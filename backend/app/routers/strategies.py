@@ -0,0 +1,49 @@
+import logging
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from tortoise.transactions import in_transaction
+from .. import auth, models, schemas
+from ..webhooks import hash_api_key, key_cache, new_api_key
+
+router = APIRouter()
+logger = logging.getLogger("openalgo")
+
+@router.post("", response_model=schemas.StrategyWithKey, status_code=status.HTTP_201_CREATED)
+async def create_strategy(
+    strategy: schemas.StrategyCreate,
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Create a strategy; its webhook API key is returned only in this response"""
+    async with in_transaction("default"):
+        # The key embeds the id, so insert with a throwaway digest first
+        db_strategy = await models.Strategy.create(
+            user_id=current_user.id,
+            name=strategy.name,
+            platform=strategy.platform,
+            api_key_hash=hash_api_key(new_api_key(0))
+        )
+        api_key = new_api_key(db_strategy.id)
+        db_strategy.api_key_hash = hash_api_key(api_key)
+        await db_strategy.save(update_fields=["api_key_hash"])
+    logger.info(f"Strategy {db_strategy.id} created for user {current_user.username}")
+    return {**schemas.Strategy.model_validate(db_strategy).model_dump(), "api_key": api_key}
+
+@router.get("", response_model=List[schemas.Strategy])
+async def list_strategies(current_user: auth.Principal = Depends(auth.get_current_user)):
+    return await models.Strategy.filter(user_id=current_user.id).order_by("id")
+
+@router.post("/{strategy_id}/rotate-key", response_model=schemas.StrategyWithKey)
+async def rotate_strategy_key(
+    strategy_id: int,
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Replace a strategy's API key; the old key stops working immediately on this worker"""
+    db_strategy = await models.Strategy.filter(id=strategy_id, user_id=current_user.id).first()
+    if db_strategy is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Strategy not found")
+    api_key = new_api_key(db_strategy.id)
+    db_strategy.api_key_hash = hash_api_key(api_key)
+    await db_strategy.save(update_fields=["api_key_hash", "updated_at"])
+    key_cache.invalidate(db_strategy.id)
+    logger.info(f"API key rotated for strategy {db_strategy.id}")
+    return {**schemas.Strategy.model_validate(db_strategy).model_dump(), "api_key": api_key}
@@ -0,0 +1,45 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request, status
+from ..webhooks import idempotency_key_for, key_cache, parse_payload, pipeline
+
+router = APIRouter()
+logger = logging.getLogger("openalgo")
+
+async def _accept(request: Request, api_key: Optional[str], idempotency_key: Optional[str]) -> dict:
+    strategy = await key_cache.authenticate(api_key) if api_key else None
+    if strategy is None:
+        logger.warning("Webhook rejected: invalid or inactive API key")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    body = await request.body()
+    payload = parse_payload(body)
+    key = idempotency_key_for(idempotency_key, payload, body)
+    pipeline.enqueue(strategy, key, payload)
+    return {"status": "accepted", "idempotency_key": key}
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def receive_alert(
+    request: Request,
+    x_api_key: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Accept a signal authenticated with the X-API-Key header"""
+    return await _accept(request, x_api_key, idempotency_key)
+
+@router.post("/{api_key}", status_code=status.HTTP_202_ACCEPTED)
+async def receive_alert_with_key(
+    api_key: str,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Accept a signal with the API key in the URL
+
+    ChartInk and TradingView cannot send custom headers, so their webhook URL
+    carries the key (masked in access logs). The alert is queued and
+    acknowledged immediately; it is stored and acted on by the ingestion workers.
+    """
+    return await _accept(request, api_key, idempotency_key)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from .. import auth
+from ..config import settings
+from ..realtime import WS_POLICY_VIOLATION, Connection, hub
+
+router = APIRouter()
+logger = logging.getLogger("openalgo")
+
+AUTH_TIMEOUT = 10  # seconds a new connection has to send its token
+
+@router.websocket("/ws")
+async def updates(websocket: WebSocket, channels: str = Query("")):
+    """
+    Real-time order, trade and position updates
+
+    Browsers cannot set headers on WebSocket requests, and a token in the URL
+    would end up in server logs. So the first message after the handshake must be
+    {"action": "auth", "token": "<access token>"}, sent within AUTH_TIMEOUT
+    seconds; the token is checked exactly like a Bearer token.
+    Then: {"action": "subscribe" | "unsubscribe", "channels": [...]} and
+    {"action": "ping"}.
+    """
+    await websocket.accept()
+    principal = None
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), timeout=AUTH_TIMEOUT)
+        token = message.get("token") if isinstance(message, dict) and message.get("action") == "auth" else None
+        if isinstance(token, str):
+            principal = await auth.get_current_user(token)
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, HTTPException):
+        pass
+    if principal is None:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    connection = Connection(
+        websocket,
+        principal.id,
+        queue_size=settings.REALTIME_QUEUE_SIZE,
+        send_timeout=settings.REALTIME_SEND_TIMEOUT
+    )
+    connection.subscribe(filter(None, channels.split(",")))
+    hub.register(connection)
+    sender = asyncio.create_task(connection.run_sender())
+    logger.debug(f"WebSocket opened for user {principal.username}")
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            requested = message.get("channels", []) if isinstance(message, dict) else []
+            if action == "subscribe":
+                connection.subscribe(requested)
+            elif action == "unsubscribe":
+                connection.unsubscribe(requested)
+            elif action == "ping":
+                connection.offer('{"type":"pong"}')
+                continue
+            else:
+                connection.offer('{"type":"error","detail":"Unknown action"}')
+                continue
+            connection.offer(json.dumps({"type": "subscribed", "channels": sorted(connection.channels)}))
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the sender closed a slow connection under us
+        pass
+    except ValueError:
+        await connection.close(WS_POLICY_VIOLATION)
+    finally:
+        connection.closed = True
+        hub.unregister(connection)
+        sender.cancel()
+        logger.debug(f"WebSocket closed for user {principal.username}")
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, validator
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, validator
+from typing import Literal, Optional
 from datetime import datetime
+from decimal import Decimal
 import re
 
 # Add your Pydantic models (schemas) here
@@ -45,6 +46,63 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+class StrategyCreate(BaseModel):
+    name: str
+    platform: Literal["chartink", "tradingview", "amibroker", "generic"] = "generic"
+
+class Strategy(BaseModel):
+    id: int
+    name: str
+    platform: str
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class StrategyWithKey(Strategy):
+    api_key: str
+
+class OrderCreate(BaseModel):
+    symbol: str = Field(..., min_length=1, max_length=64)
+    exchange: str = Field("NSE", max_length=16)
+    side: Literal["BUY", "SELL"]
+    quantity: int = Field(..., gt=0)
+    order_type: Literal["MARKET", "LIMIT", "SL", "SL-M"] = "MARKET"
+    price: Optional[Decimal] = None
+    broker: Optional[str] = None
+    strategy_id: Optional[int] = None
+
+class Order(BaseModel):
+    id: int
+    broker: str
+    symbol: str
+    exchange: str
+    side: str
+    quantity: int
+    order_type: str
+    price: Optional[Decimal] = None
+    status: str
+    broker_order_id: Optional[str] = None
+    error: Optional[str] = None
+    latency_ms: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class Instrument(BaseModel):
+    exchange: str
+    symbol: str
+    token: str
+    name: str
+    lot_size: int
+    tick_size: float
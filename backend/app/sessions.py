@@ -0,0 +1,125 @@
+"""
+Refresh-token sessions.
+
+Refresh tokens are random strings handed to the client once; the database keeps
+only their SHA-256 digest behind a unique index. Rotating a token revokes the old
+session, inserts the new one and fetches the user in a single statement, with no
+bcrypt work, so clients no longer need to re-POST credentials to /auth/token
+every time an access token expires.
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from tortoise import Tortoise
+from . import models
+from .config import settings
+from .metrics import timed
+from utils.auto_logout import revocation_epoch
+
+logger = logging.getLogger("openalgo")
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def create_session(user_id: int) -> str:
+    """Start a refresh session for a user and return the raw refresh token"""
+    token = secrets.token_urlsafe(32)
+    with timed("db"):
+        await models.RefreshSession.create(
+            user_id=user_id,
+            token_hash=hash_refresh_token(token),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        )
+    return token
+
+async def rotate_session(refresh_token: str) -> Optional[Tuple[str, str]]:
+    """
+    Exchange a refresh token for a new one
+
+    The old session must be unrevoked, unexpired and issued after the last
+    auto-logout cutoff. Returns (username, new refresh token), or None if the token
+    is not valid. A token can be rotated only once: concurrent attempts race on the
+    same row and only one UPDATE matches.
+    """
+    new_token = secrets.token_urlsafe(32)
+    epoch = datetime.fromtimestamp(revocation_epoch(), tz=timezone.utc)
+    client = Tortoise.get_connection("default")
+    with timed("db"):
+        rows = await client.execute_query_dict(
+            """
+            WITH revoked AS (
+                UPDATE sessions SET revoked_at = now()
+                WHERE token_hash = $1 AND revoked_at IS NULL
+                  AND expires_at > now() AND created_at >= $2
+                RETURNING user_id
+            ), issued AS (
+                INSERT INTO sessions (user_id, token_hash, created_at, expires_at)
+                SELECT user_id, $3, now(), now() + make_interval(days => $4) FROM revoked
+                RETURNING user_id
+            )
+            SELECT users.username FROM users JOIN issued ON users.id = issued.user_id
+            """,
+            [hash_refresh_token(refresh_token), epoch, hash_refresh_token(new_token), settings.REFRESH_TOKEN_EXPIRE_DAYS]
+        )
+    if not rows:
+        return None
+    return rows[0]["username"], new_token
+
+async def revoke_session(refresh_token: str) -> bool:
+    with timed("db"):
+        updated = await models.RefreshSession.filter(
+            token_hash=hash_refresh_token(refresh_token), revoked_at__isnull=True
+        ).update(revoked_at=datetime.now(timezone.utc))
+    return bool(updated)
+
+async def purge_expired_sessions(batch_size: int = 1000) -> int:
+    """Delete expired and revoked sessions in bounded batches"""
+    client = Tortoise.get_connection("default")
+    retention = timedelta(seconds=settings.SESSION_PURGE_INTERVAL)
+    purged = 0
+    for query, values in (
+        # Served by the partial index on expires_at WHERE revoked_at IS NULL
+        ("DELETE FROM sessions WHERE id IN (SELECT id FROM sessions "
+         "WHERE revoked_at IS NULL AND expires_at < now() LIMIT $1 FOR UPDATE SKIP LOCKED)",
+         [batch_size]),
+        # Served by the partial index on revoked_at WHERE revoked_at IS NOT NULL
+        ("DELETE FROM sessions WHERE id IN (SELECT id FROM sessions "
+         "WHERE revoked_at IS NOT NULL AND revoked_at < now() - $2::interval LIMIT $1 FOR UPDATE SKIP LOCKED)",
+         [batch_size, retention]),
+    ):
+        while True:
+            deleted, _ = await client.execute_query(query, values)
+            purged += deleted
+            if deleted < batch_size:
+                break
+            # Let other requests use the connection between batches
+            await asyncio.sleep(0)
+    return purged
+
+async def _purge_periodically(interval: int, batch_size: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await purge_expired_sessions(batch_size)
+            if purged:
+                logger.info(f"Purged {purged} expired refresh sessions")
+        except Exception as e:
+            logger.error(f"Error purging refresh sessions: {str(e)}")
+
+_purge_task: Optional[asyncio.Task] = None
+
+def start_session_purge():
+    global _purge_task
+    if _purge_task is None and settings.SESSION_PURGE_INTERVAL > 0:
+        _purge_task = asyncio.create_task(
+            _purge_periodically(settings.SESSION_PURGE_INTERVAL, settings.SESSION_PURGE_BATCH_SIZE)
+        )
+
+def stop_session_purge():
+    global _purge_task
+    if _purge_task is not None:
+        _purge_task.cancel()
+        _purge_task = None
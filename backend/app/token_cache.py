@@ -0,0 +1,142 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from .config import settings
+from .metrics import MetricFamilies, register_collector
+
+class Principal:
+    """Immutable, lightweight view of an authenticated user"""
+
+    __slots__ = ("id", "username", "email", "is_active", "is_superuser", "created_at", "updated_at")
+
+    def __init__(self, id, username, email, is_active, is_superuser, created_at, updated_at):
+        for name, value in zip(self.__slots__, (id, username, email, is_active, is_superuser, created_at, updated_at)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Principal is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Principal is immutable")
+
+    def __repr__(self):
+        return f"Principal(id={self.id!r}, username={self.username!r})"
+
+    def __str__(self):
+        return self.username
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            user.id,
+            user.username,
+            user.email,
+            user.is_active,
+            user.is_superuser,
+            user.created_at,
+            user.updated_at,
+        )
+
+class _Entry:
+    __slots__ = ("signing_input", "expires_at", "claims", "principal")
+
+    def __init__(self, signing_input: str, expires_at: float, claims: dict, principal: Principal):
+        self.signing_input = signing_input
+        self.expires_at = expires_at
+        self.claims = claims
+        self.principal = principal
+
+class TokenCache:
+    """
+    LRU/TTL cache of verified JWTs, keyed by token signature.
+
+    A hit skips both the signature check and the user lookup. Entries never
+    outlive the token's own `exp` claim, and the signed header/payload is
+    compared on every hit so a reused signature cannot match a different token.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _split(token: str) -> Tuple[str, str]:
+        signing_input, _, signature = token.rpartition(".")
+        return signing_input, signature
+
+    def get(self, token: str) -> Optional[Tuple[dict, Principal]]:
+        if not self.enabled:
+            return None
+        signing_input, signature = self._split(token)
+        entry = self._entries.get(signature)
+        if entry is None or entry.signing_input != signing_input:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(signature)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(signature)
+        self.hits += 1
+        return entry.claims, entry.principal
+
+    def put(self, token: str, claims: dict, principal: Principal) -> None:
+        if not self.enabled:
+            return
+        signing_input, signature = self._split(token)
+        expires_at = time.time() + self.ttl
+        exp = claims.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        self._remove(signature)
+        self._entries[signature] = _Entry(signing_input, expires_at, claims, principal)
+        self._by_user.setdefault(principal.username, set()).add(signature)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, signature: str) -> None:
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        signatures = self._by_user.get(entry.principal.username)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._by_user[entry.principal.username]
+
+    def invalidate_user(self, username: str) -> None:
+        """Drop every cached token for a user, e.g. after deactivation"""
+        for signature in list(self._by_user.get(username, ())):
+            self._remove(signature)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+token_cache = TokenCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+    enabled=settings.TOKEN_CACHE_ENABLED,
+)
+
+def _collect(metrics: MetricFamilies) -> None:
+    metrics.counter("openalgo_token_cache_hits_total", "Verified-token cache hits", {}, token_cache.hits)
+    metrics.counter("openalgo_token_cache_misses_total", "Verified-token cache misses", {}, token_cache.misses)
+    metrics.gauge("openalgo_token_cache_entries", "Tokens currently cached", {}, token_cache.stats()["size"])
+
+register_collector(_collect)
@@ -0,0 +1,248 @@
+"""
+Traffic recorder: a fixed-size request log per worker.
+
+TrafficMiddleware writes one fixed-size record per HTTP request: timestamp,
+route id (method and route template), status, latency and authenticated user. Records go into a
+preallocated NumPy ring buffer, with no allocation, database write or log line
+per request. When TRAFFIC_DIR is set (ideally on tmpfs such as /dev/shm), the
+ring buffer is a memory-mapped file in that directory. Other workers can then
+read it directly, with no export step. Without TRAFFIC_DIR the buffer is
+process-local.
+
+Route ids are a CRC32 of "METHOD /route/template", so every worker assigns the
+same id to the same route and buffers merge without a shared registry.
+`summarize` computes request rates, error rates, latency percentiles and
+per-route / per-user breakdowns over the 1m/5m/1h windows, with vectorized
+NumPy operations over the merged records.
+
+Reads do not lock against the writers, so a record being written at that
+instant may be read half-updated. That is acceptable for monitoring.
+"""
+import glob
+import logging
+import os
+import time
+import zlib
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .config import settings
+from .metrics import MetricFamilies, register_collector
+
+logger = logging.getLogger("openalgo")
+
+RECORD = np.dtype([
+    ("ts", "<f8"),          # epoch seconds
+    ("route", "<u4"),       # route_id(method, template)
+    ("status", "<u2"),
+    ("latency", "<f4"),     # seconds
+    ("user_id", "<i4"),     # 0 for unauthenticated requests
+])
+MAGIC = 0x4F41545246303031  # "OATRF001"
+HEADER_SIZE = 64  # uint64 magic, capacity, records written, pid
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+PERCENTILES = (50, 95, 99)
+
+def route_id(method: str, route: str) -> int:
+    return zlib.crc32(f"{method} {route}".encode())
+
+# Route names seen by this worker, for labelling merged ids
+route_names: Dict[int, str] = {}
+
+class TrafficRecorder:
+    def __init__(self, capacity: int, path: Optional[str] = None):
+        self.capacity = capacity
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.truncate(HEADER_SIZE + capacity * RECORD.itemsize)
+            self.header = np.memmap(path, dtype="<u8", mode="r+", shape=(HEADER_SIZE // 8,))
+            self.records = np.memmap(path, dtype=RECORD, mode="r+", offset=HEADER_SIZE, shape=(capacity,))
+        else:
+            self.header = np.zeros(HEADER_SIZE // 8, dtype="<u8")
+            self.records = np.zeros(capacity, dtype=RECORD)
+        self.header[0], self.header[1], self.header[2], self.header[3] = MAGIC, capacity, 0, os.getpid()
+        self.written = 0
+
+    def record(self, ts: float, route: int, status: int, latency: float, user_id: int) -> None:
+        self.records[self.written % self.capacity] = (ts, route, status, latency, user_id)
+        self.written += 1
+        # Published after the record so readers never count a slot before it is written
+        self.header[2] = self.written
+
+    def snapshot(self) -> np.ndarray:
+        return np.array(self.records[:min(self.written, self.capacity)])
+
+    def close(self) -> None:
+        if self.path:
+            del self.header, self.records
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+def _read_worker_file(path: str) -> Optional[np.ndarray]:
+    try:
+        header = np.fromfile(path, dtype="<u8", count=HEADER_SIZE // 8)
+        if len(header) < 4 or header[0] != MAGIC:
+            return None
+        capacity, written, pid = int(header[1]), int(header[2]), int(header[3])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            # Left behind by a worker that did not shut down cleanly
+            os.remove(path)
+            return None
+        except PermissionError:
+            pass
+        records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(capacity,))
+        return np.array(records[:min(written, capacity)])
+    except (OSError, ValueError):
+        return None
+
+def _worker_path(directory: str) -> str:
+    return os.path.join(directory, f"worker_{os.getpid()}.bin")
+
+recorder: Optional[TrafficRecorder] = None
+
+def start_traffic() -> None:
+    global recorder
+    if recorder is None and settings.TRAFFIC_CAPACITY > 0:
+        path = _worker_path(settings.TRAFFIC_DIR) if settings.TRAFFIC_DIR else None
+        recorder = TrafficRecorder(settings.TRAFFIC_CAPACITY, path)
+
+def stop_traffic() -> None:
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        recorder = None
+
+def collect_records() -> Tuple[np.ndarray, int]:
+    """(records, workers read): this worker's records, or every live worker's when TRAFFIC_DIR is set"""
+    if settings.TRAFFIC_DIR:
+        parts = [part for part in map(_read_worker_file, glob.glob(os.path.join(settings.TRAFFIC_DIR, "worker_*.bin")))
+                 if part is not None]
+    else:
+        parts = [recorder.snapshot()] if recorder is not None else []
+    return (np.concatenate(parts) if parts else np.zeros(0, dtype=RECORD)), len(parts)
+
+# The authenticated user of the current request, filled in by auth.get_current_user
+_request_user: ContextVar[Optional[List[int]]] = ContextVar("request_user", default=None)
+
+def note_user(user_id: int) -> None:
+    holder = _request_user.get()
+    if holder is not None:
+        holder[0] = user_id
+
+class TrafficMiddleware:
+    """Pure ASGI middleware writing one ring-buffer record per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or recorder is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        # A mutable holder, so the user set deep inside the request is visible here
+        user = [0]
+        token = _request_user.set(user)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_user.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            rid = route_id(scope["method"], route)
+            if rid not in route_names:
+                route_names[rid] = f"{scope['method']} {route}"
+            if recorder is not None:
+                recorder.record(time.time(), rid, status_code, time.perf_counter() - started, user[0])
+
+def _percentiles(latency: np.ndarray) -> Dict[str, float]:
+    if not len(latency):
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    values = np.percentile(latency, PERCENTILES)
+    return {f"p{p}": round(float(v) * 1000, 3) for p, v in zip(PERCENTILES, values)}
+
+def _group_percentiles(groups: np.ndarray, latency: np.ndarray, count: int) -> Dict[int, np.ndarray]:
+    """Nearest-rank percentiles per group index, from one sort of (group, latency)"""
+    order = np.lexsort((latency, groups))
+    sorted_latency = latency[order]
+    sizes = np.bincount(groups, minlength=count)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return {
+        p: sorted_latency[starts + np.floor((sizes - 1) * p / 100).astype(np.int64)]
+        for p in PERCENTILES
+    }
+
+def _window(records: np.ndarray, seconds: int, names: Dict[int, str], top: int) -> dict:
+    total = len(records)
+    status = records["status"]
+    latency = records["latency"].astype(np.float64)
+    server_errors = int(np.count_nonzero(status >= 500))
+    client_errors = int(np.count_nonzero((status >= 400) & (status < 500)))
+    summary = {
+        "requests": total,
+        "rate_per_second": round(total / seconds, 3),
+        "error_rate": round(server_errors / total, 4) if total else 0.0,
+        "client_error_rate": round(client_errors / total, 4) if total else 0.0,
+        "latency_ms": _percentiles(latency),
+        "routes": [],
+        "top_users": [],
+    }
+    if not total:
+        return summary
+
+    routes, groups = np.unique(records["route"], return_inverse=True)
+    counts = np.bincount(groups)
+    errors = np.bincount(groups, weights=(status >= 500).astype(np.float64), minlength=len(routes))
+    percentiles = _group_percentiles(groups, latency, len(routes))
+    for i in np.argsort(-counts)[:top]:
+        summary["routes"].append({
+            "route": names.get(int(routes[i]), f"route:{int(routes[i])}"),
+            "requests": int(counts[i]),
+            "rate_per_second": round(int(counts[i]) / seconds, 3),
+            "error_rate": round(float(errors[i]) / int(counts[i]), 4),
+            "latency_ms": {f"p{p}": round(float(percentiles[p][i]) * 1000, 3) for p in PERCENTILES},
+        })
+
+    users, user_counts = np.unique(records["user_id"][records["user_id"] > 0], return_counts=True)
+    for i in np.argsort(-user_counts)[:top]:
+        summary["top_users"].append({"user_id": int(users[i]), "requests": int(user_counts[i])})
+    return summary
+
+def summarize(records: np.ndarray, workers: int = 1, routes: Iterable[str] = (), now: Optional[float] = None,
+              top: int = 20) -> dict:
+    """Rates, error rates and latency percentiles per window; `routes` ("METHOD /template") label the route ids"""
+    now = now or time.time()
+    names = {}
+    for route in routes:
+        method, _, path = route.partition(" ")
+        names.setdefault(route_id(method, path), route)
+    result = {
+        "workers_merged": workers,
+        "oldest_record": float(records["ts"].min()) if len(records) else None,
+        "windows": {},
+    }
+    for label, seconds in WINDOWS.items():
+        result["windows"][label] = _window(records[records["ts"] >= now - seconds], seconds, names, top)
+    return result
+
+def _collect(metrics: MetricFamilies) -> None:
+    if recorder is not None:
+        metrics.counter("openalgo_traffic_records_total", "Requests written to the traffic ring buffer", {},
+                        recorder.written)
+        metrics.gauge("openalgo_traffic_buffer_capacity", "Traffic ring buffer size in records", {}, recorder.capacity)
+
+register_collector(_collect)
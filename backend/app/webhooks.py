@@ -0,0 +1,306 @@
+"""
+Webhook ingestion for ChartInk, TradingView and Amibroker signals.
+
+The request path does only cheap work: resolve the API key through an
+in-memory cache (compared in constant time), parse the body, derive an
+idempotency key and put the alert on a bounded asyncio queue. The response
+goes out as soon as the alert is queued. A pool of workers drains the queue
+into batched INSERT ... ON CONFLICT DO NOTHING statements against the
+(strategy_id, idempotency_key) unique index, so a retried alert is stored, and
+acted on, only once. Handlers registered with `register_alert_handler` run only
+for alerts that were actually inserted.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+from fastapi import HTTPException, status
+from tortoise import Tortoise
+from . import models
+from .config import settings
+from .metrics import Histogram, MetricFamilies, register_collector
+from .realtime import hub
+
+logger = logging.getLogger("openalgo")
+
+API_KEY_PREFIX = "oa"
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
+MAX_STRATEGY_ID = 2**31 - 1
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+def new_api_key(strategy_id: int) -> str:
+    return f"{API_KEY_PREFIX}_{strategy_id}_{secrets.token_urlsafe(32)}"
+
+class CachedStrategy:
+    __slots__ = ("id", "user_id", "api_key_hash", "is_active")
+
+    def __init__(self, id: int, user_id: int, api_key_hash: str, is_active: bool):
+        self.id = id
+        self.user_id = user_id
+        self.api_key_hash = api_key_hash
+        self.is_active = is_active
+
+class StrategyKeyCache:
+    """
+    Strategy lookups by the id embedded in the API key
+
+    The presented key is hashed and compared with hmac.compare_digest, so the
+    response time does not depend on how much of a guessed key was right.
+    Unknown ids are cached too, so bad keys cannot turn into a query per request.
+    Known and unknown ids share one LRU of `max_entries`, so random ids cannot
+    grow it without bound. Rotations made on another worker take effect after
+    at most `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # strategy id -> (expires at, strategy or None if the id does not exist)
+        self._entries: "OrderedDict[int, Tuple[float, Optional[CachedStrategy]]]" = OrderedDict()
+
+    @staticmethod
+    def parse_strategy_id(api_key: str) -> Optional[int]:
+        prefix, _, rest = api_key.partition("_")
+        strategy_id, _, secret = rest.partition("_")
+        if prefix != API_KEY_PREFIX or not secret or not strategy_id.isascii() or not strategy_id.isdecimal():
+            return None
+        value = int(strategy_id)
+        # Strategy.id is a Postgres INT
+        return value if 0 < value <= MAX_STRATEGY_ID else None
+
+    async def _load(self, strategy_id: int) -> Optional[CachedStrategy]:
+        now = time.monotonic()
+        cached = self._entries.get(strategy_id)
+        if cached is not None and cached[0] > now:
+            self._entries.move_to_end(strategy_id)
+            return cached[1]
+        strategy = await models.Strategy.filter(id=strategy_id).first()
+        entry = None
+        if strategy is not None:
+            entry = CachedStrategy(strategy.id, strategy.user_id, strategy.api_key_hash, strategy.is_active)
+        self._entries[strategy_id] = (now + self.ttl, entry)
+        self._entries.move_to_end(strategy_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def authenticate(self, api_key: str) -> Optional[CachedStrategy]:
+        strategy_id = self.parse_strategy_id(api_key)
+        if strategy_id is None:
+            return None
+        entry = await self._load(strategy_id)
+        if entry is None or not hmac.compare_digest(hash_api_key(api_key), entry.api_key_hash):
+            return None
+        return entry if entry.is_active else None
+
+    def invalidate(self, strategy_id: int) -> None:
+        self._entries.pop(strategy_id, None)
+
+key_cache = StrategyKeyCache(ttl=settings.WEBHOOK_KEY_CACHE_TTL, max_entries=settings.WEBHOOK_KEY_CACHE_MAX_ENTRIES)
+
+def parse_payload(body: bytes) -> dict:
+    """JSON objects are stored as sent; anything else (e.g. a plain TradingView message) as {"message": text}"""
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Webhook body must be UTF-8")
+    if not text.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty webhook body")
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return {"message": text}
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Webhook body must be a JSON object")
+    return payload
+
+def idempotency_key_for(header: Optional[str], payload: dict, body: bytes) -> str:
+    """
+    The Idempotency-Key header, else an "idempotency_key"/"alert_id" field, else
+    a digest of the raw body. Retries of the same alert carry the same body;
+    distinct alerts should include a timestamp (ChartInk's triggered_at,
+    TradingView's {{timenow}}).
+    """
+    key = header or payload.get("idempotency_key") or payload.get("alert_id")
+    if key is None:
+        return hashlib.sha256(body).hexdigest()
+    key = str(key)
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency key too long")
+    return key
+
+# (strategy_id, user_id, idempotency_key, payload JSON, received_at)
+QueuedAlert = Tuple[int, int, str, str, datetime]
+AlertHandler = Callable[[int, int, int, dict], Awaitable[None]]
+
+class WebhookPipeline:
+    def __init__(self, queue_size: int, workers: int, batch_size: int, flush_interval: float):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: Optional[asyncio.Queue] = None
+        self.accepted = 0
+        self.rejected = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.batch_latency = Histogram()
+        self._tasks: List[asyncio.Task] = []
+        self._handlers: List[AlertHandler] = []
+
+    def register_handler(self, handler: AlertHandler) -> None:
+        self._handlers.append(handler)
+
+    def enqueue(self, strategy: CachedStrategy, idempotency_key: str, payload: dict) -> None:
+        """Queue an alert without waiting; raises 503 when the queue is full"""
+        if self.queue is None:
+            self.start()
+        try:
+            self.queue.put_nowait((
+                strategy.id,
+                strategy.user_id,
+                idempotency_key,
+                json.dumps(payload, separators=(",", ":")),
+                datetime.now(timezone.utc),
+            ))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Webhook queue is full, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.accepted += 1
+
+    async def _next_batch(self) -> List[QueuedAlert]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _insert(self, batch: List[QueuedAlert]) -> List[dict]:
+        client = Tortoise.get_connection("default")
+        return await client.execute_query_dict(
+            """
+            INSERT INTO webhook_alerts (strategy_id, idempotency_key, payload, received_at, created_at)
+            SELECT strategy_id, idempotency_key, payload::jsonb, received_at, now()
+            FROM unnest($1::int[], $2::text[], $3::text[], $4::timestamptz[])
+                AS batch(strategy_id, idempotency_key, payload, received_at)
+            ON CONFLICT (strategy_id, idempotency_key) DO NOTHING
+            RETURNING id, strategy_id, idempotency_key
+            """,
+            [
+                [alert[0] for alert in batch],
+                [alert[2] for alert in batch],
+                [alert[3] for alert in batch],
+                [alert[4] for alert in batch],
+            ]
+        )
+
+    async def _dispatch(self, batch: List[QueuedAlert], inserted: List[dict]) -> None:
+        if not self._handlers:
+            return
+        by_key = {(alert[0], alert[2]): alert for alert in batch}
+        for row in inserted:
+            strategy_id, user_id, _, payload, _ = by_key[(row["strategy_id"], row["idempotency_key"])]
+            for handler in self._handlers:
+                try:
+                    await handler(row["id"], strategy_id, user_id, json.loads(payload))
+                except Exception as e:
+                    logger.error(f"Webhook alert handler {handler.__name__} failed for alert {row['id']}: {str(e)}")
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                # Duplicates within one batch would make ON CONFLICT see the same key twice
+                unique = list({(alert[0], alert[2]): alert for alert in batch}.values())
+                started = time.perf_counter()
+                inserted = await self._insert(unique)
+                self.batch_latency.observe(time.perf_counter() - started)
+                self.inserted += len(inserted)
+                self.duplicates += len(batch) - len(inserted)
+                await self._dispatch(unique, inserted)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to store {len(batch)} webhook alerts: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def start(self) -> None:
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush queued alerts, then stop the workers"""
+        if self.queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.queue.qsize()} queued webhook alerts at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "batch_latency": self.batch_latency.snapshot(),
+        }
+
+pipeline = WebhookPipeline(
+    queue_size=settings.WEBHOOK_QUEUE_SIZE,
+    workers=settings.WEBHOOK_WORKERS,
+    batch_size=settings.WEBHOOK_BATCH_SIZE,
+    flush_interval=settings.WEBHOOK_FLUSH_INTERVAL,
+)
+
+def register_alert_handler(handler: AlertHandler) -> None:
+    """Run handler(alert_id, strategy_id, user_id, payload) once per newly stored alert"""
+    pipeline.register_handler(handler)
+
+async def _notify_owner(alert_id: int, strategy_id: int, user_id: int, payload: dict) -> None:
+    await hub.publish(user_id, "alerts", {"id": alert_id, "strategy_id": strategy_id, "payload": payload})
+
+register_alert_handler(_notify_owner)
+
+def _collect(metrics: MetricFamilies) -> None:
+    stats = pipeline.stats()
+    metrics.gauge("openalgo_webhook_queue_depth", "Webhook alerts waiting to be stored", {}, stats["queued"])
+    metrics.counter("openalgo_webhook_accepted_total", "Webhook alerts acknowledged", {}, stats["accepted"])
+    metrics.counter("openalgo_webhook_rejected_total", "Webhook alerts rejected with 503", {}, stats["rejected"])
+    metrics.counter("openalgo_webhook_inserted_total", "Webhook alerts stored", {}, stats["inserted"])
+    metrics.counter("openalgo_webhook_duplicates_total", "Webhook alerts ignored as retries", {}, stats["duplicates"])
+    metrics.counter("openalgo_webhook_failed_total", "Webhook alerts lost to insert errors", {}, stats["failed"])
+    metrics.histogram("openalgo_webhook_batch_insert_seconds", "Time per batched alert insert", {}, pipeline.batch_latency)
+
+register_collector(_collect)
@@ -0,0 +1,75 @@
+"""
+Benchmark: instrument index build time, lookups/s and prefix searches/s.
+
+Writes a synthetic contract master of --rows instruments to a temporary
+directory, builds and maps the index, then times cold lookups (binary search
+over the mapped file), memoized lookups and search-as-you-type prefix queries.
+
+    cd backend && python -m benchmarks.bench_instruments --rows 200000 --lookups 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from app.instruments import InstrumentMaster, build_index
+
+def write_contract_master(path: str, rows: int) -> list:
+    symbols = []
+    with open(path, "w") as f:
+        f.write("token,symbol,name,lotsize,exch_seg,tick_size\n")
+        for i in range(rows):
+            symbol = f"SYM{i:07d}-{random.choice(('EQ', 'FUT', 'CE', 'PE'))}"
+            exchange = random.choice(("NSE", "BSE", "NFO"))
+            f.write(f"{100000 + i},{symbol},Instrument {i},{random.choice((1, 25, 50, 75))},{exchange},0.05\n")
+            symbols.append((exchange, symbol))
+    return symbols
+
+def main(rows: int, lookups: int):
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "master.csv")
+        index_path = os.path.join(directory, "instruments.idx")
+        symbols = write_contract_master(csv_path, rows)
+
+        started = time.perf_counter()
+        build_index([csv_path], index_path, b"\0" * 32)
+        print(f"built {rows} instruments in {time.perf_counter() - started:.2f}s "
+              f"({os.path.getsize(index_path) / 1e6:.1f} MB index)")
+
+        cold = InstrumentMaster(index_path, memo_size=0)
+        started = time.perf_counter()
+        cold.open()
+        print(f"mapped in {(time.perf_counter() - started) * 1000:.2f}ms")
+
+        sample = [random.choice(symbols) for _ in range(lookups)]
+        started = time.perf_counter()
+        for exchange, symbol in sample:
+            cold.lookup(exchange, symbol)
+        elapsed = time.perf_counter() - started
+        print(f"binary-search lookups: {lookups / elapsed:,.0f}/s ({elapsed / lookups * 1e6:.2f}us each)")
+
+        hot = InstrumentMaster(index_path)
+        hot.open()
+        working_set = symbols[:1000]
+        sample = [random.choice(working_set) for _ in range(lookups)]
+        started = time.perf_counter()
+        for exchange, symbol in sample:
+            hot.lookup(exchange, symbol)
+        elapsed = time.perf_counter() - started
+        print(f"memoized lookups (1000 hot symbols): {lookups / elapsed:,.0f}/s ({elapsed / lookups * 1e6:.2f}us each)")
+
+        queries = [symbol[:random.randint(3, 8)].lower() for _, symbol in random.sample(symbols, 10000)]
+        started = time.perf_counter()
+        for query in queries:
+            hot.search(query, limit=20)
+        elapsed = time.perf_counter() - started
+        print(f"prefix searches (20 results): {len(queries) / elapsed:,.0f}/s")
+        cold.close()
+        hot.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.rows, args.lookups)
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: JWT sign and verify throughput per backend and algorithm.
+
+Compares python-jose and PyJWT for HS256, ES256 and EdDSA using pre-parsed key
+objects (what app.jwt_keys does), plus python-jose with a PEM string per call to
+show the cost of re-parsing keys. No database is needed.
+
+    cd backend && python -m benchmarks.bench_jwt --iterations 5000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from app.jwt_keys import JoseBackend, PyJWTBackend, pyjwt
+
+SECRET = "bench-secret-key-bench-secret-key"
+
+def make_claims() -> dict:
+    now = datetime.utcnow()
+    return {"sub": "bench_user", "iat": now, "exp": now + timedelta(minutes=30)}
+
+def rate(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - started)
+
+def bench(label: str, backend, algorithm: str, private_key, public_key, iterations: int) -> None:
+    signer = backend.prepare(private_key, algorithm)
+    verifier = backend.prepare(public_key, algorithm)
+    claims = make_claims()
+    token = backend.encode(claims, signer, algorithm, {"kid": "bench"})
+    signs = rate(lambda: backend.encode(claims, signer, algorithm, {"kid": "bench"}), iterations)
+    verifies = rate(lambda: backend.decode(token, verifier, algorithm), iterations)
+    print(f"{label:<24} {algorithm:<6} sign {signs:10.0f}/s   verify {verifies:10.0f}/s")
+
+def main(iterations: int):
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    ed_key = ed25519.Ed25519PrivateKey.generate()
+    backends = [("python-jose", JoseBackend())]
+    if pyjwt is not None:
+        backends.append(("pyjwt", PyJWTBackend()))
+    else:
+        print("PyJWT not installed: skipping pyjwt and EdDSA")
+
+    for label, backend in backends:
+        bench(label, backend, "HS256", SECRET, SECRET, iterations)
+        bench(label, backend, "ES256", ec_key, ec_key.public_key(), iterations)
+        if "EdDSA" in backend.algorithms:
+            bench(label, backend, "EdDSA", ed_key, ed_key.public_key(), iterations)
+
+    # Baseline: python-jose handed PEM text, parsed again on every call
+    from jose import jwt as jose_jwt
+    private_pem = ec_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = ec_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    token = jose_jwt.encode(make_claims(), private_pem, algorithm="ES256")
+    verifies = rate(lambda: jose_jwt.decode(token, public_pem, algorithms=["ES256"]), iterations)
+    print(f"{'python-jose (PEM/call)':<24} {'ES256':<6} {'':22}verify {verifies:10.0f}/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.iterations)
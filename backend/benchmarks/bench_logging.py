@@ -0,0 +1,87 @@
+"""
+Benchmark: request latency with logging off, with the old synchronous file
+handlers, and with the queued logging pipeline.
+
+The route logs three INFO lines per request, like /auth/token does. No database
+is needed; the app runs in-process over httpx's ASGI transport.
+
+    cd backend && python -m benchmarks.bench_logging --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import logging.handlers
+import os
+import statistics
+import tempfile
+import time
+import httpx
+from fastapi import FastAPI
+from app import logging_config
+
+logger = logging.getLogger("openalgo.bench")
+
+app = FastAPI()
+
+@app.post("/login")
+async def login():
+    logger.info("Login attempt for user: bench")
+    logger.info("Password verified for user: bench")
+    logger.info("Successful login for user: bench")
+    return {"ok": True}
+
+def configure(mode: str, log_dir: str) -> None:
+    logging_config.shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(logging.INFO)
+    logger.disabled = mode == "off"
+    if mode == "sync":
+        # The previous setup: handlers attached straight to the root logger
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, "sync.log"), maxBytes=10485760, backupCount=5
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        root.addHandler(handler)
+    elif mode == "queue":
+        logging_config.settings.LOG_DIR = log_dir
+        logging_config.setup_logging()
+        # Keep the console quiet so the numbers reflect file logging only
+        for handler in logging_config._listener.handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setLevel(logging.CRITICAL)
+
+async def run(requests: int, concurrency: int) -> list:
+    latencies = []
+    remaining = requests
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                await client.post("/login")
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+def main(requests: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode in ("off", "sync", "queue"):
+            configure(mode, log_dir)
+            latencies = sorted(asyncio.run(run(requests, concurrency)))
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+            print(f"{mode:6s} p50={p50:7.3f}ms p99={p99:7.3f}ms")
+        logging_config.shutdown_logging()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    main(args.requests, args.concurrency)
@@ -0,0 +1,65 @@
+"""
+Benchmark: order placement throughput and tail latency against the mock broker.
+
+Drives a BrokerChannel directly (no database, no HTTP server) so the numbers
+isolate the routing layer: pooled client, concurrency cap, retries and the
+mock broker's simulated latency/jitter/failures.
+
+    cd backend && python -m benchmarks.bench_orders --orders 10000 --concurrency 500 --latency-ms 20 --jitter-ms 15
+"""
+import argparse
+import asyncio
+import time
+from app import schemas
+from app.brokers import BrokerError, MockBroker
+from app.order_router import HTTP2_AVAILABLE, BrokerChannel
+
+async def main(orders: int, concurrency: int, cap: int, latency_ms: float, jitter_ms: float,
+               failure_rate: float, retries: int):
+    channel = BrokerChannel(
+        MockBroker(latency_ms=latency_ms, jitter_ms=jitter_ms, failure_rate=failure_rate),
+        max_concurrency=cap,
+        max_connections=cap,
+        timeout=5.0,
+        retries=retries,
+        backoff=0.01,
+        deadline=10.0,
+    )
+    order = schemas.OrderCreate(symbol="SBIN", side="BUY", quantity=1)
+    remaining = orders
+    failures = 0
+
+    async def worker():
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            try:
+                await channel.place(order)
+            except BrokerError:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await channel.client.aclose()
+
+    latency = channel.placement_latency
+    print(f"{orders} orders in {elapsed:.2f}s: {orders / elapsed:.0f} orders/s "
+          f"(cap {cap}, {concurrency} clients, http2 available: {HTTP2_AVAILABLE})")
+    print(f"placement p50 {latency.quantile(0.5) * 1000:.1f}ms, p99 {latency.quantile(0.99) * 1000:.1f}ms, "
+          f"p99.9 {latency.quantile(0.999) * 1000:.1f}ms")
+    print(f"slot wait p99 {channel.slot_wait.quantile(0.99) * 1000:.1f}ms; "
+          f"retries {channel.retried}, failures {failures}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=500, help="Concurrent callers")
+    parser.add_argument("--cap", type=int, default=50, help="Broker concurrency cap")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--retries", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.concurrency, args.cap, args.latency_ms, args.jitter_ms,
+                     args.failure_rate, args.retries))
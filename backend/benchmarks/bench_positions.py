@@ -0,0 +1,66 @@
+"""
+Benchmark: position engine fills/s and mark-to-market ticks/s.
+
+Builds --users x --symbols positions (10k x 50 = 500k by default) in memory,
+no database, then measures:
+
+- single-symbol ticks, each re-marking that symbol across every user
+- batch marks of all symbols at once, re-marking every position
+- the same single-symbol mark as a Python loop, for comparison
+
+    cd backend && python -m benchmarks.bench_positions --users 10000 --symbols 50
+"""
+import argparse
+import random
+import time
+from app.positions import PositionEngine, symbol_key
+
+def main(users: int, symbols: int, ticks: int):
+    engine = PositionEngine(capacity=users * symbols)
+    names = [f"SYM{i}" for i in range(symbols)]
+
+    started = time.perf_counter()
+    for user_id in range(1, users + 1):
+        for name in names:
+            engine.apply_fill(user_id, "NSE", name, random.choice(("BUY", "SELL")), random.randint(1, 100),
+                              random.uniform(90, 110))
+    elapsed = time.perf_counter() - started
+    print(f"{engine.size} positions built: {engine.size / elapsed:,.0f} fills/s")
+
+    started = time.perf_counter()
+    for _ in range(ticks):
+        engine.on_tick("NSE", random.choice(names), random.uniform(90, 110))
+    elapsed = time.perf_counter() - started
+    print(f"single-symbol ticks ({users} positions each): {ticks / elapsed:,.0f} ticks/s")
+
+    keys = [symbol_key("NSE", name) for name in names]
+    rounds = max(1, ticks // symbols)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        engine.mark(keys, [random.uniform(90, 110) for _ in keys])
+    elapsed = time.perf_counter() - started
+    print(f"batch marks of {symbols} symbols ({engine.size} positions each): "
+          f"{rounds / elapsed:,.1f} rounds/s = {rounds * symbols / elapsed:,.0f} ticks/s")
+
+    # Baseline: the same single-symbol mark-to-market as a Python loop
+    index = engine._symbols[keys[0]]
+    slots = engine._symbol_slots[index]
+    loops = max(1, ticks // 100)
+    started = time.perf_counter()
+    for _ in range(loops):
+        price = random.uniform(90, 110)
+        for slot in slots:
+            engine.unrealized[slot] = (price - engine.avg_price[slot]) * engine.quantity[slot]
+    elapsed = time.perf_counter() - started
+    print(f"python-loop single-symbol ticks: {loops / elapsed:,.0f} ticks/s")
+
+    realized, unrealized = engine.totals()
+    print(f"totals over {len(realized)} users: realized {realized.sum():,.2f}, unrealized {unrealized.sum():,.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.users, args.symbols, args.ticks)
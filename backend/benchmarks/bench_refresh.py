@@ -0,0 +1,91 @@
+"""
+Benchmark: token renewals per second via /auth/token (bcrypt verify) versus
+/auth/refresh (single rotation query).
+
+Runs the app in-process over httpx's ASGI transport against the configured
+Postgres database. Each refresh worker keeps rotating its own refresh token,
+as a real client would.
+
+    cd backend && python -m benchmarks.bench_refresh --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from app import auth, models
+from app.database import init_db, close_db
+from app.hashing import password_hasher
+from app.sessions import purge_expired_sessions
+from main import app
+
+BENCH_USERNAME = "bench_refresh"
+BENCH_EMAIL = "bench_refresh@example.com"
+BENCH_PASSWORD = "Bench-Pass-123!"
+
+async def ensure_bench_user():
+    user = await models.User.filter(username=BENCH_USERNAME).first()
+    if user is None:
+        user = await models.User.create(
+            email=BENCH_EMAIL,
+            username=BENCH_USERNAME,
+            hashed_password=auth.get_password_hash(BENCH_PASSWORD)
+        )
+    return user
+
+async def login(client: httpx.AsyncClient) -> str:
+    response = await client.post("/auth/token", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["refresh_token"]
+
+async def run_logins(client: httpx.AsyncClient, requests: int, concurrency: int) -> float:
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await login(client)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+async def run_refreshes(client: httpx.AsyncClient, requests: int, concurrency: int) -> float:
+    remaining = requests
+    tokens = [await login(client) for _ in range(concurrency)]
+
+    async def worker(refresh_token: str):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+            response.raise_for_status()
+            refresh_token = response.json()["refresh_token"]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(token) for token in tokens))
+    return requests / (time.perf_counter() - started)
+
+async def main(requests: int, concurrency: int):
+    await init_db()
+    try:
+        await ensure_bench_user()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            logins = await run_logins(client, requests, concurrency)
+            refreshes = await run_refreshes(client, requests, concurrency)
+        print(f"/auth/token:   {logins:10.1f} req/s")
+        print(f"/auth/refresh: {refreshes:10.1f} req/s  ({refreshes / logins:.2f}x)")
+        print(f"hash pool:     {password_hasher.stats()}")
+        await models.RefreshSession.filter(user__username=BENCH_USERNAME).delete()
+        await purge_expired_sessions()
+    finally:
+        password_hasher.shutdown()
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
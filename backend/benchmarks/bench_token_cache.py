@@ -0,0 +1,72 @@
+"""
+Micro-benchmark: requests/second on /auth/users/me with and without the
+verified-token cache.
+
+Runs the app in-process over httpx's ASGI transport against the configured
+Postgres database, so the uncached numbers include the real user lookup.
+
+    cd backend && python -m benchmarks.bench_token_cache --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from app import auth, models
+from app.database import init_db, close_db
+from app.token_cache import token_cache
+from main import app
+
+BENCH_USERNAME = "bench_token_cache"
+BENCH_EMAIL = "bench_token_cache@example.com"
+
+async def ensure_bench_user():
+    user = await models.User.filter(username=BENCH_USERNAME).first()
+    if user is None:
+        user = await models.User.create(
+            email=BENCH_EMAIL,
+            username=BENCH_USERNAME,
+            hashed_password=auth.get_password_hash("Bench-Pass-123!")
+        )
+    return user
+
+async def run(client: httpx.AsyncClient, headers: dict, requests: int, concurrency: int) -> float:
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get("/auth/users/me", headers=headers)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+async def main(requests: int, concurrency: int):
+    await init_db()
+    try:
+        user = await ensure_bench_user()
+        token = auth.create_access_token({"sub": user.username})
+        headers = {"Authorization": f"Bearer {token}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            token_cache.enabled = False
+            uncached = await run(client, headers, requests, concurrency)
+
+            token_cache.enabled = True
+            token_cache.clear()
+            cached = await run(client, headers, requests, concurrency)
+
+        print(f"without cache: {uncached:10.1f} req/s")
+        print(f"with cache:    {cached:10.1f} req/s  ({cached / uncached:.2f}x)")
+        print(f"cache stats:   {token_cache.stats()}")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,50 @@
+"""
+Benchmark: traffic recorder write cost and windowed aggregation time.
+
+Fills a --capacity ring buffer (memory-mapped in a temporary directory, as with
+TRAFFIC_DIR) with synthetic requests spread over the last hour across --routes
+routes and --users users, then times `summarize` over the whole buffer.
+
+    cd backend && python -m benchmarks.bench_traffic --capacity 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from app.traffic import TrafficRecorder, route_id, summarize
+
+def main(capacity: int, routes: int, users: int):
+    names = [f"GET /bench/{i}" for i in range(routes)]
+    ids = [route_id("GET", f"/bench/{i}") for i in range(routes)]
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = TrafficRecorder(capacity, os.path.join(directory, f"worker_{os.getpid()}.bin"))
+        now = time.time()
+        samples = [
+            (now - random.uniform(0, 3600), random.choice(ids), random.choice((200, 200, 200, 201, 404, 500)),
+             random.expovariate(200), random.randint(0, users))
+            for _ in range(capacity)
+        ]
+        started = time.perf_counter()
+        for sample in samples:
+            recorder.record(*sample)
+        elapsed = time.perf_counter() - started
+        print(f"recorded {capacity} requests: {elapsed / capacity * 1e6:.2f}us each")
+
+        records = recorder.snapshot()
+        started = time.perf_counter()
+        summary = summarize(records, 1, names, now=now)
+        print(f"summarized {len(records)} records over {len(summary['windows'])} windows in "
+              f"{(time.perf_counter() - started) * 1000:.1f}ms")
+        for label, window in summary["windows"].items():
+            print(f"  {label}: {window['requests']} requests, {window['rate_per_second']}/s, "
+                  f"error rate {window['error_rate']}, latency {window['latency_ms']}")
+        recorder.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=1000000)
+    parser.add_argument("--routes", type=int, default=40)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.capacity, args.routes, args.users)
@@ -0,0 +1,320 @@
+"""
+Load test: throughput and tail latency of the auth and API hot paths over HTTP.
+
+Scenarios:
+
+- root      GET /                 baseline: routing, middleware, JSON
+- me        GET /auth/users/me    bearer token check (JWT + token cache)
+- token     POST /auth/token      login: bcrypt verify, JWT, refresh session
+- register  POST /auth/register   bcrypt hash + INSERT, a new user per request
+
+Each scenario runs for --duration seconds after --warmup seconds, either
+closed-loop (--concurrency clients issuing back-to-back requests) or open-loop
+(--rate requests/second with Poisson arrivals, at most --max-in-flight at
+once). Open-loop latency is measured from the scheduled send time, so a stalled
+server cannot hide its queueing delay (no coordinated omission). Arrivals over
+the in-flight cap are dropped and counted as failed requests, so a stall shows
+up in error_rate and dropped_rate rather than vanishing from the sample. A sampler
+records event-loop lag alongside. With --in-process the server shares that
+loop, so the lag is the server's own. Against a separate server it shows
+whether the generator itself kept up.
+
+Results are written as JSON with --output. --compare BASELINE.json checks a run
+against a stored one and exits with status 1 if throughput dropped,
+p95/p99 latency grew by more than --threshold, or the error or drop rate rose.
+
+    cd backend && python -m benchmarks.loadtest --url http://localhost:8000 --scenarios root,me,token \\
+        --concurrency 50 --duration 20 --output results.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+
+SCENARIOS = ("root", "me", "token", "register")
+BENCH_PASSWORD = "Bench-Pass-123!"
+LAG_INTERVAL = 0.01
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def summarize_latency(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 3),
+        "p95": round(percentile(values, 0.95) * 1000, 3),
+        "p99": round(percentile(values, 0.99) * 1000, 3),
+        "max": round(values[-1] * 1000, 3) if values else 0.0,
+        "mean": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+    }
+
+class LoopLagSampler:
+    """Measures how late a periodic sleep wakes up, i.e. how long the loop was blocked"""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self) -> None:
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return summarize_latency(self.samples)
+
+class Scenario:
+    """Builds one request per call; `setup` prepares the users and tokens it needs"""
+
+    def __init__(self, name: str, run_id: str):
+        self.name = name
+        self.run_id = run_id
+        self.counter = 0
+        self.access_token: Optional[str] = None
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        if self.name not in ("me", "token"):
+            return
+        username = f"lt_{self.run_id}"
+        await client.post("/auth/register", json={
+            "email": f"{username}@example.com", "username": username, "password": BENCH_PASSWORD
+        })
+        response = await client.post("/auth/token", data={"username": username, "password": BENCH_PASSWORD})
+        response.raise_for_status()
+        self.access_token = response.json()["access_token"]
+
+    def request(self, client: httpx.AsyncClient):
+        if self.name == "root":
+            return client.get("/")
+        if self.name == "me":
+            return client.get("/auth/users/me", headers={"Authorization": f"Bearer {self.access_token}"})
+        if self.name == "token":
+            return client.post("/auth/token", data={"username": f"lt_{self.run_id}", "password": BENCH_PASSWORD})
+        self.counter += 1
+        username = f"lt_{self.run_id}_{self.counter}"
+        return client.post("/auth/register", json={
+            "email": f"{username}@example.com", "username": username, "password": BENCH_PASSWORD
+        })
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.dropped = 0
+        self.recording = False
+
+    def drop(self) -> None:
+        """An open-loop arrival that found every in-flight slot taken: a failed request"""
+        if self.recording:
+            self.dropped += 1
+            self.errors += 1
+            self.statuses["dropped"] = self.statuses.get("dropped", 0) + 1
+
+    async def send(self, scenario: Scenario, client: httpx.AsyncClient, scheduled: Optional[float] = None) -> None:
+        started = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            response = await scenario.request(client)
+            outcome = str(response.status_code)
+            failed = response.status_code >= 400
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+            failed = True
+        if self.recording:
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[outcome] = self.statuses.get(outcome, 0) + 1
+            self.errors += failed
+
+async def closed_loop(scenario: Scenario, client: httpx.AsyncClient, recorder: Recorder, concurrency: int,
+                      until: float) -> None:
+    async def worker():
+        while time.perf_counter() < until:
+            await recorder.send(scenario, client)
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def open_loop(scenario: Scenario, client: httpx.AsyncClient, recorder: Recorder, rate: float,
+                    max_in_flight: int, until: float) -> None:
+    """Send at Poisson arrival times; arrivals over the in-flight cap are recorded as dropped"""
+    in_flight = set()
+    next_at = time.perf_counter()
+    while next_at < until:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            recorder.drop()
+        else:
+            task = asyncio.create_task(recorder.send(scenario, client, scheduled=next_at))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        next_at += random.expovariate(rate)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+async def run_scenario(name: str, client: httpx.AsyncClient, args, run_id: str) -> dict:
+    scenario = Scenario(name, run_id)
+    await scenario.setup(client)
+    recorder = Recorder()
+    lag = LoopLagSampler()
+
+    async def measure(until: float) -> None:
+        if args.rate:
+            await open_loop(scenario, client, recorder, args.rate, args.max_in_flight, until)
+        else:
+            await closed_loop(scenario, client, recorder, args.concurrency, until)
+
+    if args.warmup > 0:
+        await measure(time.perf_counter() + args.warmup)
+    recorder.recording = True
+    lag.start()
+    started = time.perf_counter()
+    await measure(started + args.duration)
+    elapsed = time.perf_counter() - started
+    loop_lag = await lag.stop()
+
+    completed = len(recorder.latencies)
+    # Dropped arrivals were never sent, but they are requests the server failed to take
+    attempted = completed + recorder.dropped
+    return {
+        "requests": completed,
+        "errors": recorder.errors,
+        "dropped": recorder.dropped,
+        "statuses": recorder.statuses,
+        "throughput": round(completed / elapsed, 2),
+        "error_rate": round(recorder.errors / attempted, 4) if attempted else 0.0,
+        "dropped_rate": round(recorder.dropped / attempted, 4) if attempted else 0.0,
+        "latency_ms": summarize_latency(recorder.latencies),
+        "loop_lag_ms": loop_lag,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print a comparison table; True if any scenario regressed beyond the threshold"""
+    regressed = False
+    print(f"\n{'scenario':<10} {'metric':<12} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"{name:<10} (not in baseline)")
+            continue
+        checks = [
+            ("throughput", before["throughput"], current["throughput"], -1),
+            ("p95_ms", before["latency_ms"]["p95"], current["latency_ms"]["p95"], 1),
+            ("p99_ms", before["latency_ms"]["p99"], current["latency_ms"]["p99"], 1),
+            ("error_rate", before["error_rate"], current["error_rate"], 1),
+            ("dropped_rate", before.get("dropped_rate", 0.0), current["dropped_rate"], 1),
+        ]
+        for metric, old, new, worse in checks:
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            flag = worse * change > threshold
+            if metric in ("error_rate", "dropped_rate"):
+                # Rates near zero swing wildly in relative terms; flag absolute increases only
+                flag = new - old > threshold / 10
+            regressed |= flag
+            print(f"{name:<10} {metric:<12} {old:>12} {new:>12} {change:>+8.1%} {'REGRESSION' if flag else ''}")
+    return regressed
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def main(args):
+    server = server_task = None
+    url = args.url
+    if args.in_process:
+        import uvicorn
+        from main import app
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        url = f"http://127.0.0.1:{port}"
+
+    run_id = f"{int(time.time()):x}{os.getpid() % 1000:03d}"
+    connections = args.max_in_flight if args.rate else args.concurrency
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    results = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "url": url,
+            "in_process": args.in_process,
+            "mode": "open" if args.rate else "closed",
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "max_in_flight": args.max_in_flight,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "host": platform.node(),
+        },
+        "scenarios": {},
+    }
+    try:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+            for name in args.scenarios:
+                result = await run_scenario(name, client, args, run_id)
+                results["scenarios"][name] = result
+                latency, lag = result["latency_ms"], result["loop_lag_ms"]
+                print(f"{name:<10} {result['throughput']:>9.1f} req/s  p50 {latency['p50']:.2f}ms  "
+                      f"p95 {latency['p95']:.2f}ms  p99 {latency['p99']:.2f}ms  errors {result['errors']}  "
+                      f"dropped {result['dropped']}  loop lag p99 {lag['p99']:.2f}ms max {lag['max']:.2f}ms")
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await server_task
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            print(f"\nregressions beyond {args.threshold:.0%} against {args.compare}")
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="Start the app under uvicorn in this process")
+    parser.add_argument("--scenarios", default="root,me,token,register",
+                        type=lambda value: [name for name in value.split(",") if name])
+    parser.add_argument("--concurrency", type=int, default=50, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, default=0.0, help="Open-loop arrivals per second (0 runs closed-loop)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}; choose from {', '.join(SCENARIOS)}")
+    asyncio.run(main(args))
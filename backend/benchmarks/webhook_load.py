@@ -0,0 +1,103 @@
+"""
+Load generator: webhook acknowledgement latency and ingestion throughput.
+
+Runs the app in-process over httpx's ASGI transport against the configured
+Postgres database, fires --alerts ChartInk-style alerts at --concurrency, and
+re-sends a --duplicate-fraction of them to exercise idempotency. Reports
+p50/p99/max ack latency, then waits for the ingestion workers to drain and
+checks that exactly the unique alerts were stored.
+
+    cd backend && python -m benchmarks.webhook_load --alerts 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import httpx
+from app import auth, models
+from app.database import init_db, close_db
+from app.metrics import Histogram
+from app.webhooks import hash_api_key, new_api_key, pipeline
+from main import app
+
+BENCH_USERNAME = "bench_webhooks"
+
+async def create_bench_strategy() -> tuple:
+    user = await models.User.filter(username=BENCH_USERNAME).first()
+    if user is None:
+        user = await models.User.create(
+            email=f"{BENCH_USERNAME}@example.com",
+            username=BENCH_USERNAME,
+            hashed_password=auth.get_password_hash("Bench-Pass-123!")
+        )
+    strategy = await models.Strategy.create(
+        user_id=user.id, name="webhook load test", platform="chartink", api_key_hash=hash_api_key(new_api_key(0))
+    )
+    api_key = new_api_key(strategy.id)
+    strategy.api_key_hash = hash_api_key(api_key)
+    await strategy.save(update_fields=["api_key_hash"])
+    return strategy, api_key
+
+def chartink_alert(i: int) -> bytes:
+    return json.dumps({
+        "stocks": "SBIN,INFY",
+        "trigger_prices": "601.5,1520.1",
+        "triggered_at": f"10:{i // 60 % 60:02d} am",
+        "scan_name": "bench scan",
+        "scan_url": "bench-scan",
+        "alert_name": "bench alert",
+        "alert_id": f"bench-{i}",
+    }).encode()
+
+async def main(alerts: int, concurrency: int, duplicate_fraction: float):
+    await init_db()
+    pipeline.start()
+    strategy, api_key = await create_bench_strategy()
+    try:
+        bodies = [chartink_alert(i) for i in range(alerts)]
+        bodies += random.sample(bodies, int(alerts * duplicate_fraction))
+        random.shuffle(bodies)
+        ack_latency = Histogram()
+        slowest = 0.0
+        statuses = {}
+        pending = iter(bodies)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                nonlocal slowest
+                for body in pending:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        f"/webhooks/{api_key}", content=body, headers={"content-type": "application/json"}
+                    )
+                    elapsed = time.perf_counter() - started
+                    ack_latency.observe(elapsed)
+                    slowest = max(slowest, elapsed)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            sent_in = time.perf_counter() - started
+            await pipeline.queue.join()
+            drained_in = time.perf_counter() - started
+
+        stored = await models.WebhookAlert.filter(strategy_id=strategy.id).count()
+        print(f"sent {len(bodies)} alerts ({alerts} unique) in {sent_in:.2f}s: {len(bodies) / sent_in:.0f} req/s, statuses {statuses}")
+        print(f"ack latency p50 {ack_latency.quantile(0.5) * 1000:.2f}ms, "
+              f"p99 {ack_latency.quantile(0.99) * 1000:.2f}ms, max {slowest * 1000:.2f}ms")
+        print(f"all alerts stored after {drained_in:.2f}s; {stored} rows for {alerts} unique alerts")
+        print(f"pipeline stats: {pipeline.stats()}")
+    finally:
+        await pipeline.stop()
+        await models.Strategy.filter(id=strategy.id).delete()
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duplicate-fraction", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(main(args.alerts, args.concurrency, args.duplicate_fraction))
@@ -0,0 +1,135 @@
+"""
+Load test: WebSocket fan-out with thousands of concurrent connections.
+
+Starts the app in-process under uvicorn on a local port, opens --connections
+WebSocket clients spread over --users bench users, and publishes position
+updates for every user at --rate updates/second. A --slow-fraction of clients
+never read, to show that laggards are coalesced or dropped without delaying
+anyone else. Client and server share one event loop, so the latencies reported
+are an upper bound.
+
+Reports connect latency, end-to-end delivery latency (p50/p99), time spent in
+publish() and the hub counters.
+
+    cd backend && python -m benchmarks.ws_load --connections 5000 --users 100
+
+Each connection needs two file descriptors here; the soft RLIMIT_NOFILE is
+raised to the hard limit automatically.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import socket
+import time
+import uvicorn
+import websockets
+from app import auth, models
+from app.metrics import Histogram
+from app.realtime import hub
+from main import app
+
+BENCH_PREFIX = "bench_ws_"
+
+async def ensure_bench_users(count: int):
+    users = []
+    hashed = auth.get_password_hash("Bench-Pass-123!")
+    for i in range(count):
+        username = f"{BENCH_PREFIX}{i}"
+        user = await models.User.filter(username=username).first()
+        if user is None:
+            user = await models.User.create(email=f"{username}@example.com", username=username, hashed_password=hashed)
+        users.append(user)
+    return users
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def raise_fd_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+async def main(connections: int, users: int, updates: int, rate: float, slow_fraction: float):
+    raise_fd_limit()
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    bench_users = await ensure_bench_users(users)
+    tokens = [auth.create_access_token({"sub": user.username}) for user in bench_users]
+
+    connect_latency = Histogram()
+    delivery_latency = Histogram()
+    publish_time = Histogram()
+    received = 0
+    overflows = 0
+    sockets = []
+    readers = []
+    opening = asyncio.Semaphore(200)
+
+    async def read(ws):
+        nonlocal received, overflows
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "update":
+                    delivery_latency.observe(time.time() - message["data"]["ts"])
+                    received += 1
+                elif message.get("type") == "overflow":
+                    overflows += 1
+        except websockets.ConnectionClosed:
+            pass
+
+    async def open_connection(i: int):
+        url = f"ws://127.0.0.1:{port}/ws?channels=positions"
+        async with opening:
+            started = time.perf_counter()
+            ws = await websockets.connect(url, max_queue=None if i >= slow_count else 1)
+            await ws.send(json.dumps({"action": "auth", "token": tokens[i % users]}))
+            connect_latency.observe(time.perf_counter() - started)
+        sockets.append(ws)
+        if i >= slow_count:
+            readers.append(asyncio.create_task(read(ws)))
+
+    slow_count = int(connections * slow_fraction)
+    started = time.perf_counter()
+    await asyncio.gather(*(open_connection(i) for i in range(connections)))
+    print(f"opened {connections} connections in {time.perf_counter() - started:.1f}s "
+          f"(connect p50 {connect_latency.quantile(0.5) * 1000:.1f}ms, p99 {connect_latency.quantile(0.99) * 1000:.1f}ms, "
+          f"{slow_count} slow clients)")
+
+    interval = 1.0 / rate
+    for seq in range(updates):
+        for user in bench_users:
+            before = time.perf_counter()
+            await hub.publish(user.id, "positions", {"symbol": f"SYM{seq % 10}", "seq": seq, "ts": time.time()}, key=f"SYM{seq % 10}")
+            publish_time.observe(time.perf_counter() - before)
+        await asyncio.sleep(interval)
+    await asyncio.sleep(2)
+
+    expected = updates * (connections - slow_count)
+    print(f"delivered {received} of {expected} updates to reading clients ({overflows} overflow notices)")
+    print(f"delivery latency p50 {delivery_latency.quantile(0.5) * 1000:.1f}ms, p99 {delivery_latency.quantile(0.99) * 1000:.1f}ms")
+    print(f"publish() p50 {publish_time.quantile(0.5) * 1e6:.0f}us, p99 {publish_time.quantile(0.99) * 1e6:.0f}us")
+    print(f"hub stats: {hub.stats()}")
+
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+    for reader in readers:
+        reader.cancel()
+    server.should_exit = True
+    await server_task
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=50, help="Updates published per user")
+    parser.add_argument("--rate", type=float, default=10.0, help="Update rounds per second")
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.connections, args.users, args.updates, args.rate, args.slow_fraction))
@@ -0,0 +1,62 @@
+"""
+Bulk-import users from a CSV (email,username,password header) or JSON-lines file:
+
+    python bulk_import.py users.csv
+    python bulk_import.py users.jsonl --format jsonl > results.jsonl
+
+Writes one JSON result per input row to stdout and a summary to stderr.
+Also grants administrator rights, which the /admin endpoints require:
+
+    python bulk_import.py --grant-admin alice
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from tortoise import Tortoise
+from app import models, provisioning
+from app.config import settings
+from app.hashing import bulk_hasher
+
+async def run_import(path: str, fmt: str, batch_size: int):
+    started = time.perf_counter()
+    statuses = Counter()
+    async for result in provisioning.import_users(provisioning.iter_file_chunks(path), fmt, batch_size):
+        statuses[result["status"]] += 1
+        sys.stdout.write(json.dumps(result) + "\n")
+    elapsed = time.perf_counter() - started
+    total = sum(statuses.values())
+    summary = ", ".join(f"{status}={count}" for status, count in sorted(statuses.items()))
+    print(f"{total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s): {summary}", file=sys.stderr)
+
+async def grant_admin(username: str):
+    updated = await models.User.filter(username=username).update(is_superuser=True)
+    if not updated:
+        print(f"No user named {username}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{username} is now an administrator", file=sys.stderr)
+
+async def main(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM, use_tz=True)
+    try:
+        if args.grant_admin:
+            await grant_admin(args.grant_admin)
+        else:
+            fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+            await run_import(args.path, fmt, args.batch_size)
+    finally:
+        bulk_hasher.shutdown()
+        await Tortoise.close_connections()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="CSV or JSON-lines file to import")
+    parser.add_argument("--format", choices=provisioning.FORMATS)
+    parser.add_argument("--batch-size", type=int, default=settings.BULK_IMPORT_BATCH_SIZE)
+    parser.add_argument("--grant-admin", metavar="USERNAME")
+    args = parser.parse_args()
+    if not args.path and not args.grant_admin:
+        parser.error("a file to import or --grant-admin is required")
+    asyncio.run(main(args))
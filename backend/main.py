@@ -1,9 +1,23 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth
+from app.routers import admin, auth, instruments, keys, metrics, orders, positions, strategies, webhooks, ws
 from app.database import init_db, close_db
 from utils.auto_logout import init_auto_logout
-from app.logging_config import setup_logging
+from app.logging_config import setup_logging, shutdown_logging
+from app.rate_limiter import setup_rate_limiter
+from app.hashing import bulk_hasher, password_hasher
+from app.sessions import start_session_purge, stop_session_purge
+from app.realtime import start_realtime, stop_realtime
+from app.webhooks import pipeline as webhook_pipeline
+from app.order_router import order_router
+from app.order_outcome import start_order_reconcile, stop_order_reconcile
+from app.event_log import event_log
+from app.positions import start_positions, stop_positions
+from app.instruments import start_instruments, stop_instruments
+from app.traffic import TrafficMiddleware, start_traffic, stop_traffic
+from app.diagnostics import start_diagnostics, stop_diagnostics
+from app.config import settings
+from app.metrics import LatencyMiddleware, start_metrics_exporter, startup_phase, startup_phases, stop_metrics_exporter
 import os
 import secrets
 from fastapi.security import HTTPBearer
@@ -29,22 +43,76 @@ app.add_middleware(
     expose_headers=["X-CSRF-Token"]
 )
 
+# Rate limiting and streaming request size limits
+setup_rate_limiter(app)
+
+# Per-request traffic records for the admin traffic monitor
+app.add_middleware(TrafficMiddleware)
+
+# Latency instrumentation wraps everything else so it sees the full request time
+app.add_middleware(LatencyMiddleware)
+
 # Register startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting application...")
-    await init_db()
-    init_auto_logout(app)
-    logger.info("Application startup complete!")
+    # First, so stalls during the rest of startup are caught too
+    start_diagnostics()
+    with startup_phase("total"):
+        await init_db()
+        start_traffic()
+        with startup_phase("hash_pool"):
+            password_hasher.start()
+        # Every worker closes its own WebSockets at the cutoff; worker 0 also revokes the sessions
+        init_auto_logout(app, revoke=settings.WORKER_ID == 0)
+        if settings.WORKER_ID == 0:
+            # Singleton jobs; under serve.py exactly one worker runs them
+            start_session_purge()
+            start_order_reconcile()
+        start_realtime()
+        webhook_pipeline.start()
+        with startup_phase("event_log"):
+            await event_log.start()
+        with startup_phase("positions"):
+            await start_positions()
+        with startup_phase("instruments"):
+            await start_instruments()
+        start_metrics_exporter(settings.METRICS_DIR)
+    phases = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in startup_phases.items())
+    logger.info(f"Application startup complete! ({phases})")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application...")
+    stop_metrics_exporter(settings.METRICS_DIR)
+    stop_traffic()
+    stop_diagnostics()
+    await webhook_pipeline.stop()
+    stop_session_purge()
+    stop_order_reconcile()
+    await stop_realtime()
+    await order_router.aclose()
+    await stop_positions()
+    stop_instruments()
+    # Durable flush: buffered order/trade events are written before the pool closes
+    await event_log.close()
+    password_hasher.shutdown()
+    bulk_hasher.shutdown()
     await close_db()
     logger.info("Application shutdown complete!")
+    shutdown_logging()
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+app.include_router(orders.router, prefix="/orders", tags=["orders"])
+app.include_router(positions.router, prefix="/positions", tags=["positions"])
+app.include_router(instruments.router, prefix="/instruments", tags=["instruments"])
+app.include_router(strategies.router, prefix="/strategies", tags=["strategies"])
+app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
+app.include_router(keys.router, tags=["authentication"])
+app.include_router(ws.router, tags=["realtime"])
+app.include_router(metrics.router, tags=["monitoring"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,67 @@
+"""
+One-shot database setup, run once per deploy before starting the API workers:
+
+    python migrate.py
+
+Creates the database if it does not exist and applies pending aerich migrations
+from ./migrations. The API itself (DB_STARTUP_MODE=check) only verifies the
+applied version at startup.
+"""
+import asyncio
+import logging
+import sys
+from aerich import Command
+from tortoise import Tortoise
+from app.database import (
+    TORTOISE_ORM,
+    MIGRATIONS_DIR,
+    create_database_if_not_exists,
+    latest_migration_version,
+)
+from app.metrics import startup_phase, startup_phases
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("openalgo.migrate")
+
+# Databases created by the old generate-on-boot path have tables but no aerich table
+AERICH_TABLE = """
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSONB NOT NULL
+);"""
+
+async def migrate():
+    with startup_phase("db_create"):
+        await create_database_if_not_exists()
+
+    command = Command(
+        tortoise_config=TORTOISE_ORM,
+        app="models",
+        location=str(MIGRATIONS_DIR.parent)
+    )
+    try:
+        with startup_phase("orm_init"):
+            await command.init()
+            await Tortoise.get_connection("default").execute_script(AERICH_TABLE)
+        with startup_phase("upgrade"):
+            upgraded = await command.upgrade(run_in_transaction=True)
+    finally:
+        await Tortoise.close_connections()
+
+    if upgraded:
+        for version in upgraded:
+            logger.info(f"Applied migration {version}")
+    else:
+        logger.info("No pending migrations")
+    logger.info(f"Database schema is at {latest_migration_version()}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(migrate())
+    except Exception as e:
+        logger.error(f"Migration failed: {str(e)}")
+        sys.exit(1)
+    phases = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in startup_phases.items())
+    logger.info(f"Migration complete ({phases})")
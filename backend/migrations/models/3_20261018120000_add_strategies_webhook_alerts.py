@@ -0,0 +1,31 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "strategies" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(255) NOT NULL,
+    "platform" VARCHAR(32) NOT NULL DEFAULT 'generic',
+    "api_key_hash" VARCHAR(64) NOT NULL UNIQUE,
+    "is_active" BOOL NOT NULL DEFAULT True,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "user_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_strategies_user_id" ON "strategies" ("user_id");
+        CREATE TABLE IF NOT EXISTS "webhook_alerts" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "idempotency_key" VARCHAR(128) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "received_at" TIMESTAMPTZ NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "strategy_id" INT NOT NULL REFERENCES "strategies" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_webhook_ale_strateg_idempotency" UNIQUE ("strategy_id", "idempotency_key")
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "webhook_alerts";
+        DROP TABLE IF EXISTS "strategies";"""
@@ -0,0 +1,29 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "orders" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "broker" VARCHAR(32) NOT NULL,
+    "symbol" VARCHAR(64) NOT NULL,
+    "exchange" VARCHAR(16) NOT NULL,
+    "side" VARCHAR(4) NOT NULL,
+    "quantity" INT NOT NULL,
+    "order_type" VARCHAR(16) NOT NULL,
+    "price" DECIMAL(14,4),
+    "status" VARCHAR(16) NOT NULL DEFAULT 'pending',
+    "broker_order_id" VARCHAR(64),
+    "error" TEXT,
+    "latency_ms" DOUBLE PRECISION,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "strategy_id" INT REFERENCES "strategies" ("id") ON DELETE SET NULL,
+    "user_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_orders_user_id_created_at" ON "orders" ("user_id", "created_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "orders";"""
@@ -0,0 +1,40 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Partitioned by trading day; daily partitions are created ahead of time by
+    # app.event_log. The default partitions only catch rows outside those days.
+    return """
+        CREATE TABLE IF NOT EXISTS "order_events" (
+    "id" BIGSERIAL NOT NULL,
+    "ts" TIMESTAMPTZ NOT NULL,
+    "user_id" INT NOT NULL,
+    "order_id" BIGINT NOT NULL,
+    "event" VARCHAR(32) NOT NULL,
+    "data" JSONB NOT NULL,
+    PRIMARY KEY ("user_id", "ts", "id")
+) PARTITION BY RANGE ("ts");
+CREATE INDEX IF NOT EXISTS "idx_order_events_ts_brin" ON "order_events" USING BRIN ("ts");
+CREATE TABLE IF NOT EXISTS "order_events_default" PARTITION OF "order_events" DEFAULT;
+        CREATE TABLE IF NOT EXISTS "trade_events" (
+    "id" BIGSERIAL NOT NULL,
+    "ts" TIMESTAMPTZ NOT NULL,
+    "user_id" INT NOT NULL,
+    "order_id" BIGINT NOT NULL,
+    "trade_id" VARCHAR(64) NOT NULL,
+    "symbol" VARCHAR(64) NOT NULL,
+    "exchange" VARCHAR(16) NOT NULL,
+    "side" VARCHAR(4) NOT NULL,
+    "quantity" INT NOT NULL,
+    "price" DECIMAL(14,4) NOT NULL,
+    "data" JSONB NOT NULL,
+    PRIMARY KEY ("user_id", "ts", "id")
+) PARTITION BY RANGE ("ts");
+CREATE INDEX IF NOT EXISTS "idx_trade_events_ts_brin" ON "trade_events" USING BRIN ("ts");
+CREATE TABLE IF NOT EXISTS "trade_events_default" PARTITION OF "trade_events" DEFAULT;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "trade_events";
+        DROP TABLE IF EXISTS "order_events";"""
@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "position_snapshots" (
+    "user_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE,
+    "symbol" VARCHAR(80) NOT NULL,
+    "quantity" BIGINT NOT NULL,
+    "avg_price" DOUBLE PRECISION NOT NULL,
+    "realized_pnl" DOUBLE PRECISION NOT NULL,
+    "updated_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY ("user_id", "symbol")
+);
+        CREATE TABLE IF NOT EXISTS "position_snapshot_state" (
+    "id" SMALLINT NOT NULL PRIMARY KEY,
+    "as_of" TIMESTAMPTZ
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "position_snapshot_state";
+        DROP TABLE IF EXISTS "position_snapshots";"""
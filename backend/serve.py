@@ -0,0 +1,286 @@
+"""
+Multi-process server: one master, N uvicorn workers on a shared socket.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+The master binds the listening socket, imports the app once (--no-preload
+skips this), and forks the workers. The kernel spreads incoming connections
+across the workers' accept() calls. Code and read-mostly state such as settings,
+JWT keys and the instrument index are shared copy-on-write. State that must be
+consistent across workers is moved out of the process before the app is
+imported, unless it is already configured:
+
+- RATE_LIMIT_STORAGE_URI: memory:// becomes openalgo+shm://openalgo
+- METRICS_DIR and TRAFFIC_DIR: fresh directories under /dev/shm
+- REALTIME_BRIDGE: on, so WebSocket updates and fills reach every worker
+
+Each worker gets WORKER_ID 0..N-1. Only worker 0 runs singleton jobs:
+auto-logout session revocation, session purge, order reconciliation and
+position snapshots. At the auto-logout time every worker closes its own
+WebSockets. A worker that dies is replaced with the same WORKER_ID. Each worker
+logs to app.<WORKER_ID>.log and auto_logout.<WORKER_ID>.log (the master to
+app.log), so every file is rotated by exactly one process.
+
+Signals to the master:
+
+- SIGTERM / SIGINT: graceful stop. Workers stop accepting, finish in-flight
+  requests, close WebSockets with 1012 (service restart), run their shutdown
+  hooks, and are killed after --graceful-timeout.
+- SIGHUP: rolling restart, one worker at a time. The replacement must report
+  ready before the old worker is asked to drain, so capacity never drops below
+  N workers and no connection is refused. With --no-preload each worker imports the
+  app itself, so a rolling restart also picks up new code.
+"""
+import argparse
+import importlib
+import logging
+import os
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+logger = logging.getLogger("openalgo.serve")
+
+STARTUP_TIMEOUT = 120  # seconds a new worker may take to report ready
+CRASH_BACKOFF = 1.0  # seconds before replacing a worker that died on its own
+
+def _shm_dir() -> str:
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+def configure_shared_state() -> List[str]:
+    """Point per-process state at shared storage; returns directories to remove at exit"""
+    created = []
+    if os.environ.get("RATE_LIMIT_STORAGE_URI", "memory://").startswith("memory://"):
+        os.environ["RATE_LIMIT_STORAGE_URI"] = "openalgo+shm://openalgo"
+    for name, prefix in (("METRICS_DIR", "openalgo-metrics-"), ("TRAFFIC_DIR", "openalgo-traffic-")):
+        if not os.environ.get(name):
+            os.environ[name] = tempfile.mkdtemp(prefix=prefix, dir=_shm_dir())
+            created.append(os.environ[name])
+    if not os.environ.get("REALTIME_BRIDGE"):
+        os.environ["REALTIME_BRIDGE"] = "True"
+    return created
+
+def load_app(app_path: str):
+    module, _, attribute = app_path.partition(":")
+    return getattr(importlib.import_module(module), attribute or "app")
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(worker_id: int, app, args, sock: socket.socket, ready_fd: int) -> None:
+    """Body of a forked worker; never returns"""
+    import asyncio
+    import uvicorn
+
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    os.environ["WORKER_ID"] = str(worker_id)
+    code = 0
+    try:
+        if app is None:
+            app = load_app(args.app)
+        from app.config import settings
+        from app.logging_config import use_worker_log_files
+        settings.WORKER_ID = worker_id
+        # Each worker writes and rotates its own app.<WORKER_ID>.log
+        use_worker_log_files()
+
+        server = uvicorn.Server(uvicorn.Config(
+            app,
+            log_level=args.log_level,
+            ws="websockets",
+            timeout_keep_alive=args.keep_alive,
+            timeout_graceful_shutdown=args.graceful_timeout,
+        ))
+
+        async def serve():
+            task = asyncio.create_task(server.serve(sockets=[sock]))
+            while not server.started and not task.done():
+                await asyncio.sleep(0.05)
+            if server.started:
+                os.write(ready_fd, b"1")
+            os.close(ready_fd)
+            await task
+
+        asyncio.run(serve())
+    except BaseException:
+        logger.exception(f"Worker {worker_id} crashed")
+        code = 1
+    finally:
+        try:
+            from app.logging_config import shutdown_logging
+            shutdown_logging()
+        except Exception:
+            pass
+        os._exit(code)
+
+class Master:
+    def __init__(self, app, args, sock: socket.socket):
+        self.app = app
+        self.args = args
+        self.sock = sock
+        self.workers: Dict[int, int] = {}  # worker id -> pid
+        self.retiring: Dict[int, float] = {}  # pid -> kill deadline
+        self.pending: List[int] = []
+
+    def spawn(self, worker_id: int) -> Optional[int]:
+        """Fork a worker and wait until it accepts connections; None if it failed to start"""
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            run_worker(worker_id, self.app, self.args, self.sock, ready_w)
+        os.close(ready_w)
+        try:
+            readable, _, _ = select.select([ready_r], [], [], STARTUP_TIMEOUT)
+            ready = bool(readable) and os.read(ready_r, 1) == b"1"
+        finally:
+            os.close(ready_r)
+        if not ready:
+            logger.error(f"Worker {worker_id} (pid {pid}) did not start")
+            self._kill(pid, signal.SIGKILL)
+            return None
+        logger.info(f"Worker {worker_id} ready (pid {pid})")
+        return pid
+
+    def _kill(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def retire(self, pid: int) -> None:
+        self._kill(pid, signal.SIGTERM)
+        self.retiring[pid] = time.monotonic() + self.args.graceful_timeout + 5
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            for worker_id, worker_pid in list(self.workers.items()):
+                if worker_pid == pid:
+                    logger.error(f"Worker {worker_id} (pid {pid}) exited unexpectedly with status {status}")
+                    del self.workers[worker_id]
+                    self.pending.append(worker_id)
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.warning(f"Worker pid {pid} did not drain in time, killing it")
+                self._kill(pid, signal.SIGKILL)
+
+    def start(self) -> None:
+        for worker_id in range(self.args.workers):
+            pid = self.spawn(worker_id)
+            if pid is None:
+                self.pending.append(worker_id)
+            else:
+                self.workers[worker_id] = pid
+
+    def rolling_restart(self) -> None:
+        logger.info("Rolling restart started")
+        for worker_id in sorted(self.workers):
+            old = self.workers.get(worker_id)
+            if old is None:
+                continue
+            new = self.spawn(worker_id)
+            if new is None:
+                logger.error(f"Rolling restart stopped: replacement for worker {worker_id} failed to start")
+                return
+            self.workers[worker_id] = new
+            self.retire(old)
+            # Let the old worker drain before the next one goes, so at most one is draining
+            while old in self.retiring:
+                time.sleep(0.1)
+                self.reap()
+        logger.info("Rolling restart complete")
+
+    def stop(self) -> None:
+        logger.info("Stopping workers")
+        for pid in self.workers.values():
+            self.retire(pid)
+        self.workers.clear()
+        while self.retiring:
+            time.sleep(0.1)
+            self.reap()
+
+    def run(self) -> None:
+        signals: List[int] = []
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, lambda signum, frame: signals.append(signum))
+        self.start()
+        while True:
+            time.sleep(0.2)
+            self.reap()
+            while signals:
+                signum = signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.rolling_restart()
+                else:
+                    self.stop()
+                    return
+            if self.pending:
+                time.sleep(CRASH_BACKOFF)
+                worker_id = self.pending.pop(0)
+                pid = self.spawn(worker_id)
+                if pid is None:
+                    self.pending.append(worker_id)
+                else:
+                    self.workers[worker_id] = pid
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="Default: WEB_CONCURRENCY, else one per CPU")
+    parser.add_argument("--graceful-timeout", type=int,
+                        help="Seconds a draining worker gets before it is killed (default: GRACEFUL_TIMEOUT, else 30)")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="Import the app in each worker instead of the master")
+    args = parser.parse_args()
+
+    # .env first, so explicit settings there win over the shared-state defaults
+    load_dotenv()
+    # Resolved after .env is loaded; an empty value counts as unset
+    args.workers = args.workers or int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    if args.graceful_timeout is None:
+        args.graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT") or 30)
+    created = configure_shared_state()
+    sock = bind_socket(args.host, args.port, args.backlog)
+    # Replaced by the app's queued logging pipeline once it is imported
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    app = load_app(args.app) if args.preload else None
+    logger.info(f"Master {os.getpid()} serving on {args.host}:{args.port} with {args.workers} workers "
+                f"(preload={args.preload}, rate limits in {os.environ['RATE_LIMIT_STORAGE_URI']})")
+    try:
+        Master(app, args, sock).run()
+    finally:
+        sock.close()
+        for directory in created:
+            shutil.rmtree(directory, ignore_errors=True)
+        logger.info("Master stopped")
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
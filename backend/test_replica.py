@@ -0,0 +1,156 @@
+"""
+Checks read-replica routing and the query cache against two local Postgres instances.
+
+Run two independent servers, e.g. the usual one on 5432 and
+`docker run -d -p 5433:5432 -e POSTGRES_PASSWORD=... postgres:16`, then:
+
+    python test_replica.py
+
+Both must accept POSTGRES_USER/POSTGRES_PASSWORD. The replica is
+DB_REPLICA_SERVER:DB_REPLICA_PORT (localhost:5433 by default). The servers do
+not replicate, so a row written through the ORM exists on the primary only and
+tells which server answered a read. The script works in its own database,
+openalgo_replica_test, on both servers and drops it at the end.
+"""
+import asyncio
+import contextvars
+import os
+import sys
+
+TEST_DB = "openalgo_replica_test"
+os.environ["POSTGRES_DB"] = TEST_DB
+os.environ.setdefault("DB_REPLICA_SERVER", "localhost")
+os.environ.setdefault("DB_REPLICA_PORT", "5433")
+os.environ["QUERY_CACHE_ENABLED"] = "True"
+os.environ["QUERY_CACHE_TTL_SECONDS"] = "60"
+
+import asyncpg
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+from tortoise.utils import get_schema_sql
+from app import models
+from app.auth import get_user
+from app.config import settings
+from app.db_router import check_replica, query_cache, read_connection, replica, use_primary
+
+failures = 0
+
+def check(name: str, ok: bool) -> None:
+    global failures
+    failures += not ok
+    print(f"{'PASS' if ok else 'FAIL'}  {name}")
+
+def request(coro):
+    """Run a coroutine as its own task with a fresh context, like one HTTP request"""
+    return contextvars.Context().run(asyncio.get_running_loop().create_task, coro)
+
+async def admin_connect(host: str, port: str):
+    return await asyncpg.connect(user=settings.POSTGRES_USER, password=settings.POSTGRES_PASSWORD,
+                                 host=host, port=port, database="postgres")
+
+async def recreate_databases(drop_only: bool = False) -> None:
+    for host, port in ((settings.POSTGRES_SERVER, settings.POSTGRES_PORT),
+                       (settings.DB_REPLICA_SERVER, settings.DB_REPLICA_PORT)):
+        conn = await admin_connect(host, port)
+        try:
+            await conn.execute(f'DROP DATABASE IF EXISTS "{TEST_DB}"')
+            if not drop_only:
+                await conn.execute(f'CREATE DATABASE "{TEST_DB}"')
+        finally:
+            await conn.close()
+
+async def find(username: str):
+    return await models.User.filter(username=username).first()
+
+async def create_user(username: str):
+    return await models.User.create(email=f"{username}@example.com", username=username, hashed_password="x")
+
+async def run_checks() -> None:
+    await request(create_user("alice"))
+    check("reads go to the replica", await request(find("alice")) is None)
+    check("primary has the written row", await request(in_primary(find("alice"))) is not None)
+
+    async def write_then_read():
+        await create_user("bob")
+        return await find("bob")
+    check("a request reads its own writes", await request(write_then_read()) is not None)
+
+    async def read_in_transaction():
+        async with in_transaction("default"):
+            return await find("alice")
+    check("reads inside a transaction use the primary", await request(read_in_transaction()) is not None)
+    check("get_user falls back to the primary for a missing user", await request(get_user("alice")) is not None)
+
+    async def raw_read():
+        rows = await read_connection().execute_query_dict("SELECT count(*) AS n FROM users")
+        return rows[0]["n"]
+    check("raw SQL reads go to the replica", await request(raw_read()) == 0)
+
+    replica.healthy = False
+    check("an unhealthy replica is bypassed", await request(find("alice")) is not None)
+    check("the health check restores the replica", await check_replica(timeout=5) and replica.healthy)
+    replica.lag = settings.DB_REPLICA_MAX_LAG + 1
+    check("a lagging replica is bypassed", await request(find("alice")) is not None)
+    replica.lag = 0.0
+
+    loads = 0
+
+    async def list_orders(user_id: int):
+        nonlocal loads
+        loads += 1
+        with use_primary():
+            return await models.Order.filter(user_id=user_id)
+
+    def cached(user_id: int):
+        return query_cache.get_or_load(("orders", user_id), lambda: list_orders(user_id), tags=(f"orders:user:{user_id}",))
+
+    alice = await request(in_primary(find("alice")))
+    bob = await request(in_primary(find("bob")))
+    await request(cached(alice.id))
+    await request(cached(alice.id))
+    check("a repeated query is served from the cache", loads == 1)
+    results = await asyncio.gather(*(request(cached(bob.id)) for _ in range(10)))
+    check("concurrent misses share one load", loads == 2 and all(r == results[0] for r in results))
+
+    await request(models.Order.create(user_id=alice.id, broker="mock", symbol="SBIN", exchange="NSE",
+                                      side="BUY", quantity=1, order_type="MARKET"))
+    orders = await request(cached(alice.id))
+    check("saving an order invalidates that user's cached orders", loads == 3 and len(orders) == 1)
+    await request(cached(bob.id))
+    check("other users' cached orders survive", loads == 3)
+
+    async def slow_load():
+        await asyncio.sleep(0.1)
+        return ["stale"]
+    loading = request(query_cache.get_or_load("race", slow_load, tags=("race",)))
+    await asyncio.sleep(0.01)
+    query_cache.invalidate("race")
+    await loading
+    check("a load that raced with a write is not cached", query_cache.get("race") is None)
+
+async def in_primary(coro):
+    with use_primary():
+        return await coro
+
+async def main():
+    if not settings.DB_REPLICA_SERVER:
+        print("Set DB_REPLICA_SERVER (and DB_REPLICA_PORT) to the second instance")
+        sys.exit(2)
+    print(f"Primary {settings.POSTGRES_SERVER}:{settings.POSTGRES_PORT}, "
+          f"replica {settings.DB_REPLICA_SERVER}:{settings.DB_REPLICA_PORT}")
+    await recreate_databases()
+    try:
+        await Tortoise.init(config=settings.TORTOISE_ORM, use_tz=True)
+        # The models belong to the primary; the replica gets the same tables, left empty
+        schema = get_schema_sql(Tortoise.get_connection("default"), safe=True)
+        for name in ("default", "replica"):
+            await Tortoise.get_connection(name).execute_script(schema)
+        await run_checks()
+    finally:
+        await Tortoise.close_connections()
+        await recreate_databases(drop_only=True)
+    print(f"\n{'All checks passed' if not failures else f'{failures} checks failed'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,47 +1,132 @@
 import asyncio
 import logging
-from datetime import datetime, time
+import time as _time
+from datetime import datetime, time, timedelta
 import pytz
 from fastapi import FastAPI
+from tortoise import Tortoise
 from app import models
+from app.config import settings
+from app.realtime import WS_POLICY_VIOLATION, hub
+from app.token_cache import token_cache
 
-# Configure logging
-logging.basicConfig(
-    filename='auto_logout.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s'
-)
-
-async def check_and_logout_users():
-    """Check if current time is 10:35 IST and logout all users"""
-    ist = pytz.timezone('Asia/Kolkata')
-    target_time = time(10, 35)  # Set to 10:35 IST
-    
+# Written to logs/auto_logout.log (auto_logout.<WORKER_ID>.log under serve.py) by the logging pipeline
+logger = logging.getLogger("openalgo.auto_logout")
+
+# Advisory lock key shared by every worker; only the holder revokes sessions
+AUTO_LOGOUT_LOCK_ID = 715_310_001
+# Users deactivated per UPDATE
+REVOKE_BATCH_SIZE = 1000
+# Upper bound on a single sleep so wall-clock adjustments are picked up
+MAX_SLEEP_SECONDS = 3600
+
+def _logout_timezone():
+    return pytz.timezone(settings.AUTO_LOGOUT_TIMEZONE)
+
+def _logout_time() -> time:
+    hour, minute = settings.AUTO_LOGOUT_TIME.split(":")
+    return time(int(hour), int(minute))
+
+def last_logout_deadline(now: datetime) -> datetime:
+    """Most recent auto-logout cutoff at or before `now` (timezone-aware)"""
+    tz = _logout_timezone()
+    local_now = now.astimezone(tz)
+    deadline = tz.localize(datetime.combine(local_now.date(), _logout_time()))
+    if deadline > local_now:
+        deadline = tz.localize(datetime.combine(local_now.date() - timedelta(days=1), _logout_time()))
+    return deadline
+
+def next_logout_deadline(now: datetime) -> datetime:
+    """First auto-logout cutoff strictly after `now` (timezone-aware)"""
+    tz = _logout_timezone()
+    local_now = now.astimezone(tz)
+    deadline = tz.localize(datetime.combine(local_now.date(), _logout_time()))
+    if deadline <= local_now:
+        deadline = tz.localize(datetime.combine(local_now.date() + timedelta(days=1), _logout_time()))
+    return deadline
+
+_epoch = 0.0
+_epoch_valid_until = 0.0
+
+def revocation_epoch() -> float:
+    """
+    Unix timestamp before which issued tokens are revoked
+
+    This is the last auto-logout cutoff. Every worker derives it from settings,
+    so no coordination is needed, and the value is cached until the next cutoff.
+    """
+    global _epoch, _epoch_valid_until
+    now = _time.time()
+    if now >= _epoch_valid_until:
+        current = datetime.fromtimestamp(now, tz=pytz.utc)
+        _epoch = last_logout_deadline(current).timestamp()
+        _epoch_valid_until = next_logout_deadline(current).timestamp()
+    return _epoch
+
+async def revoke_sessions(batch_size: int = REVOKE_BATCH_SIZE) -> int:
+    """
+    Deactivate all active users in keyset-paginated batches
+
+    Guarded by a Postgres advisory lock so that only one worker runs it. Workers
+    that wake after the holder has finished find no active users and exit early.
+    """
+    connection = Tortoise.get_connection("default")
+    async with connection.acquire_connection() as lock_conn:
+        if not await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", AUTO_LOGOUT_LOCK_ID):
+            logger.info("Auto-logout is running on another worker, skipping")
+            return 0
+        try:
+            revoked = 0
+            last_id = 0
+            while True:
+                ids = await models.User.filter(
+                    is_active=True, id__gt=last_id
+                ).order_by("id").limit(batch_size).values_list("id", flat=True)
+                if not ids:
+                    break
+                await models.User.filter(id__in=ids).update(is_active=False)
+                revoked += len(ids)
+                last_id = ids[-1]
+        finally:
+            await lock_conn.execute("SELECT pg_advisory_unlock($1)", AUTO_LOGOUT_LOCK_ID)
+
+    if revoked:
+        logger.info(f"Auto-logout completed successfully, {revoked} users logged out")
+    else:
+        logger.info("No active users found during auto-logout time")
+    return revoked
+
+async def check_and_logout_users(revoke: bool = True):
+    """
+    Sleep until each configured auto-logout time, then log everyone out
+
+    Every worker runs this loop, because cached principals and WebSockets are
+    per process. Only the worker started with revoke=True deactivates users.
+    """
+    tz = _logout_timezone()
     while True:
-        current_time = datetime.now(ist).time()
-        if (current_time.hour == target_time.hour and 
-            current_time.minute == target_time.minute):
-            
-            # Get all active users
-            active_users = await models.User.filter(is_active=True)
-            active_usernames = [user.username for user in active_users]
-            
-            if active_users:
-                # Log active users before logout
-                logging.info(f"Active users before auto-logout: {', '.join(active_usernames)}")
-                
-                # Update all active users to logged out state
-                await models.User.filter(is_active=True).update(is_active=False)
-                
-                logging.info("Auto-logout completed successfully")
-            else:
-                logging.info("No active users found during auto-logout time")
-                
-        # Sleep for 50 seconds to avoid multiple checks in the same minute
-        await asyncio.sleep(50)
-
-def init_auto_logout(app: FastAPI):
-    """Initialize the auto-logout background task"""
+        deadline = next_logout_deadline(datetime.now(tz))
+        if revoke:
+            logger.info(f"Next auto-logout scheduled at {deadline.isoformat()}")
+        while True:
+            remaining = (deadline - datetime.now(tz)).total_seconds()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, MAX_SLEEP_SECONDS))
+
+        # Tokens issued before the deadline are now rejected through
+        # revocation_epoch(); this worker drops its cached principals and open WebSockets
+        token_cache.clear()
+        await hub.close_all(WS_POLICY_VIOLATION)
+        if not revoke:
+            continue
+        try:
+            await revoke_sessions()
+        except Exception as e:
+            logger.error(f"Error during auto-logout: {str(e)}")
+
+def init_auto_logout(app: FastAPI, revoke: bool = True):
+    """Initialize the auto-logout background task; revoke=False only drops this worker's sessions"""
     @app.on_event("startup")
     async def start_auto_logout():
-        asyncio.create_task(check_and_logout_users())
+        app.state.auto_logout_task = asyncio.create_task(check_and_logout_users(revoke))